@@ -2,11 +2,10 @@ from typing import Callable, List, Dict, Any, Optional
 from pathlib import Path
 import json
 
-import chromadb
-from chromadb.config import Settings
 
 from utils.prompt_loader import carregar_prompt
 from utils.config import get_llm
+from utils.vector_store import obter_colecao
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 CHROMA_DIR = BASE_DIR / "base_conhecimento" / "chromadb"
@@ -21,8 +20,7 @@ def criar_agente_cct(ufs: Optional[List[str]] = None, sindicatos: Optional[List[
     prompt = carregar_prompt("analista_cct")
     llm = get_llm()
 
-    client = chromadb.PersistentClient(path=str(CHROMA_DIR), settings=Settings(allow_reset=False))
-    collection = client.get_or_create_collection("ccts")
+    collection = obter_colecao("ccts")
 
     def executar(pergunta: str) -> str:
         where = None
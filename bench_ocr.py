@@ -0,0 +1,76 @@
+"""
+Benchmark do OCR das CCTs: páginas/segundo do caminho antigo (PNG -> PIL -> NumPy, serial)
+contra o atual (amostras do pixmap como array, OCR adaptativo e pool de threads).
+
+Uso:
+    python bench_ocr.py [--paginas 8] [--threads 4] [pdf ...]
+
+Sem PDFs na linha de comando, usa base_conhecimento/ccts_pdfs/*.pdf. Todas as páginas
+selecionadas passam pelo OCR (independente de terem texto embutido). O cache de OCR por
+página fica desligado, exceto com --com-cache.
+"""
+import argparse
+import io
+import time
+from pathlib import Path
+from typing import List, Tuple
+
+import fitz  # PyMuPDF
+from PIL import Image
+
+from ingest_ccts import OCR_THREADS, PDF_DIR, ocr_paginas, ocr_with_tesseract, preprocess_for_ocr
+
+
+def _ocr_legado(doc, indices: List[int]) -> List[str]:
+    out = []
+    for i in indices:
+        pix = doc[i].get_pixmap(dpi=300)
+        img = Image.open(io.BytesIO(pix.tobytes("png")))
+        out.append(ocr_with_tesseract(preprocess_for_ocr(img)))
+    return out
+
+
+def _medir(pdfs: List[Path], paginas: int, threads: int, usar_cache: bool = False) -> Tuple[int, float, float, int]:
+    total = 0
+    t_legado = t_novo = 0.0
+    divergentes = 0
+    for pdf in pdfs:
+        with fitz.open(pdf) as doc:
+            indices = list(range(min(paginas, len(doc))))
+            t0 = time.perf_counter()
+            antigo = _ocr_legado(doc, indices)
+            t1 = time.perf_counter()
+            novo = ocr_paginas(doc, indices, threads=threads, usar_cache=usar_cache)
+            t2 = time.perf_counter()
+        t_legado += t1 - t0
+        t_novo += t2 - t1
+        total += len(indices)
+        divergentes += sum(1 for i, txt in zip(indices, antigo) if novo.get(i, "") != txt)
+        print(f"{pdf.name}: {len(indices)} páginas | legado {t1 - t0:.2f}s | atual {t2 - t1:.2f}s")
+    return total, t_legado, t_novo, divergentes
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Benchmark do OCR de páginas (legado x adaptativo + threads)")
+    ap.add_argument("pdfs", nargs="*", type=Path)
+    ap.add_argument("--paginas", type=int, default=8, help="páginas por PDF (a partir da primeira)")
+    ap.add_argument("--threads", type=int, default=OCR_THREADS)
+    ap.add_argument("--com-cache", action="store_true", help="usa o cache de OCR por imagem de página")
+    args = ap.parse_args()
+
+    pdfs = args.pdfs or sorted(PDF_DIR.glob("*.pdf"))
+    if not pdfs:
+        print(f"Nenhum PDF encontrado em {PDF_DIR}.")
+        return
+    total, t_legado, t_novo, divergentes = _medir(pdfs, max(1, args.paginas), max(1, args.threads), args.com_cache)
+    print("-" * 50)
+    print(f"Páginas: {total} | threads: {args.threads}")
+    print(f"Legado: {total / t_legado if t_legado else 0:.2f} páginas/s")
+    print(f"Atual:  {total / t_novo if t_novo else 0:.2f} páginas/s")
+    if t_novo:
+        print(f"Speedup: {t_legado / t_novo:.2f}x")
+    print(f"Páginas com texto diferente: {divergentes}")
+
+
+if __name__ == "__main__":
+    main()
@@ -10,8 +10,13 @@ import os
 import numpy as np
 from pathlib import Path
 from utils.calendario import dias_uteis_periodo, preparar_feriados_para_ano
+from utils.dias_bitmap import montar_bitmap, popcount
+from utils.matriculas import CODIGO_AUSENTE, DicionarioMatriculas, canonizar_serie
+from utils.datas import normalizar_colunas_data
 from utils.config import DIAS_FIXOS_UF, VALOR_PADRAO, get_competencia
-from utils.regras_resolver import resolve_cct_rules
+from utils.regras_resolver import estatisticas_resolver, resolve_cct_rules, resolver_regras_lote
+from utils.pre_resolucao_llm import pre_resolver_llm
+from utils.cache_resultados import cache_habilitado, chave_resultado, guardar_resultado, obter_resultado
 # Base paths
 BASE_DIR = Path(__file__).resolve().parent.parent
 DADOS_DIR = BASE_DIR / "dados_entrada"
@@ -365,7 +370,7 @@ def executar_calculo_deterministico(df_json: str, mes_referencia: str) -> Tuple[
 
         # resolver VR diário via regras_resolver (CCT) e fallback por estado
         sind = str(row.get(col_sind, "")).strip() if col_sind else ""
-        regras = resolve_cct_rules(uf=uf or "", sindicato=sind)
+        regras = resolve_cct_rules(uf=uf or "", sindicato=sind, competencia=inicio_mes)
         vr_valor = regras.get("vr_valor")
         periodicidade = regras.get("periodicidade")
         dias_regra = regras.get("dias")
@@ -481,6 +486,26 @@ def calcular_financeiro_vr(mes_referencia: str = "2025-05") -> str:
       - "YYYY-MM|VR" | "YYYY-MM|VA" | "YYYY-MM|CONSOLIDADO"
     Retorna JSON com caminhos e métricas.
     """
+    # Cache por impressão digital das entradas: chamadas repetidas com as mesmas entradas
+    # (ex.: validação rápida seguida de geração) devolvem o resultado sem recalcular.
+    if not cache_habilitado():
+        return _calcular_financeiro_vr(mes_referencia)
+    try:
+        hit = obter_resultado(chave_resultado(mes_referencia))
+        if hit:
+            return hit
+    except Exception:
+        pass
+    res = _calcular_financeiro_vr(mes_referencia)
+    try:
+        # chave recalculada após a execução (o cálculo pode atualizar feriados.csv)
+        guardar_resultado(chave_resultado(mes_referencia), res)
+    except Exception:
+        pass
+    return res
+
+
+def _calcular_financeiro_vr(mes_referencia: str) -> str:
     base = Path(__file__).resolve().parent.parent
     dados = base / "dados_entrada"
     saida_dir = base / "relatorios_saida"
@@ -553,35 +578,41 @@ def calcular_financeiro_vr(mes_referencia: str = "2025-05") -> str:
     ini_mes = date(y, m, 1)
     fim_mes = (date(y + (m//12), ((m%12)+1), 1) - timedelta(days=1))
 
-    # mapas auxiliares
-    def _intervalos(df, start_hints, end_hints, id_col):
-        out = {}
+    # matrículas: forma canônica + código int64 compartilhado entre todas as bases
+    dic_ids = DicionarioMatriculas()
+
+    # datas: formato inferido por coluna e conversão vetorizada; células inválidas reportadas em bloco
+    datas_invalidas: List[Dict[str, Any]] = []
+    d_ini, d_fim = np.datetime64(ini_mes, "D"), np.datetime64(fim_mes, "D")
+
+    def _datas(df, col, base_nome) -> np.ndarray:
+        conv, inval = normalizar_colunas_data(df, [col], base_nome)
+        datas_invalidas.extend(inval)
+        return conv[col].to_numpy(dtype="datetime64[D]")
+
+    # mapas auxiliares (chave = código da matrícula)
+    def _intervalos(df, start_hints, end_hints, base_nome):
+        out: Dict[int, list] = {}
         if df is None or df.empty: return out
         sc = _find_col(df.columns, start_hints)
         ec = _find_col(df.columns, end_hints)
         if not sc or not ec: return out
-        for _, r in df.iterrows():
-            try:
-                s = pd.to_datetime(r[sc]).date()
-                e = pd.to_datetime(r[ec]).date()
-            except Exception:
-                continue
-            s = max(s, ini_mes); e = min(e, fim_mes)
-            if e >= s:
-                out.setdefault(str(r[id_col]), []).append((s, e))
+        s = np.maximum(_datas(df, sc, base_nome), d_ini)
+        e = np.minimum(_datas(df, ec, base_nome), d_fim)
+        ok = ~(np.isnat(s) | np.isnat(e)) & (e >= s)
+        for cod, si, ei in zip(dic_ids.codificar_coluna(df)[ok].tolist(), s[ok].tolist(), e[ok].tolist()):
+            out.setdefault(cod, []).append((si, ei))
         return out
-    fer_int = _intervalos(ferias, ["inicio","inicio_ferias","data_inicio"], ["fim","fim_ferias","data_fim"], _idcol(ferias) if not ferias.empty else None)
-    afa_int = _intervalos(afast,  ["inicio","data_inicio"], ["fim","data_fim"], _idcol(afast) if not afast.empty else None)
+    fer_int = _intervalos(ferias, ["inicio","inicio_ferias","data_inicio"], ["fim","fim_ferias","data_fim"], "ferias")
+    afa_int = _intervalos(afast,  ["inicio","data_inicio"], ["fim","data_fim"], "afastamentos")
 
     # admissão
     adm_col = _find_col(admis.columns if admis is not None else [], ["data_admissao","admissao"]) 
-    adm_map = {}
+    adm_map: Dict[int, date] = {}
     if adm_col:
-        for _, r in admis.iterrows():
-            try:
-                adm_map[str(r[_idcol(admis)])] = pd.to_datetime(r[adm_col]).date()
-            except Exception:
-                pass
+        adm_d = _datas(admis, adm_col, "admissoes")
+        ok = ~np.isnat(adm_d)
+        adm_map = dict(zip(dic_ids.codificar_coluna(admis)[ok].tolist(), adm_d[ok].tolist()))
 
     # desligamento - prioriza colunas de DATA específicas para evitar confundir com 'comunicado_de_desligamento'
     def _pick_col_exact(df, candidates_contains: list[str]) -> str | None:
@@ -605,41 +636,42 @@ def calcular_financeiro_vr(mes_referencia: str = "2025-05") -> str:
                 break
     # data do comunicado
     ccol = _pick_col_exact(deslig, ["data_comunicado", "comunicado_data"])
-    dmap = {}
-    for _, r in deslig.iterrows():
-        rid = str(r[_idcol(deslig)])
-        dd = pd.to_datetime(r[dcol]).date() if dcol and pd.notna(r.get(dcol)) else None
-        st = str(r.get(scol,"")).strip().upper() if scol else None
-        dc = pd.to_datetime(r[ccol]).date() if ccol and pd.notna(r.get(ccol)) else None
-        dmap[rid] = {"deslig": dd, "status": st, "com_data": dc}
+    dmap: Dict[int, Dict[str, Any]] = {}
+    if not deslig.empty:
+        n_d = len(deslig)
+        dd_l = _datas(deslig, dcol, "desligados").tolist() if dcol else [None] * n_d
+        st_l = [str(v).strip().upper() for v in deslig[scol]] if scol else [None] * n_d
+        dc_l = _datas(deslig, ccol, "desligados").tolist() if ccol else [None] * n_d
+        for cod, dd, st, dc in zip(dic_ids.codificar_coluna(deslig).tolist(), dd_l, st_l, dc_l):
+            dmap[cod] = {"deslig": dd, "status": st, "com_data": dc}
 
     # work base
     nome_col = _find_col(ativos.columns, ["nome","colaborador","funcionario"])
     sind_col = _find_col(ativos.columns, ["sindicato","sind"])
     work = ativos[[id_ativos] + ([nome_col] if nome_col else []) + ([sind_col] if sind_col else [])].copy()
     work.columns = ["matricula"] + (["nome"] if nome_col else []) + (["sindicato"] if sind_col else [])
-    work["matricula"] = work["matricula"].astype(str)
+    ativos_cod = dic_ids.codificar(work["matricula"])
+    work["matricula"] = canonizar_serie(work["matricula"]).to_numpy()
+    work["_cod"] = ativos_cod
 
     # exclusões por listas dedicadas (aprendiz/estágio/exterior)
-    ids_ap = set(map(str, (aprendiz[_idcol(aprendiz)] if not aprendiz.empty else [])))
-    ids_es = set(map(str, (estagio[_idcol(estagio)] if not estagio.empty else [])))
-    ids_ex = set(map(str, (exterior[_idcol(exterior)] if not exterior.empty else [])))
-    work = work[~work["matricula"].isin(ids_ap | ids_es | ids_ex)].copy()
+    excl_listas = np.concatenate([dic_ids.codificar_coluna(d) for d in (aprendiz, estagio, exterior)])
+    em_lista = np.isin(ativos_cod, excl_listas)
+    work = work[~em_lista].copy()
 
     # exclusões heurísticas por conteúdo do Ativos (diretor/estagiário/aprendiz/afastado/exterior)
     try:
-        excl_ids_heur: set[str] = set()
-        for _, r in ativos.iterrows():
-            mid = str(r[id_ativos])
-            if mid in ids_ap or mid in ids_es or mid in ids_ex:
+        excl_heur: List[int] = []
+        for cod, pula, (_, r) in zip(ativos_cod, em_lista, ativos.iterrows()):
+            if pula:
                 continue
             try:
                 if _should_exclude(r):
-                    excl_ids_heur.add(mid)
+                    excl_heur.append(int(cod))
             except Exception:
                 pass
-        if excl_ids_heur:
-            work = work[~work["matricula"].isin(excl_ids_heur)].copy()
+        if excl_heur:
+            work = work[~np.isin(work["_cod"].to_numpy(), np.array(excl_heur, dtype=np.int64))].copy()
     except Exception:
         pass
 
@@ -647,65 +679,42 @@ def calcular_financeiro_vr(mes_referencia: str = "2025-05") -> str:
     try:
         if admis is not None and not admis.empty and len(admis.columns) >= 4:
             # IDs presentes em outras bases (para garantir que são "somente admissão")
-            ids_outros: set[str] = set()
-            def _ids(df: pd.DataFrame) -> set[str]:
-                try:
-                    if df is None or df.empty:
-                        return set()
-                    return set(map(str, df[df.columns[0]].astype(str).tolist()))
-                except Exception:
-                    return set()
-            try:
-                ids_outros |= _ids(ativos)
-            except Exception:
-                pass
-            for _df in (aprendiz, estagio, exterior, ferias, afast, deslig):
-                try:
-                    ids_outros |= _ids(_df)
-                except Exception:
-                    pass
+            ids_outros = np.concatenate([
+                dic_ids.codificar_coluna(d) for d in (ativos, aprendiz, estagio, exterior, ferias, afast, deslig)
+            ])
             # IDs de Admissões e coluna D (quarta) vazia
-            id_adm_col = _idcol(admis)
+            adm_cod = dic_ids.codificar_coluna(admis)
             col_d = admis.columns[3]
             try:
                 s = admis[col_d].astype(str).str.strip().replace({"nan": "", "None": ""})
             except Exception:
                 s = pd.Series(["" for _ in range(len(admis))])
-            ids_colD_blank = set(map(str, admis.loc[s == "", id_adm_col].astype(str).tolist()))
-            ids_adm = set(map(str, admis[id_adm_col].astype(str).tolist()))
-            only_in_adm = {mid for mid in ids_adm if mid not in ids_outros}
-            target_ids = only_in_adm & ids_colD_blank
-            if target_ids:
+            blank = (s == "").to_numpy(dtype=bool)
+            presente = adm_cod != CODIGO_AUSENTE
+            only_in_adm = np.unique(adm_cod[presente & ~np.isin(adm_cod, ids_outros)])
+            target_ids = np.intersect1d(only_in_adm, adm_cod[presente & blank])
+            if len(target_ids):
                 # Mapear possíveis colunas de nome e sindicato em Admissões
                 nome_adm_col = _find_col(admis.columns, ["nome","colaborador","funcionario"])  # já normalizadas
                 sind_adm_col = _find_col(admis.columns, ["sindicato","sind"])  # já normalizadas
                 uf_adm_col = _find_col(admis.columns, ["uf","estado","unidade_federativa"])  # já normalizadas
+                # primeira linha de cada matrícula alvo, em ordem da matrícula canônica
+                prim = admis.assign(_cod=adm_cod).drop_duplicates(subset=["_cod"], keep="first")
+                prim = prim[prim["_cod"].isin(target_ids)].copy()
+                prim["matricula"] = dic_ids.decodificar(prim["_cod"])
+                prim = prim.sort_values("matricula")
+                rev_map = {v.lower(): k for k, v in UF_MAP.items()}
                 rows_add = []
-                for mid in sorted(target_ids):
-                    rec = {"matricula": mid}
-                    if nome_adm_col and nome_adm_col in admis.columns:
-                        try:
-                            val = admis.loc[admis[id_adm_col].astype(str) == mid, nome_adm_col].iloc[0]
-                            rec["nome"] = val
-                        except Exception:
-                            pass
-                    if sind_adm_col and sind_adm_col in admis.columns:
-                        try:
-                            val = admis.loc[admis[id_adm_col].astype(str) == mid, sind_adm_col].iloc[0]
-                            rec["sindicato"] = val
-                        except Exception:
-                            pass
-                    if uf_adm_col and uf_adm_col in admis.columns:
-                        try:
-                            raw = str(admis.loc[admis[id_adm_col].astype(str) == mid, uf_adm_col].iloc[0])
-                            raw_u = raw.strip().upper()
-                            if len(raw_u) == 2:
-                                rec["UF"] = raw_u
-                            else:
-                                rev_map = {v.lower(): k for k, v in UF_MAP.items()}
-                                rec["UF"] = rev_map.get(raw.strip().lower())
-                        except Exception:
-                            pass
+                for _, pr in prim.iterrows():
+                    rec = {"matricula": pr["matricula"], "_cod": int(pr["_cod"])}
+                    if nome_adm_col:
+                        rec["nome"] = pr[nome_adm_col]
+                    if sind_adm_col:
+                        rec["sindicato"] = pr[sind_adm_col]
+                    if uf_adm_col:
+                        raw = str(pr[uf_adm_col])
+                        raw_u = raw.strip().upper()
+                        rec["UF"] = raw_u if len(raw_u) == 2 else rev_map.get(raw.strip().lower())
                     # Default UF for admissions-only if still missing
                     if not rec.get("UF"):
                         rec["UF"] = "RS"
@@ -722,20 +731,19 @@ def calcular_financeiro_vr(mes_referencia: str = "2025-05") -> str:
                             work[c] = None
                     work = pd.concat([work, df_add[work.columns]], ignore_index=True)
                     # remover duplicatas por matricula, priorizando já existentes na base de Ativos
-                    work = work.drop_duplicates(subset=["matricula"], keep="first")
+                    work = work.drop_duplicates(subset=["_cod"], keep="first")
     except Exception:
         pass
 
     # dias úteis base (fornecidos) — opcional
     def _map_du(df, val_hints):
-        out = {}
+        out: Dict[int, int] = {}
         if df is None or df.empty: return out
-        idc = df.columns[0]
         cm = _find_col(df.columns, val_hints)
         if not cm: return out
-        for _, r in df.iterrows():
+        for cod, v in zip(dic_ids.codificar_coluna(df), df[cm]):
             try:
-                out[str(r[idc])] = int(float(r[cm]))
+                out[int(cod)] = int(float(v))
             except Exception:
                 pass
         return out
@@ -767,9 +775,46 @@ def calcular_financeiro_vr(mes_referencia: str = "2025-05") -> str:
     pendencias_regras: List[Dict[str, Any]] = []
     # Modo de base de valores: CCT (padrão) ou MANUAL (planilha/VALOR_PADRAO)
     base_mode = os.getenv("VRVA_VAL_BASE", "CCT").upper()
-    for _, r in work.iterrows():
-        mid = r["matricula"]
-        sind = r.get("sindicato","NA")
+
+    # férias sintéticas: quantidade de dias (sem datas) por matrícula, primeira linha de cada ID
+    fer_qtd: Dict[int, int] = {}
+    try:
+        if ferias is not None and not ferias.empty:
+            cand_cols = [c for c in ferias.columns if any(k in str(c).lower() for k in ["dias","qtd"]) ]
+            if cand_cols:
+                vistos: set[int] = set()
+                for rid, val in zip(dic_ids.codificar_coluna(ferias).tolist(), ferias[cand_cols[0]]):
+                    if rid in vistos:
+                        continue
+                    vistos.add(rid)
+                    try:
+                        fer_qtd[rid] = int(float(val))
+                    except Exception:
+                        pass
+    except Exception:
+        pass
+
+    # 1ª passada: janela efetiva (admissão/desligamento/comunicado) e UF por colaborador
+    work = work.reset_index(drop=True)
+    jan_ini: List[Any] = []
+    jan_fim: List[Any] = []
+    zerar_l: List[bool] = []
+    fer_linhas: Dict[int, list] = {}
+    afa_linhas: Dict[int, list] = {}
+    fer_sint: List[int] = []
+    cod_l: List[int] = work["_cod"].astype(np.int64).tolist()
+    # sindicato fatorado: atributos derivados (UF, valores, origem) são calculados por categoria
+    if "sindicato" in work.columns:
+        sind_cod, sind_cats = pd.factorize(work["sindicato"], use_na_sentinel=False)
+    else:
+        sind_cod, sind_cats = np.zeros(len(work), dtype=np.int64), pd.Index(["NA"], dtype=object)
+    # UF inferida do sindicato (para feriados e regras)
+    uf_cat: List[Optional[str]] = [
+        _extract_uf_from_sindicato(sc) if isinstance(sc, str) else None for sc in sind_cats
+    ]
+    uf_l: List[Optional[str]] = [uf_cat[c] for c in sind_cod]
+    for i, r in work.iterrows():
+        mid = cod_l[i]
         # janela
         w_start = ini_mes
         w_end   = fim_mes
@@ -797,69 +842,34 @@ def calcular_financeiro_vr(mes_referencia: str = "2025-05") -> str:
         except Exception:
             pass
 
-        # UF inferida do sindicato (para feriados e regras)
-        uf = _extract_uf_from_sindicato(sind) if isinstance(sind, str) else None
-
-        # dias úteis do mês para essa UF
-        try:
-            month_business_days = dias_uteis_periodo(ini_mes, fim_mes, uf, None)
-        except Exception:
-            month_business_days = len(pd.bdate_range(ini_mes, fim_mes))
-        # aplicar dias base do mês: usar arquivo de dias úteis quando disponível; evitar DIAS_FIXOS se possível
-        # base_days_mes só é usado para proporcionalidade/cap; como usamos dias_liq diretamente, mantemos como month_business_days
-        base_days_mes = month_business_days
-
+        zerar_l.append(zerar)
         if w_end < w_start or zerar:
-            dias_pagos = 0
+            jan_ini.append(None)
+            jan_fim.append(None)
+        else:
+            jan_ini.append(w_start)
+            jan_fim.append(w_end)
+        if mid in fer_int and fer_int[mid]:
+            fer_linhas[i] = fer_int[mid]
+            fer_sint.append(0)
         else:
-            # dias úteis trabalháveis no intervalo, considerando feriados por UF
-            try:
-                dias_trab = dias_uteis_periodo(w_start, w_end, uf, None)
-            except Exception:
-                dias_trab = len(pd.bdate_range(w_start, w_end))
-            # descontar ferias
-            df_fer = 0
-            if mid in fer_int:
-                for (s,e) in fer_int[mid]:
-                    s2 = max(w_start, s); e2 = min(w_end, e)
-                    if e2 >= s2:
-                        try:
-                            df_fer += dias_uteis_periodo(s2, e2, uf, None)
-                        except Exception:
-                            df_fer += len(pd.bdate_range(s2, e2))
             # férias sintéticas: quando só houver quantidade de dias em FÉRIAS
-            try:
-                if (mid not in fer_int or not fer_int[mid]) and ferias is not None and not ferias.empty:
-                    # procurar colunas candidatas de "dias"
-                    cand_cols = [c for c in ferias.columns if any(k in str(c).lower() for k in ["dias","qtd"]) ]
-                    if cand_cols:
-                        idc = ferias.columns[0]
-                        rows_mid = ferias[ferias[idc].astype(str) == mid]
-                        if not rows_mid.empty:
-                            try:
-                                n = int(float(rows_mid.iloc[0][cand_cols[0]]))
-                                # subtrai N dias úteis sintéticos (a partir do início da janela efetiva w_start)
-                                df_fer += max(0, min(n, dias_trab))
-                            except Exception:
-                                pass
-            except Exception:
-                pass
-            # afast
-            df_af = 0
-            if mid in afa_int:
-                for (s,e) in afa_int[mid]:
-                    s2 = max(w_start, s); e2 = min(w_end, e)
-                    if e2 >= s2:
-                        try:
-                            df_af += dias_uteis_periodo(s2, e2, uf, None)
-                        except Exception:
-                            df_af += len(pd.bdate_range(s2, e2))
-            dias_liq = max(0, dias_trab - df_fer - df_af)
-            # dias_mes_sind usa mapas (preferir base fornecida). Evitar DIAS_FIXOS_UF (use business_days se ausente)
-            dias_mes_sind = du_sind.get(mid, month_business_days)
-            dias_base_col = du_colab.get(mid, dias_mes_sind)
-            # usar dias líquidos diretamente, apenas limitando aos máximos parametrizados
-            dias_pagos = max(0, min(int(dias_liq), int(dias_base_col), int(dias_mes_sind)))
+            fer_sint.append(max(0, fer_qtd.get(mid, 0)))
+        if mid in afa_int and afa_int[mid]:
+            afa_linhas[i] = afa_int[mid]
+
+    # dias úteis pagos de toda a população em uma única operação sobre bitmaps (colaboradores × dias)
+    bitmap = montar_bitmap(
+        ini_mes, fim_mes, jan_ini, jan_fim, uf_l,
+        ferias=fer_linhas, afastamentos=afa_linhas, ferias_sinteticas=fer_sint,
+    )
+    dias_liq_arr = bitmap.dias_pagos()
+    # dias úteis do mês por UF (grade completa da competência)
+    month_bd_arr = popcount(bitmap.util)
+
+    # Valores diários por sindicato: dependem apenas de (sindicato, UF), então são
+    # resolvidos uma vez por categoria e replicados para as linhas pelo código.
+    def _valores_sindicato(sind, uf) -> Dict[str, Any]:
         # valor por CCT (prioritário) com fallback por estado
         est = UF_MAP.get(uf) if uf else None
         estado_norm = str(est).strip().lower() if est else None
@@ -867,13 +877,17 @@ def calcular_financeiro_vr(mes_referencia: str = "2025-05") -> str:
         valor_dia_va = np.nan
         origem_vr = "NA"
         origem_va = "NA"
+        pend: List[str] = []
 
         # 1) Regras por CCT (opcional conforme base_mode)
         regra = {}
         vr_diario_cct: Optional[float] = None
         va_diario_cct: Optional[float] = None
         if base_mode != "MANUAL":
-            regra = resolve_cct_rules(uf=uf or "", sindicato=sind if isinstance(sind,str) else "")
+            chave_regra = ((uf or "").upper(), sind.strip() if isinstance(sind, str) else "")
+            regra = regras_lote.get(chave_regra)
+            if regra is None:
+                regra = resolve_cct_rules(uf=uf or "", sindicato=sind if isinstance(sind,str) else "", competencia=ini_mes)
             try:
                 rv = regra.get("vr_valor") if isinstance(regra, dict) else None
                 ra = regra.get("va_valor") if isinstance(regra, dict) else None
@@ -929,13 +943,7 @@ def calcular_financeiro_vr(mes_referencia: str = "2025-05") -> str:
                         except Exception:
                             pass
             if isinstance(valor_dia_vr, float) and np.isnan(valor_dia_vr):
-                pendencias_regras.append({
-                    "matricula": mid,
-                    "nome": r.get("nome",""),
-                    "uf": uf,
-                    "sindicato": sind,
-                    "motivo": "Sem regra CCT e sem valor por estado (VR)",
-                })
+                pend.append("Sem regra CCT e sem valor por estado (VR)")
 
         # VA por CCT e, por fim, VALOR_PADRAO (sem fallback estadual)
         if va_diario_cct is not None:
@@ -962,13 +970,63 @@ def calcular_financeiro_vr(mes_referencia: str = "2025-05") -> str:
                             pass
                 # reporta pendência apenas quando base_mode usa CCT e VA não foi encontrada
                 if base_mode != "MANUAL":
-                    pendencias_regras.append({
-                        "matricula": mid,
-                        "nome": r.get("nome",""),
-                        "uf": uf,
-                        "sindicato": sind,
-                        "motivo": "Sem regra CCT para VA",
-                    })
+                    pend.append("Sem regra CCT para VA")
+
+        return {
+            "vr": valor_dia_vr, "va": valor_dia_va,
+            "origem_vr": origem_vr, "origem_va": origem_va,
+            "pendencias": pend,
+        }
+
+    # Pré-resolução: extrações LLM dos pares sem regra determinística rodam em paralelo
+    # (limite de taxa + retentativas) e são gravadas antes do laço, que fica sem I/O de rede.
+    pre_resolucao: Dict[str, Any] = {}
+    if base_mode != "MANUAL" and os.getenv("VRVA_PRE_RESOLUCAO_LLM", "1") != "0":
+        try:
+            pre_resolucao = pre_resolver_llm(
+                [(uf_cat[k], sc) for k, sc in enumerate(sind_cats) if isinstance(sc, str)],
+                competencia=ini_mes,
+            )
+        except Exception as e:
+            pre_resolucao = {"erro": str(e)}
+    # regras vigentes na competência para todos os pares de uma vez (consulta as-of no snapshot)
+    regras_lote: Dict[Tuple[str, str], Dict[str, Any]] = {}
+    if base_mode != "MANUAL":
+        regras_lote = resolver_regras_lote(
+            [(uf_cat[k] or "", sc if isinstance(sc, str) else "") for k, sc in enumerate(sind_cats)],
+            competencia=ini_mes,
+        )
+    val_cat = [_valores_sindicato(sc, uf_cat[k]) for k, sc in enumerate(sind_cats)]
+
+    for i, r in work.iterrows():
+        mid = r["matricula"]
+        sind = r.get("sindicato","NA")
+        zerar = zerar_l[i]
+        uf = uf_l[i]
+        month_business_days = int(month_bd_arr[i])
+
+        if jan_ini[i] is None:
+            dias_pagos = 0
+        else:
+            dias_liq = int(dias_liq_arr[i])
+            # dias_mes_sind usa mapas (preferir base fornecida). Evitar DIAS_FIXOS_UF (use business_days se ausente)
+            dias_mes_sind = du_sind.get(cod_l[i], month_business_days)
+            dias_base_col = du_colab.get(cod_l[i], dias_mes_sind)
+            # usar dias líquidos diretamente, apenas limitando aos máximos parametrizados
+            dias_pagos = max(0, min(int(dias_liq), int(dias_base_col), int(dias_mes_sind)))
+        val = val_cat[sind_cod[i]]
+        valor_dia_vr = val["vr"]
+        valor_dia_va = val["va"]
+        origem_vr = val["origem_vr"]
+        origem_va = val["origem_va"]
+        for motivo in val["pendencias"]:
+            pendencias_regras.append({
+                "matricula": mid,
+                "nome": r.get("nome",""),
+                "uf": uf,
+                "sindicato": sind,
+                "motivo": motivo,
+            })
 
         total_vr = 0.0 if np.isnan(valor_dia_vr) else round(dias_pagos * float(valor_dia_vr), 2)
         total_va = 0.0 if np.isnan(valor_dia_va) else round(dias_pagos * float(valor_dia_va), 2)
@@ -1018,7 +1076,8 @@ def calcular_financeiro_vr(mes_referencia: str = "2025-05") -> str:
                 return d.strftime("%d/%m/%Y") if d is not None else ""
             except Exception:
                 return ""
-        df_out["admissao_fmt"] = df_out["matricula"].map(lambda x: adm_map.get(x) if x in adm_map else None).apply(_fmt_date)
+        # records segue a ordem de `work`: códigos de matrícula alinhados por posição
+        df_out["admissao_fmt"] = pd.Series([adm_map.get(c) for c in cod_l], index=df_out.index, dtype=object).apply(_fmt_date)
         # Competência mm/aaaa
         df_out["competencia_fmt"] = f"{m:02d}/{y}"
         # Seleção e renomeação
@@ -1111,6 +1170,16 @@ def calcular_financeiro_vr(mes_referencia: str = "2025-05") -> str:
     except Exception:
         pass
 
+    # Gera arquivo de datas inválidas nas bases de entrada (células não convertidas)
+    datas_path = None
+    try:
+        if datas_invalidas:
+            pfx = "VRVA" if prod=="CONSOLIDADO" else prod
+            datas_path = str(saida_dir / f"{pfx}_DATAS_INVALIDAS_{m:02d}_{y}.csv")
+            pd.DataFrame(datas_invalidas).to_csv(datas_path, index=False, encoding="utf-8")
+    except Exception:
+        pass
+
     return json.dumps({
         "saida_xlsx": out_path,
         "produto": prod,
@@ -1123,4 +1192,8 @@ def calcular_financeiro_vr(mes_referencia: str = "2025-05") -> str:
         "sem_valor_count": sem_valor_count,
         "erros_csv": err_path,
         "pendencias_cct_csv": pend_path,
+        "datas_invalidas": len(datas_invalidas),
+        "datas_invalidas_csv": datas_path,
+        "resolver_stats": estatisticas_resolver(),
+        "pre_resolucao_llm": pre_resolucao,
     })
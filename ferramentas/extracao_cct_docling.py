@@ -1,30 +1,99 @@
 from __future__ import annotations
 
 from pathlib import Path
+import hashlib
+import json
+import os
 import re
-from typing import Dict, Optional
+import threading
+from typing import Dict, Optional, Tuple
+
+from utils.clausulas import segmentar_clausulas, texto_beneficio, valores_por_clausula
+from utils.palavras_chave import ROTULOS_VA, ROTULOS_VR, proximas, varrer
 
 # Docling
 try:
     from docling.document_converter import DocumentConverter
 except Exception as e:  # pragma: no cover
     DocumentConverter = None  # type: ignore
+try:
+    from docling.datamodel.base_models import InputFormat
+    from docling.datamodel.pipeline_options import PdfPipelineOptions, TableFormerMode
+    from docling.document_converter import PdfFormatOption
+except Exception:  # pragma: no cover
+    PdfPipelineOptions = None  # type: ignore
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+CACHE_DIR = BASE_DIR / "base_conhecimento" / "cache" / "docling"
+
+# Conversor Docling reaproveitado: um por processo (e por combinação de opções), criado na
+# primeira conversão ou no aquecimento do worker; carregar os modelos de layout/tabela a
+# cada PDF dominava o tempo da ingestão. Opções do pipeline (ambiente):
+#   VRVA_DOCLING_OCR     auto (OCR só em PDF digitalizado) | 1 | 0
+#   VRVA_DOCLING_TABELAS accurate | fast | off
+#   VRVA_DOCLING_PAGINAS intervalo "1-20" (vazio = todas)
+# O markdown convertido fica em CACHE_DIR/<sha1>-<opções>.md; reexecuções não chamam o Docling.
+_conversores: Dict[Tuple, object] = {}
+_conv_lock = threading.Lock()
+
+
+def opcoes_pipeline(digitalizado: Optional[bool] = None) -> Tuple[bool, str, Optional[Tuple[int, int]]]:
+    """(do_ocr, modo de tabela, intervalo de páginas) a partir do ambiente."""
+    ocr = (os.getenv("VRVA_DOCLING_OCR", "auto") or "auto").strip().lower()
+    # auto sem informação sobre o PDF mantém o OCR ligado (padrão do Docling)
+    do_ocr = (digitalizado is None or bool(digitalizado)) if ocr == "auto" else ocr in ("1", "true", "sim")
+    tabelas = (os.getenv("VRVA_DOCLING_TABELAS", "accurate") or "accurate").strip().lower()
+    if tabelas not in ("accurate", "fast", "off"):
+        tabelas = "accurate"
+    paginas: Optional[Tuple[int, int]] = None
+    m = re.fullmatch(r"\s*(\d+)\s*-\s*(\d+)\s*", os.getenv("VRVA_DOCLING_PAGINAS", "") or "")
+    if m and 1 <= int(m.group(1)) <= int(m.group(2)):
+        paginas = (int(m.group(1)), int(m.group(2)))
+    return do_ocr, tabelas, paginas
 
 
-VR_LABELS = re.compile(
-    r"(?:\bVR\b|"
-    r"vale[-\s]?refei[cç][aã]o|aux[ií]lio[-\s]?refei[cç][aã]o|refei[cç][aã]o|tele[-\s]?refei[cç][aã]o|"
-    r"ticket[-\s]?refei[cç][aã]o|cart[aã]o[-\s]?refei[cç][aã]o|benef[ií]cio[-\s]?refei[cç][aã]o|refei[cç][aã]o[-\s]?conv[eê]nio"
-    r")",
-    re.IGNORECASE,
-)
-VA_LABELS = re.compile(
-    r"(?:\bVA\b|"
-    r"vale[-\s]?alimenta[cç][aã]o|aux[ií]lio[-\s]?alimenta[cç][aã]o|alimenta[cç][aã]o|"
-    r"ticket[-\s]?alimenta[cç][aã]o|cart[aã]o[-\s]?alimenta[cç][aã]o|cesta[-\s]?b[aá]sica|aux[ií]lio[-\s]?cesta|alimenta[cç][aã]o[-\s]?conv[eê]nio"
-    r")",
-    re.IGNORECASE,
-)
+def _novo_conversor(do_ocr: bool, tabelas: str):
+    if PdfPipelineOptions is None:
+        return DocumentConverter()
+    opts = PdfPipelineOptions()
+    opts.do_ocr = do_ocr
+    opts.do_table_structure = tabelas != "off"
+    if tabelas != "off":
+        opts.table_structure_options.mode = TableFormerMode.FAST if tabelas == "fast" else TableFormerMode.ACCURATE
+    return DocumentConverter(format_options={InputFormat.PDF: PdfFormatOption(pipeline_options=opts)})
+
+
+def obter_conversor(do_ocr: bool = False, tabelas: str = "accurate"):
+    """Conversor do processo para as opções dadas (criado uma única vez)."""
+    chave = (do_ocr, tabelas)
+    with _conv_lock:
+        conv = _conversores.get(chave)
+        if conv is None:
+            conv = _novo_conversor(do_ocr, tabelas)
+            _conversores[chave] = conv
+        return conv
+
+
+def aquecer_conversor() -> None:
+    """Cria o conversor e carrega os modelos do pipeline PDF (inicializador de worker)."""
+    if DocumentConverter is None:
+        return
+    try:
+        do_ocr, tabelas, _ = opcoes_pipeline()
+        conv = obter_conversor(do_ocr, tabelas)
+        if PdfPipelineOptions is not None and hasattr(conv, "initialize_pipeline"):
+            conv.initialize_pipeline(InputFormat.PDF)
+    except Exception:
+        pass
+
+
+def _caminho_cache(doc_sha1: str, opcoes: Tuple) -> Path:
+    sufixo = hashlib.sha1(json.dumps(opcoes).encode("utf-8")).hexdigest()[:8]
+    return CACHE_DIR / f"{doc_sha1}-{sufixo}.md"
+
+
+VR_LABELS = re.compile(ROTULOS_VR, re.IGNORECASE)
+VA_LABELS = re.compile(ROTULOS_VA, re.IGNORECASE)
 
 # R$ 1.234,56 | 123,45 | 1000,00 etc.
 BRL_VALUE = r"R?\$?\s*\d{1,3}(?:\.\d{3})*,\d{2}|\d+(?:,\d{2})?"
@@ -51,16 +120,13 @@ def _norm_brl_to_float(s: str | None) -> Optional[float]:
         return None
 
 
-def _search_kv_nearby(text: str, label_regex: re.Pattern) -> Optional[str]:
-    # Look for monetary first, else percentage
-    for rx in (BRL_RE, PCT_RE):
-        for m in rx.finditer(text):
-            # scan around value for label presence
-            start = max(0, m.start() - 80)
-            end = min(len(text), m.end() + 80)
-            window = text[start:end]
-            if label_regex.search(window):
-                return m.group(0)
+def _search_kv_nearby(text: str, tipo: str) -> Optional[str]:
+    """Primeiro valor (R$, senão %) com rótulo `tipo` ("vr" | "va") a até 80 caracteres."""
+    occ = varrer(text)
+    for valor in ("brl", "pct"):
+        hits = proximas(occ[valor], occ[tipo], 80)
+        if hits:
+            return hits[0].texto
     return None
 
 
@@ -104,6 +170,57 @@ def _parse_markdown_tables(md: str) -> Dict[str, Optional[str]]:
     return {"vr": vr_val, "va": va_val}
 
 
+def resultado_erro(erro: str) -> Dict[str, Optional[str]]:
+    return {
+        "vr": None,
+        "va": None,
+        "vr_float": None,
+        "va_float": None,
+        "origem": f"docling_error:{erro}",
+    }
+
+
+def converter_markdown(
+    pdf_path: str | Path, doc_sha1: Optional[str] = None, digitalizado: Optional[bool] = None
+) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Converte o PDF com Docling e exporta markdown. Retorna (markdown, None) ou
+    (None, erro), com erro "import" quando o Docling não está instalado.
+    Com `doc_sha1`, usa/grava o cache em disco; `digitalizado` decide o OCR no modo auto.
+    """
+    if DocumentConverter is None:
+        return None, "import"
+    do_ocr, tabelas, paginas = opcoes_pipeline(digitalizado)
+    cache = _caminho_cache(doc_sha1, (do_ocr, tabelas, paginas)) if doc_sha1 else None
+    if cache is not None:
+        try:
+            if cache.exists():
+                return cache.read_text(encoding="utf-8"), None
+        except Exception:
+            pass
+    try:
+        conv = obter_conversor(do_ocr, tabelas)
+        if paginas is not None:
+            result = conv.convert(str(pdf_path), page_range=paginas)
+        else:
+            result = conv.convert(str(pdf_path))
+        doc = result.document
+        md = doc.export_to_markdown()
+    except Exception as e:  # pragma: no cover
+        msg = str(e)
+        msg = (msg[:40] + "...") if len(msg) > 40 else msg
+        return None, msg
+    if cache is not None:
+        try:
+            CACHE_DIR.mkdir(parents=True, exist_ok=True)
+            tmp = cache.with_suffix(f".{os.getpid()}.tmp")
+            tmp.write_text(md, encoding="utf-8")
+            os.replace(tmp, cache)
+        except Exception:
+            pass
+    return md, None
+
+
 def extrair_vr_va_docling(pdf_path: str | Path) -> Dict[str, Optional[str]]:
     """
     Extract VR/VA from a CCT PDF using Docling.
@@ -115,54 +232,41 @@ def extrair_vr_va_docling(pdf_path: str | Path) -> Dict[str, Optional[str]]:
     origem in { 'docling_table', 'docling_text', 'docling_error:<msg>' }
     Values may be monetary (R$ ...) or percentage (12%). Floats only for monetary values.
     """
-    pdf_path = str(pdf_path)
-
-    if DocumentConverter is None:
-        return {
-            "vr": None,
-            "va": None,
-            "vr_float": None,
-            "va_float": None,
-            "origem": "docling_error:import",
-        }
+    md, erro = converter_markdown(pdf_path)
+    if md is None:
+        return resultado_erro(erro or "")
+    return extrair_vr_va_de_markdown(md)
 
-    try:
-        conv = DocumentConverter()
-        result = conv.convert(pdf_path)
-        doc = result.document
-        md = doc.export_to_markdown()
-    except Exception as e:  # pragma: no cover
-        msg = str(e)
-        msg = (msg[:40] + "...") if len(msg) > 40 else msg
-        return {
-            "vr": None,
-            "va": None,
-            "vr_float": None,
-            "va_float": None,
-            "origem": f"docling_error:{msg}",
-        }
 
+def extrair_vr_va_de_markdown(md: str) -> Dict[str, Optional[str]]:
+    """Mesma extração de `extrair_vr_va_docling` sobre um markdown já convertido (artefato)."""
     # 1) Tables
     table_hit = _parse_markdown_tables(md)
     vr, va = table_hit.get("vr"), table_hit.get("va")
     origem: str = ""
+    # cláusulas de benefício do markdown (o documento inteiro se não houver)
+    clausulas = segmentar_clausulas(md)
+    alvo = texto_beneficio(clausulas) or md
     if vr or va:
         origem = "docling_table"
     else:
-        # 2) Text search with preserved order
-        vr = _search_kv_nearby(md, VR_LABELS)
-        va = _search_kv_nearby(md, VA_LABELS)
+        # 2) Text search with preserved order (cláusula a cláusula quando houver cláusulas de benefício)
+        if alvo is not md:
+            vr, va = valores_por_clausula(clausulas, lambda t: (_search_kv_nearby(t, "vr"), _search_kv_nearby(t, "va")))
+        else:
+            vr = _search_kv_nearby(alvo, "vr")
+            va = _search_kv_nearby(alvo, "va")
         if vr or va:
             origem = "docling_text"
 
     vr_float = _norm_brl_to_float(vr)
     va_float = _norm_brl_to_float(va)
 
-    # Heuristics for periodicidade and condicao (global scan on md)
+    # Heuristics for periodicidade (benefit clauses) and condicao (global scan on md)
     periodicidade: Optional[str]
-    if re.search(r"\b(por\s+dia|di[aá]rio|ao\s+dia)\b", md, flags=re.IGNORECASE):
+    if re.search(r"\b(por\s+dia|di[aá]rio|ao\s+dia)\b", alvo, flags=re.IGNORECASE):
         periodicidade = "diário"
-    elif re.search(r"\b(mensal|por\s+m[eê]s|ao\s+m[eê]s)\b", md, flags=re.IGNORECASE):
+    elif re.search(r"\b(mensal|por\s+m[eê]s|ao\s+m[eê]s)\b", alvo, flags=re.IGNORECASE):
         periodicidade = "mensal"
     else:
         periodicidade = None
@@ -3,11 +3,14 @@ import json
 import re
 from utils.config import get_llm
 
+# Versão do prompt de extração: alterar ao mudar o texto abaixo invalida o cache de extração
+PROMPT_VERSAO = "1"
+
 
 @tool("extrair_regras_da_cct")
 def extrair_regras_da_cct(texto_cct: str) -> str:
     """
-    Analisa o texto completo de uma CCT e extrai os valores de VR, VA e a
+    Analisa o texto de uma CCT (as cláusulas de VR/VA, quando indexadas) e extrai os valores de VR, VA e a
     quantidade de dias úteis. Retorna um JSON com as chaves:
       - valor_vr: float | null
       - valor_va: float | null
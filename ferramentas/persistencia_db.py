@@ -1,4 +1,6 @@
 import sqlite3
+import sys
+from io import StringIO
 from pathlib import Path
 import pandas as pd
 from langchain.tools import tool
@@ -24,6 +26,23 @@ def _get_conn() -> sqlite3.Connection:
     return sqlite3.connect(str(DB_PATH))
 
 
+def _atualizar_lookup_valores(conn: sqlite3.Connection, nome_tabela: str) -> None:
+    """
+    Tabela de valores por sindicato regravada: rematerializa `valores_sindicato_lookup` na
+    mesma conexão (senão o resolvedor seguiria com os valores antigos) e esquece os
+    negativos do resolvedor, se ele já estiver carregado no processo.
+    """
+    # import tardio: utils.valores_lookup importa DB_PATH deste módulo
+    from utils.valores_lookup import eh_tabela_origem, materializar_valores_sindicato
+
+    if not eh_tabela_origem(nome_tabela):
+        return
+    materializar_valores_sindicato(conn)
+    resolver = sys.modules.get("utils.regras_resolver")
+    if resolver is not None:
+        resolver.limpar_cache_negativo()
+
+
 @tool("salvar_dataframe_db")
 def salvar_dataframe_db(df_json: str, nome_tabela: str) -> str:
     """
@@ -31,9 +50,11 @@ def salvar_dataframe_db(df_json: str, nome_tabela: str) -> str:
     Substitui a tabela se já existir.
     """
     try:
-        df = pd.read_json(df_json, orient="records")
+        # StringIO: pandas recentes não aceitam o JSON literal em read_json
+        df = pd.read_json(StringIO(df_json), orient="records")
         with _get_conn() as conn:
             df.to_sql(nome_tabela, conn, if_exists="replace", index=False)
+            _atualizar_lookup_valores(conn, nome_tabela)
         return f"OK: tabela '{nome_tabela}' com {len(df)} linhas salva em {DB_PATH.name}."
     except Exception as e:
         return f"ERRO ao salvar '{nome_tabela}': {e}"
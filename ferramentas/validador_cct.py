@@ -2,10 +2,17 @@ from __future__ import annotations
 
 from dataclasses import dataclass, asdict
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import hashlib
 import json
+import os
 
-from utils.regras_resolver import resolve_cct_rules
+import numpy as np
+import pandas as pd
+
+from utils.pre_resolucao_llm import pre_resolver_llm
+from utils.regras_resolver import resolver_regras_lote, versao_fontes_fallback
+from utils.regras_snapshot import obter_snapshot
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 CHROMA_DIR = BASE_DIR / "base_conhecimento" / "chromadb"
@@ -22,35 +29,6 @@ def _read_json(path: Path) -> Optional[object]:
     return None
 
 
-def _parse_brl(v: Any) -> Optional[float]:
-    if v is None:
-        return None
-    try:
-        s = str(v)
-        if not s:
-            return None
-        s = s.replace("R$", "").replace(" ", "").replace(".", "").replace(",", ".")
-        return float(s)
-    except Exception:
-        return None
-
-
-def _eq_money(a: Any, b: Any) -> bool:
-    va = _parse_brl(a)
-    vb = _parse_brl(b)
-    if va is None and vb is None:
-        return True
-    if va is None or vb is None:
-        return False
-    return abs(va - vb) < 0.005
-
-
-def _eq_norm(a: Any, b: Any) -> bool:
-    if a is None and b is None:
-        return True
-    return str(a).strip().lower() == str(b).strip().lower()
-
-
 @dataclass
 class ComplianceItem:
     uf: str
@@ -69,108 +47,212 @@ class ComplianceItem:
     detalhes: str
 
 
-def validar_compliance_cct() -> Dict[str, Any]:
+_CAMPOS_OCR = ("vr_valor", "va_valor", "dias", "periodicidade")
+
+
+def _impressao(obj: Any) -> str:
+    return hashlib.sha1(json.dumps(obj, sort_keys=True, ensure_ascii=False, default=str).encode("utf-8")).hexdigest()
+
+
+def _parse_brl_serie(s: pd.Series) -> pd.Series:
+    """Valores BRL ("R$ 1.234,56") -> float; None/vazio/inválido -> NaN."""
+    txt = s.map(lambda v: None if v is None else str(v))
+    limpo = (
+        txt.str.replace("R$", "", regex=False).str.replace(" ", "", regex=False)
+        .str.replace(".", "", regex=False).str.replace(",", ".", regex=False)
+    )
+    return pd.to_numeric(limpo.where(limpo != ""), errors="coerce")
+
+
+def _eq_money_serie(a: pd.Series, b: pd.Series) -> pd.Series:
+    """Igualdade monetária linha a linha (tolerância de meio centavo; ambos ausentes = igual)."""
+    va, vb = _parse_brl_serie(a), _parse_brl_serie(b)
+    return (va.isna() & vb.isna()) | ((va - vb).abs() < 0.005)
+
+
+def _texto_norm(s: pd.Series) -> pd.Series:
+    # str(valor).strip().lower(), com None -> "none" (22 e "22" são iguais; 22 e 22.0 não)
+    return s.astype(object).where(s.notna(), "None").map(str).str.strip().str.lower()
+
+
+def _eq_norm_serie(a: pd.Series, b: pd.Series) -> pd.Series:
+    return (a.isna() & b.isna()) | (_texto_norm(a) == _texto_norm(b))
+
+
+def _impressoes_sistema(pares: List[Tuple[str, str]], competencia: Any) -> Tuple[Dict[Tuple[str, str], str], str]:
+    """Impressão da regra direta do snapshot por par e das fontes da cadeia de fallback."""
+    try:
+        snap = obter_snapshot()
+    except Exception:
+        snap = None
+    sys_ = {par: _impressao(snap.consultar(*par, competencia) if snap is not None else None) for par in pares}
+    return sys_, _impressao({"fallback": versao_fontes_fallback(), "competencia": competencia})
+
+
+def _ler_estado(path: Path) -> Dict[str, Any]:
+    data = _read_json(path)
+    return data if isinstance(data, dict) and isinstance(data.get("pares"), dict) else {"pares": {}}
+
+
+def _escrever_relatorio(path: Path, resumo: Dict[str, Any], extras: Dict[str, Any], itens: Iterable[Dict[str, Any]]) -> None:
+    """Grava o JSON item a item (sem serializar o documento inteiro numa única string)."""
+    tmp = path.with_suffix(".tmp")
+    with tmp.open("w", encoding="utf-8") as fp:
+        fp.write('{\n  "resumo": ' + json.dumps(resumo, ensure_ascii=False))
+        for k, v in extras.items():
+            fp.write(f',\n  {json.dumps(k)}: ' + json.dumps(v, ensure_ascii=False, default=str))
+        fp.write(',\n  "itens": [')
+        for n, item in enumerate(itens):
+            fp.write(("," if n else "") + "\n    " + json.dumps(item, ensure_ascii=False, default=str))
+        fp.write("\n  ]\n}\n")
+    os.replace(tmp, path)
+
+
+def validar_compliance_cct(incremental: bool = False, competencia: Any = None) -> Dict[str, Any]:
     """
     Compara regras extraídas por OCR (rules_index.json) com as regras resolvidas pelo sistema
     (overrides/SQLite/retrieval) e sinaliza divergências ou faltas. Retorna um relatório estruturado
     e salva um JSON em relatorios_saida/cct_compliance.json.
+
+    Os pares (UF, sindicato) são resolvidos numa única chamada em lote e a comparação é
+    vetorizada. Com `incremental=True`, só são resolvidos de novo os pares cujo OCR ou regra
+    do snapshot mudou desde o último relatório (estado em cct_compliance_estado.json); pares
+    resolvidos fora do snapshot (alias, LLM, SQLite, retrieval) também são refeitos quando
+    alguma fonte da cadeia de fallback ou a competência mudou.
     """
     CHROMA_DIR.mkdir(parents=True, exist_ok=True)
     RELATORIOS_DIR.mkdir(parents=True, exist_ok=True)
 
     # Unificado: usar base_conhecimento/rules_index.json
     rules_index_path = RULES_INDEX_ROOT
-    rules_index = _read_json(rules_index_path) or []
-
-    itens: List[ComplianceItem] = []
-    for item in rules_index:
-        uf = (item.get("uf") or "").upper() or "DESCONHECIDO"
-        sind = (item.get("sindicato") or "").strip() or "DESCONHECIDO"
-        ocr_vr = item.get("vr_valor")
-        ocr_va = item.get("va_valor")
-        ocr_dias = item.get("dias")
-        ocr_per = item.get("periodicidade")
-
-        sys = resolve_cct_rules(uf, sind)
-        sys_vr = sys.get("vr_valor")
-        sys_va = sys.get("va_valor")
-        sys_dias = sys.get("dias")
-        sys_per = sys.get("periodicidade")
-        origem = sys.get("origem", "nao_encontrado")
-
-        # Determine status
-        missing_ocr = (ocr_vr is None and ocr_va is None and ocr_dias is None and ocr_per is None)
-        missing_sys = (origem == "nao_encontrado") or (sys_vr is None and sys_va is None and sys_dias is None and sys_per is None)
-
-        if missing_ocr and missing_sys:
-            status = "missing_ocr"
-            site_flag = True
-            detalhes = "OCR não extraiu valores e o sistema não possui regra."
-        elif missing_ocr and not missing_sys:
-            status = "missing_ocr"
-            site_flag = True
-            detalhes = "OCR não extraiu valores. Sistema possui regra — revisar CCT oficial para confirmar."
-        elif not missing_ocr and missing_sys:
-            status = "missing_system"
-            site_flag = True
-            detalhes = "Sistema não possui regra para UF/Sindicato presentes no OCR."
+    rules_index = [i for i in (_read_json(rules_index_path) or []) if isinstance(i, dict)]
+
+    df = pd.DataFrame({
+        "uf": [(i.get("uf") or "").upper() or "DESCONHECIDO" for i in rules_index],
+        "sindicato": [(i.get("sindicato") or "").strip() or "DESCONHECIDO" for i in rules_index],
+        **{f"{c}_ocr": pd.Series([i.get(c) for i in rules_index], dtype=object) for c in _CAMPOS_OCR},
+    })
+
+    # impressões por par: OCR (itens do índice) e regra determinística vigente (snapshot)
+    pares = list(dict.fromkeys(zip(df["uf"], df["sindicato"])))
+    ocr_por_par: Dict[Tuple[str, str], List[Any]] = {}
+    for i, par in zip(rules_index, zip(df["uf"], df["sindicato"])):
+        ocr_por_par.setdefault(par, []).append([i.get(c) for c in _CAMPOS_OCR])
+    sys_imp, fontes = _impressoes_sistema(pares, competencia)
+    impressoes = {par: {"ocr": _impressao(ocr_por_par[par]), "sys": sys_imp[par]} for par in pares}
+    # regra direta do snapshot: a impressão "sys" basta; demais origens dependem destas fontes
+    direto = _impressao(None)
+
+    estado_path = RELATORIOS_DIR / "cct_compliance_estado.json"
+    estado_anterior = _ler_estado(estado_path) if incremental else {"pares": {}}
+    anterior = estado_anterior["pares"]
+    mesmas_fontes = estado_anterior.get("fontes") == fontes
+    sistema: Dict[Tuple[str, str], Dict[str, Any]] = {}
+    a_resolver: List[Tuple[str, str]] = []
+    for par in pares:
+        prev = anterior.get(f"{par[0]}::{par[1]}")
+        if (
+            prev and prev.get("ocr") == impressoes[par]["ocr"] and prev.get("sys") == impressoes[par]["sys"]
+            and (mesmas_fontes or impressoes[par]["sys"] != direto)
+        ):
+            sistema[par] = prev.get("regra") or {}
         else:
-            # Both sides have something; compare fields
-            mismatches: List[str] = []
-            if (ocr_vr is not None or sys_vr is not None) and not _eq_money(ocr_vr, sys_vr):
-                mismatches.append(f"VR difere (OCR={ocr_vr} vs SYS={sys_vr})")
-            if (ocr_va is not None or sys_va is not None) and not _eq_money(ocr_va, sys_va):
-                mismatches.append(f"VA difere (OCR={ocr_va} vs SYS={sys_va})")
-            if (ocr_dias is not None or sys_dias is not None) and not _eq_norm(ocr_dias, sys_dias):
-                mismatches.append(f"Dias difere (OCR={ocr_dias} vs SYS={sys_dias})")
-            if (ocr_per is not None or sys_per is not None) and not _eq_norm(ocr_per, sys_per):
-                mismatches.append(f"Periodicidade difere (OCR={ocr_per} vs SYS={sys_per})")
-
-            if mismatches:
-                status = "mismatch"
-                site_flag = True
-                detalhes = "; ".join(mismatches)
-            else:
-                status = "ok"
-                site_flag = False
-                detalhes = "Regras consistentes."
-
-        itens.append(
-            ComplianceItem(
-                uf=uf,
-                sindicato=sind,
-                origem_sistema=origem,
-                vr_ocr=ocr_vr,
-                va_ocr=ocr_va,
-                dias_ocr=ocr_dias,
-                periodicidade_ocr=ocr_per,
-                vr_sistema=sys_vr,
-                va_sistema=sys_va,
-                dias_sistema=sys_dias,
-                periodicidade_sistema=sys_per,
-                status=status,
-                site_check_recommended=site_flag,
-                detalhes=detalhes,
-            )
+            a_resolver.append(par)
+    pre_resolucao: Dict[str, Any] = {}
+    if a_resolver:
+        # extrações LLM dos pares fora do snapshot em paralelo (limite de taxa + retentativas);
+        # o lote seguinte os encontra no snapshot em vez de chamar o LLM par a par
+        if os.getenv("VRVA_PRE_RESOLUCAO_LLM", "1") != "0":
+            try:
+                pre_resolucao = pre_resolver_llm(a_resolver, competencia)
+            except Exception as e:
+                pre_resolucao = {"erro": str(e)}
+        sistema.update(resolver_regras_lote(a_resolver, competencia))
+        if pre_resolucao.get("resolvidos"):
+            # pré-resoluções gravadas mudaram o snapshot: o estado guarda as impressões atuais
+            sys_imp, fontes = _impressoes_sistema(pares, competencia)
+            for par in pares:
+                impressoes[par]["sys"] = sys_imp[par]
+
+    regras_sys = [sistema.get(par) or {} for par in zip(df["uf"], df["sindicato"])]
+    for c in _CAMPOS_OCR:
+        df[f"{c}_sys"] = pd.Series([r.get(c) for r in regras_sys], dtype=object)
+    df["origem"] = [r.get("origem", "nao_encontrado") for r in regras_sys]
+
+    # Determine status (vetorizado)
+    ocr_cols = [f"{c}_ocr" for c in _CAMPOS_OCR]
+    sys_cols = [f"{c}_sys" for c in _CAMPOS_OCR]
+    missing_ocr = df[ocr_cols].isna().all(axis=1)
+    missing_sys = (df["origem"] == "nao_encontrado") | df[sys_cols].isna().all(axis=1)
+    dif = {
+        "VR": ~_eq_money_serie(df["vr_valor_ocr"], df["vr_valor_sys"]),
+        "VA": ~_eq_money_serie(df["va_valor_ocr"], df["va_valor_sys"]),
+        "Dias": ~_eq_norm_serie(df["dias_ocr"], df["dias_sys"]),
+        "Periodicidade": ~_eq_norm_serie(df["periodicidade_ocr"], df["periodicidade_sys"]),
+    }
+    algum_dif = pd.concat(dif.values(), axis=1).any(axis=1)
+    df["status"] = np.select(
+        [missing_ocr, missing_sys, algum_dif], ["missing_ocr", "missing_system", "mismatch"], default="ok"
+    )
+    df["site_check_recommended"] = df["status"] != "ok"
+    det_base = np.select(
+        [missing_ocr & missing_sys, missing_ocr, missing_sys],
+        [
+            "OCR não extraiu valores e o sistema não possui regra.",
+            "OCR não extraiu valores. Sistema possui regra — revisar CCT oficial para confirmar.",
+            "Sistema não possui regra para UF/Sindicato presentes no OCR.",
+        ],
+        default="Regras consistentes.",
+    )
+    pares_campos = (("VR", "vr_valor"), ("VA", "va_valor"), ("Dias", "dias"), ("Periodicidade", "periodicidade"))
+    detalhes = list(det_base)
+    for n in np.flatnonzero((df["status"] == "mismatch").to_numpy()):
+        detalhes[n] = "; ".join(
+            f"{rot} difere (OCR={df.at[n, f'{c}_ocr']} vs SYS={df.at[n, f'{c}_sys']})"
+            for rot, c in pares_campos if dif[rot].iat[n]
         )
+    df["detalhes"] = detalhes
 
+    itens = [
+        asdict(ComplianceItem(
+            uf=r["uf"], sindicato=r["sindicato"], origem_sistema=r["origem"],
+            vr_ocr=r["vr_valor_ocr"], va_ocr=r["va_valor_ocr"], dias_ocr=r["dias_ocr"], periodicidade_ocr=r["periodicidade_ocr"],
+            vr_sistema=r["vr_valor_sys"], va_sistema=r["va_valor_sys"], dias_sistema=r["dias_sys"],
+            periodicidade_sistema=r["periodicidade_sys"], status=r["status"],
+            site_check_recommended=bool(r["site_check_recommended"]), detalhes=r["detalhes"],
+        ))
+        for r in df.to_dict("records")
+    ]
+    status = df["status"].value_counts()
     resumo = {
         "total": len(itens),
-        "ok": sum(1 for i in itens if i.status == "ok"),
-        "mismatch": sum(1 for i in itens if i.status == "mismatch"),
-        "missing_system": sum(1 for i in itens if i.status == "missing_system"),
-        "missing_ocr": sum(1 for i in itens if i.status == "missing_ocr"),
-        "site_check_recommended": sum(1 for i in itens if i.site_check_recommended),
+        "ok": int(status.get("ok", 0)),
+        "mismatch": int(status.get("mismatch", 0)),
+        "missing_system": int(status.get("missing_system", 0)),
+        "missing_ocr": int(status.get("missing_ocr", 0)),
+        "site_check_recommended": int(df["site_check_recommended"].sum()),
+    }
+    execucao = {
+        "incremental": bool(incremental), "pares": len(pares), "reverificados": len(a_resolver),
+        "pre_resolucao": pre_resolucao,
     }
 
     rel = {
         "resumo": resumo,
-        "itens": [asdict(i) for i in itens],
+        "itens": itens,
+        "execucao": execucao,
     }
 
     out_path = RELATORIOS_DIR / "cct_compliance.json"
     try:
-        out_path.write_text(json.dumps(rel, ensure_ascii=False, indent=2), encoding="utf-8")
+        _escrever_relatorio(out_path, resumo, {"execucao": execucao}, itens)
+        estado = {
+            f"{par[0]}::{par[1]}": {**impressoes[par], "regra": sistema.get(par) or {}}
+            for par in pares
+        }
+        estado_path.write_text(
+            json.dumps({"fontes": fontes, "pares": estado}, ensure_ascii=False, default=str), encoding="utf-8"
+        )
     except Exception:
         pass
     return rel
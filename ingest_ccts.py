@@ -1,12 +1,13 @@
 from pathlib import Path
+from dataclasses import asdict
 from typing import List, Optional, Tuple, Dict
-import io
+import os
 import re
-import hashlib
+import threading
+import json
+import time
 
 import fitz  # PyMuPDF
-import chromadb
-from chromadb.config import Settings
 from PIL import Image
 import pytesseract
 import pdfplumber
@@ -15,12 +16,32 @@ import numpy as np
 import sqlite3
 
 from ferramentas.persistencia_db import DB_PATH
+from utils.checkpoint_ingestao import (
+    etapas_concluidas, gravar_resumo, registrar_etapa, remover_checkpoints,
+)
+from utils.clausulas import (
+    Clausula, clausulas_para_dicts, remover_clausulas, salvar_clausulas, segmentar_clausulas, texto_beneficio,
+    valores_por_clausula,
+)
+from utils.artefato_pdf import ArtefatoPDF, carregar_artefato, remover_artefatos, salvar_artefato, sha1_arquivo
+from utils.ingestao_incremental import ingeridos_regras_cct, reconstruir_rules_index, selecionar_pdfs
+from utils.ocr_adaptativo import IDIOMA as IDIOMA_OCR, ResultadoOCR, gravar_ocr_lote, ocr_pagina
+from utils.palavras_chave import (
+    ESTADOS, ROTULOS_VA, ROTULOS_VR, UFS as _UFS,
+    contar_ufs, proximas, seguido_por, valores_vr_va, varrer,
+)
+from utils.registro_sindicatos import obter_registro, salvar_registro
+from utils.vigencia import inferir_vigencia
+from utils.vector_store import obter_colecao, remover_obsoletos, upsert_em_lotes
 
 # Docling extractor (new)
 try:
-    from ferramentas.extracao_cct_docling import extrair_vr_va_docling
+    from ferramentas.extracao_cct_docling import (
+        aquecer_conversor, converter_markdown, extrair_vr_va_de_markdown, resultado_erro,
+    )
 except Exception:
-    extrair_vr_va_docling = None  # type: ignore
+    converter_markdown = None  # type: ignore
+    aquecer_conversor = None  # type: ignore
 
 BASE_DIR = Path(__file__).resolve().parent
 PDF_DIR = BASE_DIR / "base_conhecimento" / "ccts_pdfs"
@@ -29,9 +50,9 @@ RULES_INDEX_ROOT = BASE_DIR / "base_conhecimento" / "rules_index.json"
 
 # ... (rest of the code remains the same)
 
-def preprocess_for_ocr(pil_img: Image.Image) -> Image.Image:
+def preprocess_for_ocr(pil_img, escala: float = 1.3) -> Image.Image:
     """OpenCV pipeline: grayscale, denoise, threshold (Otsu), deskew, slight upscale."""
-    img = np.array(pil_img)
+    img = pil_img if isinstance(pil_img, np.ndarray) else np.array(pil_img)
     if img.ndim == 3:
         gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
     else:
@@ -57,8 +78,10 @@ def preprocess_for_ocr(pil_img: Image.Image) -> Image.Image:
     center = (w // 2, h // 2)
     M = cv2.getRotationMatrix2D(center, angle, 1.0)
     rotated = cv2.warpAffine(th, M, (w, h), flags=cv2.INTER_CUBIC, borderMode=cv2.BORDER_REPLICATE)
-    # Upscale
-    up = cv2.resize(rotated, None, fx=1.3, fy=1.3, interpolation=cv2.INTER_CUBIC)
+    # Upscale (o OCR adaptativo já escolhe o DPI e passa escala 1.0)
+    if escala == 1.0:
+        return Image.fromarray(rotated)
+    up = cv2.resize(rotated, None, fx=escala, fy=escala, interpolation=cv2.INTER_CUBIC)
     return Image.fromarray(up)
 
 def ocr_with_tesseract(pil_img: Image.Image) -> str:
@@ -73,26 +96,97 @@ def ocr_with_tesseract(pil_img: Image.Image) -> str:
             continue
     return ""
 
-def extract_text_from_pdf(pdf_path: Path) -> tuple[str, int, int]:
-    doc = fitz.open(pdf_path)
-    total_pages = len(doc)
-    ocr_pages = 0
-    texts: List[str] = []
-    # Try pdfplumber alongside PyMuPDF for better layout/tables
+# OCR das páginas fracas em paralelo: o Tesseract roda fora do processo e o OpenCV libera
+# o GIL, então threads bastam. A renderização (PyMuPDF) é serializada por documento.
+# Cada página passa pelo OCR adaptativo (utils/ocr_adaptativo.py): classificação em baixa
+# resolução, PSM pelo layout, escada de DPI guiada pela confiança e cache por imagem.
+OCR_THREADS = int(os.getenv("VRVA_OCR_THREADS", str(min(4, os.cpu_count() or 1))))
+
+def pixmap_para_array(pix) -> np.ndarray:
+    """Amostras do pixmap como array (altura, largura, canais) sem cópia nem PNG intermediário."""
+    buf = getattr(pix, "samples_mv", None)
+    if buf is None:
+        buf = pix.samples
+    arr = np.frombuffer(buf, dtype=np.uint8).reshape(pix.height, pix.stride)
+    arr = arr[:, : pix.width * pix.n].reshape(pix.height, pix.width, pix.n)
+    return arr[:, :, 0] if pix.n == 1 else arr
+
+def _tesseract_dados(img, psm: int) -> dict:
+    return pytesseract.image_to_data(
+        img, lang=IDIOMA_OCR, config=f"--oem 1 --psm {psm}", output_type=pytesseract.Output.DICT
+    )
+
+def _ocr_pagina_doc(doc, i: int, lock: threading.Lock, usar_cache: bool = True, gravar=None) -> str:
+    vivos = []  # pixmaps referenciados enquanto os arrays (visões das amostras) estão em uso
+
+    def renderizar(dpi: int) -> np.ndarray:
+        with lock:
+            pix = doc[i].get_pixmap(dpi=dpi, colorspace=fitz.csGRAY)
+        vivos.append(pix)
+        return pixmap_para_array(pix)
+
     try:
-        plumber = pdfplumber.open(str(pdf_path))
+        res = ocr_pagina(
+            renderizar, _tesseract_dados, lambda img: preprocess_for_ocr(img, escala=1.0), usar_cache, gravar
+        )
+        return res.texto
     except Exception:
-        plumber = None
+        return ""
+    finally:
+        vivos.clear()
+
+def ocr_paginas(
+    doc, indices: List[int], threads: Optional[int] = None, usar_cache: bool = True, gravar=None
+) -> Dict[int, str]:
+    """
+    OCR adaptativo das páginas `indices` de um documento PyMuPDF aberto; índice -> texto.
+    `gravar(chave, resultado)` recebe as entradas novas do cache de OCR em vez do SQLite.
+    """
+    out: Dict[int, str] = {}
+    if not indices:
+        return out
+    lock = threading.Lock()
+    n = max(1, int(threads or OCR_THREADS))
+    if n == 1 or len(indices) == 1:
+        for i in indices:
+            out[i] = _ocr_pagina_doc(doc, i, lock, usar_cache, gravar)
+        return out
+    from concurrent.futures import ThreadPoolExecutor
+    with ThreadPoolExecutor(max_workers=min(n, len(indices)), thread_name_prefix="ocr") as ex:
+        futuros = {i: ex.submit(_ocr_pagina_doc, doc, i, lock, usar_cache, gravar) for i in indices}
+        for i, fut in futuros.items():
+            out[i] = fut.result()
+    return out
+
+def extrair_paginas(pdf_path: Path, gravar=None) -> Tuple[List[str], List[str], List[List[str]]]:
+    """
+    Texto por página (PyMuPDF -> pdfplumber -> OCR), origem de cada página e as linhas de
+    tabela lidas pelo pdfplumber. O pdfplumber só é aberto se alguma página vier fraca.
+    """
+    doc = fitz.open(pdf_path)
+    texts: List[str] = []
+    origens: List[str] = []
+    tabelas: List[List[str]] = []
+    fracas: List[int] = []
+    plumber = None
+    plumber_aberto = False
     for i, page in enumerate(doc):
         # 1) PyMuPDF plain text
         txt = page.get_text("text")
+        origem = "pymupdf"
+        tbl_texts: List[str] = []
         # 2) If weak, try pdfplumber text (and append tables text)
         if (not txt) or (len(txt.strip()) < 30):
+            if not plumber_aberto:
+                plumber_aberto = True
+                try:
+                    plumber = pdfplumber.open(str(pdf_path))
+                except Exception:
+                    plumber = None
             try:
                 if plumber:
                     p2 = plumber.pages[i]
                     t2 = p2.extract_text() or ""
-                    tbl_texts = []
                     try:
                         tables = p2.extract_tables() or []
                         for tbl in tables:
@@ -104,30 +198,43 @@ def extract_text_from_pdf(pdf_path: Path) -> tuple[str, int, int]:
                     combo = (t2 + "\n" + "\n".join(tbl_texts)).strip()
                     if len(combo) > len(txt or ""):
                         txt = combo
+                        origem = "pdfplumber"
             except Exception:
                 pass
-        # 3) If still weak, OCR fallback with preprocessing
+        # 3) If still weak, OCR fallback with preprocessing (em lote, abaixo)
         if (not txt) or (len(txt.strip()) < 30):
-            try:
-                pix = page.get_pixmap(dpi=300)
-                img_bytes = pix.tobytes("png")
-                img = Image.open(io.BytesIO(img_bytes))
-                img_prep = preprocess_for_ocr(img)
-                txt = ocr_with_tesseract(img_prep)
-                if txt:
-                    ocr_pages += 1
-                else:
-                    txt = ""
-            except Exception:
-                txt = ""
+            fracas.append(i)
+            txt = ""
+            origem = ""
         texts.append(txt)
+        origens.append(origem)
+        tabelas.append(tbl_texts)
+    for i, txt in ocr_paginas(doc, fracas, gravar=gravar).items():
+        if txt:
+            texts[i] = txt
+            origens[i] = "ocr"
     doc.close()
     try:
         if plumber:
             plumber.close()
     except Exception:
         pass
-    return "\n".join(texts), ocr_pages, total_pages
+    return texts, origens, tabelas
+
+def extract_text_from_pdf(pdf_path: Path) -> tuple[str, int, int]:
+    texts, origens, _ = extrair_paginas(pdf_path)
+    return "\n".join(texts), sum(1 for o in origens if o == "ocr"), len(texts)
+
+def montar_artefato(pdf: Path, doc_sha1: Optional[str], gravar=None) -> ArtefatoPDF:
+    """Parse único do PDF: páginas (texto/origem/tabelas) + markdown do Docling."""
+    paginas, origens, tabelas = extrair_paginas(pdf, gravar)
+    # digitalizado = alguma página sem texto embutido (OCR do Docling só nesses PDFs no modo auto)
+    digitalizado = any(o in ("ocr", "") for o in origens)
+    md, erro = (None, "import") if converter_markdown is None else converter_markdown(pdf, doc_sha1, digitalizado)
+    return ArtefatoPDF(
+        doc_sha1=doc_sha1 or "", arquivo=pdf.name, paginas=paginas, origens=origens,
+        tabelas=tabelas, markdown=md, docling_erro=erro,
+    )
 
 def chunk_text(text: str, chunk_size: int = 1200, overlap: int = 150) -> List[str]:
     chunks: List[str] = []
@@ -143,26 +250,29 @@ def chunk_text(text: str, chunk_size: int = 1200, overlap: int = 150) -> List[st
             break
     return chunks
 
-def extract_rules_from_text(text: str) -> dict:
-    """Heurística simples para VR/VA por dia/mês e dias. Retorna dicionário com campos quando encontrados."""
+def _condicao_desligamento(s: str) -> Optional[str]:
+    # Condição: comunicado até o dia 15
+    if re.search(r"comunicad[oa].{0,20}at[eé]\s+o\s+dia\s*15", s, flags=re.IGNORECASE):
+        return "comunicado <= 15"
+    return None
+
+def extract_rules_from_text(text: str, clausulas: Optional[List[Clausula]] = None) -> dict:
+    """
+    Heurística simples para VR/VA por dia/mês e dias. Retorna dicionário com campos quando encontrados.
+    Com `clausulas` (de benefício), VR/VA vêm cláusula a cláusula: VR das rotuladas "vr", VA das "va".
+    """
     out: dict = {}
     s = " ".join(text.split())  # normalize spaces
-    # moeda BR
-    money = r"R\$\s?\d{1,3}(?:\.\d{3})*(,\d{2})"
-    # Sinonímias e variações: VR/refeição/vale refeição/auxílio refeição
-    kw_ref = r"(?:\bVR\b|refei[cç][aã]o|vale[\s\-_]*refei[cç][aã]o|aux[ií]lio[\s\-_]*refei[cç][aã]o)"
-    # VA/alimentação/vale alimentação/auxílio alimentação
-    kw_ali = r"(?:\bVA\b|alimenta[cç][aã]o|vale[\s\-_]*alimenta[cç][aã]o|aux[ií]lio[\s\-_]*alimenta[cç][aã]o)"
-    # Proximidade em qualquer ordem (keyword perto de valor)
-    prox = 80
-    pat_vr = rf"(?:{kw_ref}[^\n\r]{{0,{prox}}}({money})|({money})[^\n\r]{{0,{prox}}}{kw_ref})"
-    pat_va = rf"(?:{kw_ali}[^\n\r]{{0,{prox}}}({money})|({money})[^\n\r]{{0,{prox}}}{kw_ali})"
-    m_vr = re.search(pat_vr, s, flags=re.IGNORECASE)
-    m_va = re.search(pat_va, s, flags=re.IGNORECASE)
+    # Rótulo de VR/VA perto (até 80 caracteres, em qualquer ordem) de um valor em R$:
+    # ocorrências da varredura única (utils/palavras_chave), casadas por posição
+    if clausulas and any(c.beneficio and c.texto for c in clausulas):
+        m_vr, m_va = valores_por_clausula(clausulas, lambda t: valores_vr_va(" ".join(t.split()), 80))
+    else:
+        m_vr, m_va = valores_vr_va(s, 80)
     if m_vr:
-        out["vr_valor"] = next(g for g in m_vr.groups() if g and g.startswith("R$"))
+        out["vr_valor"] = m_vr.texto
     if m_va:
-        out["va_valor"] = next(g for g in m_va.groups() if g and g.startswith("R$"))
+        out["va_valor"] = m_va.texto
     # Dias (ex.: 22 dias, 22 dias úteis)
     dias = re.search(r"(\b\d{1,2}\b)\s+dias(\s+\b[uú]teis\b)?", s, flags=re.IGNORECASE)
     if dias:
@@ -176,11 +286,7 @@ def extract_rules_from_text(text: str) -> dict:
         out["periodicidade"] = "mensal"
     else:
         out["periodicidade"] = None
-    # Condição: comunicado até o dia 15
-    if re.search(r"comunicad[oa].{0,20}at[eé]\s+o\s+dia\s*15", s, flags=re.IGNORECASE):
-        out["condicao"] = "comunicado <= 15"
-    else:
-        out["condicao"] = None
+    out["condicao"] = _condicao_desligamento(s)
     # Normalização simples: se valor diário e dias presentes, estima mensal
     def parse_brl(v: str) -> Optional[float]:
         try:
@@ -196,20 +302,8 @@ def extract_rules_from_text(text: str) -> dict:
     return out
 
 # -- Robust fallback regex for VR/VA (currency and percentage) --
-VR_LABELS = re.compile(
-    r"(?:\bVR\b|"
-    r"vale[-\s]?refei[cç][aã]o|aux[ií]lio[-\s]?refei[cç][aã]o|refei[cç][aã]o|tele[-\s]?refei[cç][aã]o|"
-    r"ticket[-\s]?refei[cç][aã]o|cart[aã]o[-\s]?refei[cç][aã]o|benef[ií]cio[-\s]?refei[cç][aã]o|refei[cç][aã]o[-\s]?conv[eê]nio"
-    r")",
-    re.IGNORECASE,
-)
-VA_LABELS = re.compile(
-    r"(?:\bVA\b|"
-    r"vale[-\s]?alimenta[cç][aã]o|aux[ií]lio[-\s]?alimenta[cç][aã]o|alimenta[cç][aã]o|"
-    r"ticket[-\s]?alimenta[cç][aã]o|cart[aã]o[-\s]?alimenta[cç][aã]o|cesta[-\s]?b[aá]sica|aux[ií]lio[-\s]?cesta|alimenta[cç][aã]o[-\s]?conv[eê]nio"
-    r")",
-    re.IGNORECASE,
-)
+VR_LABELS = re.compile(ROTULOS_VR, re.IGNORECASE)
+VA_LABELS = re.compile(ROTULOS_VA, re.IGNORECASE)
 BRL_VALUE = r"R?\$?\s*\d{1,3}(?:\.\d{3})*,\d{2}|\d+(?:,\d{2})?"
 PCT_VALUE = r"\d{1,3}(?:,\d+)?\s*%"
 BRL_RE = re.compile(BRL_VALUE)
@@ -235,159 +329,300 @@ def _fallback_vr_va_from_text(text: str) -> Tuple[Optional[str], Optional[str],
     origem = ""
     vr = None
     va = None
-    # Search values, prefer currency, then percentage; ensure labels close by
-    for rx in (BRL_RE, PCT_RE):
-        for m in rx.finditer(s):
-            start = max(0, m.start() - 80)
-            end = min(len(s), m.end() + 80)
-            win = s[start:end]
-            if vr is None and VR_LABELS.search(win):
-                vr = m.group(0)
-            if va is None and VA_LABELS.search(win):
-                va = m.group(0)
-            if vr and va:
-                break
-        if vr and va:
-            break
+    # Search values, prefer currency, then percentage; ensure labels close by (±80 caracteres)
+    occ = varrer(s)
+    for tipo in ("brl", "pct"):
+        if vr is None:
+            hits = proximas(occ[tipo], occ["vr"], 80)
+            vr = hits[0].texto if hits else None
+        if va is None:
+            hits = proximas(occ[tipo], occ["va"], 80)
+            va = hits[0].texto if hits else None
     if vr or va:
         origem = "text_fallback"
     return vr, va, origem
 
-def main():
+# Padrão de UF (siglas BR) e nomes de estados (PT-BR, sem acento) -> UF
+UFS = _UFS
+STATE_NAME_TO_UF = ESTADOS
+
+def infer_uf_from_filename(name: str) -> Optional[str]:
+    parts = re.split(r"\W+", name.upper())
+    for p in parts:
+        if p in UFS:
+            return p
+    # tentar por nome de estado no próprio nome do arquivo
+    try:
+        import unicodedata as _ud
+        tnorm = _ud.normalize("NFKD", str(name)).encode("ascii", "ignore").decode("ascii").lower()
+    except Exception:
+        tnorm = str(name).lower()
+    for nome, sigla in STATE_NAME_TO_UF.items():
+        # match por palavra inteira
+        if re.search(rf"\b{re.escape(nome)}\b", tnorm):
+            return sigla
+    return None
+
+def _detect_ufs_in_text(text: str) -> Dict[str, int]:
+    # Nomes de estado (palavra inteira, sem acento) + siglas isoladas, na mesma varredura
+    # usada pelas regras (texto com espaços normalizados)
+    return contar_ufs(" ".join(str(text).split()))
+
+def infer_uf_from_text(text: str) -> Optional[str]:
+    counts = _detect_ufs_in_text(text)
+    if not counts:
+        return None
+    # retorna a UF com maior contagem
+    return sorted(counts.items(), key=lambda kv: (-kv[1], kv[0]))[0][0]
+
+def infer_uf_from_sindicato_name(s: Optional[str]) -> Optional[str]:
+    if not s:
+        return None
+    s_up = str(s).upper()
+    # Tenta siglas primeiro em sindicato
+    m = re.search(r"\b([A-Z]{2})\b", s_up)
+    if m and m.group(1) in UFS:
+        return m.group(1)
+    # Depois tenta por nome do estado (tolerante a acentos)
+    try:
+        import unicodedata as _ud
+        tnorm = _ud.normalize("NFKD", str(s)).encode("ascii", "ignore").decode("ascii").lower()
+        for nome, sigla in STATE_NAME_TO_UF.items():
+            if nome in tnorm:
+                return sigla
+    except Exception:
+        pass
+    return None
+
+def infer_sindicato_from_text(text: str) -> Optional[str]:
+    # Heurística simples: captura linha que começa ou contém "SINDICATO ..."
+    # Ex.: "SINDICATO DOS EMPREGADOS NO COMÉRCIO DE SÃO PAULO"
+    m = re.search(r"(SINDICATO[^\n]{10,150})", text.upper())
+    if m:
+        return m.group(1).strip()
+    # Alternativa: "FEDERAÇÃO" pode indicar entidade superior; mantemos só se não achar sindicato
+    m2 = re.search(r"(FEDERAÇÃO[^\n]{10,150})", text.upper())
+    if m2:
+        return m2.group(1).strip()
+    return None
+
+def infer_sindicato_from_filename(name: str) -> Optional[str]:
+    # tenta extrair algo como "SINDICATO_..." no nome do arquivo
+    m = re.search(r"(SINDICATO[^_\-]{3,})", name.upper())
+    if m:
+        return m.group(1).replace("_", " ").strip()
+    return None
+
+
+def _remover_documento(collection, arquivo: str) -> None:
+    """Apaga os trechos do arquivo no Chroma e a linha em regras_cct."""
+    try:
+        collection.delete(where={"arquivo": arquivo})
+    except Exception as e:
+        print(f"Aviso: falha ao remover trechos de {arquivo} do Chroma: {e}")
+    try:
+        with sqlite3.connect(str(DB_PATH)) as conn:
+            conn.execute("DELETE FROM regras_cct WHERE arquivo = ?", (arquivo,))
+    except Exception as e:
+        print(f"Aviso: falha ao remover {arquivo} de regras_cct: {e}")
+    remover_artefatos(arquivo)
+    remover_clausulas(arquivo)
+    remover_checkpoints(arquivo)
+
+
+def extrair_pdf(pdf: Path, doc_sha1: Optional[str] = None) -> Dict[str, object]:
+    """
+    Extração de um PDF (Docling, texto/OCR, sindicato, UF, vigência, VR/VA e regras), sem
+    escrever em nenhum destino. Roda no processo principal ou em um worker do pool;
+    o resultado é serializável e consumido pelo escritor único em `main`.
+    `doc_sha1`: SHA1 já calculado na seleção incremental (calculado aqui se ausente).
+    """
+    t0 = time.perf_counter()
+    # Compute SHA1 of the PDF for deduplication
+    doc_sha1 = doc_sha1 or sha1_arquivo(pdf)
+    # Parse único por SHA1: reaproveita o artefato gravado (páginas + markdown do Docling)
+    art = carregar_artefato(doc_sha1)
+    novo = art is None
+    # OCR novo do worker: devolvido no resultado e gravado no cache pelo processo principal
+    cache_ocr: List[Tuple[str, ResultadoOCR]] = []
+    if art is None:
+        art = montar_artefato(pdf, doc_sha1, gravar=lambda chave, res: cache_ocr.append((chave, res)))
+    elif art.markdown is None and art.docling_erro == "import" and converter_markdown is not None:
+        # Docling instalado depois da extração: completa só o markdown
+        md, erro = converter_markdown(pdf, doc_sha1, any(o in ("ocr", "") for o in art.origens))
+        if md is not None:
+            art.markdown, art.docling_erro, novo = md, None, True
+
+    # 0) Try Docling first for VR/VA (tables/text)
+    docling_res: Dict[str, Optional[str]] = {
+        "vr": None, "va": None, "vr_float": None, "va_float": None, "origem": None
+    }
+    if converter_markdown is not None:
+        try:
+            if art.markdown is not None:
+                docling_res = extrair_vr_va_de_markdown(art.markdown)  # type: ignore
+            else:
+                docling_res = resultado_erro(art.docling_erro or "")  # type: ignore
+        except Exception as e:
+            msg = str(e)
+            docling_res = {
+                "vr": None, "va": None, "vr_float": None, "va_float": None, "origem": f"docling_error:{msg[:40]}"
+            }
+
+    # 1) Extract text for indexing and possible fallback
+    texto, ocr_pages, total_pages = art.texto, art.ocr_paginas, art.total_paginas
+    parts = chunk_text(texto)
+    # Primeiro extraímos o sindicato, pois ele pode conter o estado correto (ex.: '... EST PARANA')
+    sindicato = (
+        infer_sindicato_from_text(texto)
+        or infer_sindicato_from_filename(pdf.stem)
+        or "DESCONHECIDO"
+    )
+    # Em seguida inferimos a UF priorizando: nome do arquivo (sigla) -> sindicato -> texto
+    uf = (
+        infer_uf_from_filename(pdf.stem)
+        or infer_uf_from_sindicato_name(sindicato)
+        or infer_uf_from_text(texto)
+        or "DESCONHECIDO"
+    )
+    # Vigência da CCT (cláusula do texto ou anos no nome do arquivo + data-base)
+    vig_ini, vig_fim = inferir_vigencia(texto, pdf.stem)
+    # Cláusulas numeradas com rótulo de benefício: regex de VR/VA e regras rodam só nas
+    # cláusulas de VR/VA (texto inteiro quando não há cabeçalhos ou cláusula de benefício)
+    clausulas = segmentar_clausulas(texto)
+    alvo = texto_beneficio(clausulas) or texto
+    # Resolve VR/VA: prefer Docling results; if empty, fallback to robust regex over extracted text
+    vr = docling_res.get("vr")
+    va = docling_res.get("va")
+    origem = (docling_res.get("origem") or "").strip()
+    vr_f = docling_res.get("vr_float")  # type: ignore
+    va_f = docling_res.get("va_float")  # type: ignore
+
+    if not (vr or va):
+        if alvo is not texto:
+            # cláusula a cláusula: o valor da cláusula seguinte não entra na janela da anterior
+            fb_vr, fb_va = valores_por_clausula(clausulas, lambda t: _fallback_vr_va_from_text(t)[:2])
+            fb_origin = "text_fallback" if fb_vr or fb_va else ""
+        else:
+            fb_vr, fb_va, fb_origin = _fallback_vr_va_from_text(alvo)
+        vr = vr or fb_vr
+        va = va or fb_va
+        origem = origem or fb_origin
+        vr_f = _norm_brl_to_float(vr) if vr_f is None else vr_f
+        va_f = _norm_brl_to_float(va) if va_f is None else va_f
+
+    # Parse other simple rules from text (dias, periodicidade, estimativas) e flags de cláusula
+    regras = extract_rules_from_text(alvo, clausulas if alvo is not texto else None)
+    if alvo is not texto and regras.get("condicao") is None:
+        # comunicado de desligamento costuma estar fora das cláusulas de benefício
+        regras["condicao"] = _condicao_desligamento(" ".join(texto.split()))
+    try:
+        if clausulas:
+            tem_clausula_vr = any("vr" in c.beneficio for c in clausulas)
+            tem_clausula_va = any("va" in c.beneficio for c in clausulas)
+        else:
+            occ = varrer(" ".join(texto.split()))
+            tem_clausula_vr = seguido_por(occ["clausula"], occ["vr"], 120)
+            tem_clausula_va = seguido_por(occ["clausula"], occ["va"], 120)
+        regras["tem_clausula_vr"] = tem_clausula_vr
+        regras["tem_clausula_va"] = tem_clausula_va
+    except Exception:
+        pass
+    # Prefer Docling's periodicidade/condicao when available
+    try:
+        if docling_res.get("periodicidade") is not None:
+            regras["periodicidade"] = docling_res.get("periodicidade")
+        if docling_res.get("condicao") is not None:
+            regras["condicao"] = docling_res.get("condicao")
+    except Exception:
+        pass
+    if vr:
+        regras["vr_valor"] = vr
+    if va:
+        regras["va_valor"] = va
+    # Add normalized floats and origin metadata
+    if vr_f is None:
+        vr_f = _norm_brl_to_float(regras.get("vr_valor"))
+    if va_f is None:
+        va_f = _norm_brl_to_float(regras.get("va_valor"))
+    if origem:
+        regras["origem"] = origem
+    if vr_f is not None:
+        regras["vr_float"] = vr_f
+    if va_f is not None:
+        regras["va_float"] = va_f
+    return {
+        "caminho": str(pdf),
+        "doc_sha1": doc_sha1,
+        "ocr_pages": ocr_pages,
+        "total_pages": total_pages,
+        "parts": parts,
+        "sindicato": sindicato,
+        "uf": uf,
+        "vigencia_inicio": vig_ini,
+        "vigencia_fim": vig_fim,
+        "vr": vr,
+        "va": va,
+        "vr_float": vr_f,
+        "va_float": va_f,
+        "origem": origem,
+        "regras": regras,
+        "clausulas": clausulas_para_dicts(clausulas),
+        "duracao_s": round(time.perf_counter() - t0, 3),
+        # artefato recém-extraído: gravado pelo escritor único
+        "artefato": art.para_dict() if novo and doc_sha1 else None,
+        "cache_ocr": [(chave, asdict(res)) for chave, res in cache_ocr],
+    }
+
+
+def _extrair_pdf_seguro(caminho: str, doc_sha1: Optional[str] = None) -> Dict[str, object]:
+    try:
+        return extrair_pdf(Path(caminho), doc_sha1)
+    except Exception as e:
+        return {"caminho": caminho, "doc_sha1": doc_sha1, "erro": str(e)}
+
+
+def _extracoes(pdfs: List[Tuple[Path, Optional[str]]], workers: int = 1):
+    """
+    Resultados de `extrair_pdf` na ordem de `pdfs` ((pdf, sha1)). Com workers > 1 usa um
+    ProcessPoolExecutor; o progresso é exibido conforme os arquivos terminam e os
+    resultados são liberados em ordem (buffer dos que terminaram adiantados).
+    """
+    if workers <= 1:
+        for pdf, sha in pdfs:
+            yield _extrair_pdf_seguro(str(pdf), sha)
+        return
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+    total = len(pdfs)
+    prontos: Dict[int, Dict[str, object]] = {}
+    proximo = 0
+    # cada worker cria o conversor Docling uma vez e carrega os modelos antes do primeiro PDF
+    aquecer = aquecer_conversor if os.getenv("VRVA_DOCLING_AQUECER", "1") != "0" else None
+    with ProcessPoolExecutor(max_workers=workers, initializer=aquecer) as ex:
+        futuros = {ex.submit(_extrair_pdf_seguro, str(pdf), sha): i for i, (pdf, sha) in enumerate(pdfs)}
+        for feitos, fut in enumerate(as_completed(futuros), start=1):
+            i = futuros[fut]
+            prontos[i] = fut.result()
+            print(f"[extração {feitos}/{total}] {pdfs[i][0].name}", flush=True)
+            while proximo in prontos:
+                yield prontos.pop(proximo)
+                proximo += 1
+
+
+def main(workers: int = 1, completo: bool = False):
+    inicio_execucao = time.time()  # métricas do dashboard: só as etapas desta execução
     PDF_DIR.mkdir(parents=True, exist_ok=True)
     CHROMA_DIR.mkdir(parents=True, exist_ok=True)
 
-    client = chromadb.PersistentClient(path=str(CHROMA_DIR), settings=Settings(allow_reset=False))
-    collection = client.get_or_create_collection("ccts")
+    collection = obter_colecao("ccts")
 
     pdfs = sorted(PDF_DIR.glob("*.pdf"))
     if not pdfs:
         print(f"Nenhum PDF encontrado em {PDF_DIR}. Coloque as CCTs aqui e rode novamente.")
         return
 
-    docs = []
-    ids = []
-    metadatas = []
-    rules_index: List[dict] = []
-
-    # Padrão de UF (siglas BR)
-    ufs = {"AC","AL","AP","AM","BA","CE","DF","ES","GO","MA","MT","MS","MG","PA","PB","PR","PE","PI","RJ","RN","RS","RO","RR","SC","SP","SE","TO"}
-
-    # Mapa de nomes de estados (PT-BR, sem acento) -> UF
-    STATE_NAME_TO_UF = {
-        "acre": "AC",
-        "alagoas": "AL",
-        "amapa": "AP",
-        "amazonas": "AM",
-        "bahia": "BA",
-        "ceara": "CE",
-        "distrito federal": "DF",
-        "espirito santo": "ES",
-        "goias": "GO",
-        "maranhao": "MA",
-        "mato grosso": "MT",
-        "mato grosso do sul": "MS",
-        "minas gerais": "MG",
-        "para": "PA",
-        "paraiba": "PB",
-        "parana": "PR",
-        "pernambuco": "PE",
-        "piaui": "PI",
-        "rio de janeiro": "RJ",
-        "rio grande do norte": "RN",
-        "rio grande do sul": "RS",
-        "rondonia": "RO",
-        "roraima": "RR",
-        "santa catarina": "SC",
-        "sao paulo": "SP",
-        "sergipe": "SE",
-        "tocantins": "TO",
-    }
-
-    def infer_uf_from_filename(name: str) -> Optional[str]:
-        parts = re.split(r"\W+", name.upper())
-        for p in parts:
-            if p in ufs:
-                return p
-        # tentar por nome de estado no próprio nome do arquivo
-        try:
-            import unicodedata as _ud
-            tnorm = _ud.normalize("NFKD", str(name)).encode("ascii", "ignore").decode("ascii").lower()
-        except Exception:
-            tnorm = str(name).lower()
-        for nome, sigla in STATE_NAME_TO_UF.items():
-            # match por palavra inteira
-            if re.search(rf"\b{re.escape(nome)}\b", tnorm):
-                return sigla
-        return None
-
-    def _detect_ufs_in_text(text: str) -> Dict[str, int]:
-        counts: Dict[str, int] = {}
-        try:
-            import unicodedata as _ud
-            tnorm = _ud.normalize("NFKD", str(text)).encode("ascii", "ignore").decode("ascii").lower()
-        except Exception:
-            tnorm = str(text).lower()
-        # Contar ocorrências por nome do estado (palavra inteira)
-        for nome, sigla in STATE_NAME_TO_UF.items():
-            try:
-                rx = re.compile(rf"\b{re.escape(nome)}\b")
-                c = len(rx.findall(tnorm))
-            except Exception:
-                c = 0
-            if c:
-                counts[sigla] = counts.get(sigla, 0) + c
-        # Contar ocorrências por siglas isoladas
-        for m in re.finditer(r"\b([A-Z]{2})\b", str(text)):
-            sg = m.group(1)
-            if sg in ufs:
-                counts[sg] = counts.get(sg, 0) + 1
-        return counts
-
-    def infer_uf_from_text(text: str) -> Optional[str]:
-        counts = _detect_ufs_in_text(text)
-        if not counts:
-            return None
-        # retorna a UF com maior contagem
-        return sorted(counts.items(), key=lambda kv: (-kv[1], kv[0]))[0][0]
-
-    def infer_uf_from_sindicato_name(s: Optional[str]) -> Optional[str]:
-        if not s:
-            return None
-        s_up = str(s).upper()
-        # Tenta siglas primeiro em sindicato
-        m = re.search(r"\b([A-Z]{2})\b", s_up)
-        if m and m.group(1) in ufs:
-            return m.group(1)
-        # Depois tenta por nome do estado (tolerante a acentos)
-        try:
-            import unicodedata as _ud
-            tnorm = _ud.normalize("NFKD", str(s)).encode("ascii", "ignore").decode("ascii").lower()
-            for nome, sigla in STATE_NAME_TO_UF.items():
-                if nome in tnorm:
-                    return sigla
-        except Exception:
-            pass
-        return None
-
-    def infer_sindicato_from_text(text: str) -> Optional[str]:
-        # Heurística simples: captura linha que começa ou contém "SINDICATO ..."
-        # Ex.: "SINDICATO DOS EMPREGADOS NO COMÉRCIO DE SÃO PAULO"
-        m = re.search(r"(SINDICATO[^\n]{10,150})", text.upper())
-        if m:
-            return m.group(1).strip()
-        # Alternativa: "FEDERAÇÃO" pode indicar entidade superior; mantemos só se não achar sindicato
-        m2 = re.search(r"(FEDERAÇÃO[^\n]{10,150})", text.upper())
-        if m2:
-            return m2.group(1).strip()
-        return None
-
-    def infer_sindicato_from_filename(name: str) -> Optional[str]:
-        # tenta extrair algo como "SINDICATO_..." no nome do arquivo
-        m = re.search(r"(SINDICATO[^_\-]{3,})", name.upper())
-        if m:
-            return m.group(1).replace("_", " ").strip()
-        return None
+    n_trechos = 0
+    registro = obter_registro()
 
     ocr_summary = []
     sindicatos_set = set()
@@ -407,7 +642,11 @@ def main():
                 va_float REAL,
                 origem TEXT,
                 periodicidade TEXT,
-                condicao TEXT
+                condicao TEXT,
+                vigencia_inicio TEXT,
+                vigencia_fim TEXT,
+                sindicato_id TEXT,
+                regras_json TEXT
             );
             """
         )
@@ -427,104 +666,84 @@ def main():
                 cols = [r[1] for r in cur.fetchall()]
                 if 'doc_sha1' not in cols:
                     conn.execute("ALTER TABLE regras_cct ADD COLUMN doc_sha1 TEXT")
+                for col in ("vigencia_inicio", "vigencia_fim", "sindicato_id", "regras_json"):
+                    if col not in cols:
+                        conn.execute(f"ALTER TABLE regras_cct ADD COLUMN {col} TEXT")
             except Exception:
                 pass
     except Exception as e:
         print(f"Aviso: falha ao criar/indixar regras_cct: {e}. SQL=\n{create_sql}")
 
-    for pdf in pdfs:
-        # Compute SHA1 of the PDF for deduplication
+    # Incremental: só PDFs novos ou alterados (SHA1 diferente do gravado em regras_cct) são
+    # reprocessados (todos com `completo`); os removidos da pasta saem do Chroma e de regras_cct.
+    # SHA1 de cada PDF calculado uma vez (seleção) e repassado à extração
+    selecao = selecionar_pdfs(pdfs, ingeridos_regras_cct(), completo)
+    pendentes, removidos = selecao.pendentes, selecao.removidos
+    for arquivo in removidos:
+        _remover_documento(collection, arquivo)
+        print(f"[removido] {arquivo}")
+    if selecao.ignorados:
+        print(f"PDFs inalterados (ignorados): {selecao.ignorados}; a processar: {len(pendentes)}")
+    # CCT nova, alterada (SHA1 diferente) ou removida: extrações LLM e pré-resoluções anteriores
+    # deixam de valer. Feito antes das escritas, para não sobreviver a uma execução interrompida.
+    if selecao.invalidar_extracao:
         try:
-            data = pdf.read_bytes()
-            doc_sha1 = hashlib.sha1(data).hexdigest()
-        except Exception:
-            doc_sha1 = None
-        # 0) Try Docling first for VR/VA (tables/text)
-        docling_res: Dict[str, Optional[str]] = {
-            "vr": None, "va": None, "vr_float": None, "va_float": None, "origem": None
-        }
-        if extrair_vr_va_docling is not None:
+            from utils.cache_extracao import invalidar_cache_extracao
+            n_inv = invalidar_cache_extracao()
+            print(f"Cache de extração LLM e pré-resoluções invalidados ({n_inv} entradas)")
+        except Exception as e:
+            print(f"Aviso: falha ao invalidar cache de extração LLM: {e}")
+
+    # Extração por PDF (CPU) em paralelo ou sequencial; a escrita (registro, SQLite, Chroma,
+    # rules_index) acontece só aqui, na ordem dos arquivos, igual ao modo sequencial.
+    processados = 0
+    for ext in _extracoes(pendentes, workers):
+        pdf = Path(ext["caminho"])
+        if ext.get("erro"):
+            print(f"Aviso: falha ao processar {pdf.name}: {ext['erro']}")
+            registrar_etapa(ext.get("doc_sha1") or pdf.name, pdf.name, "extracao", "erro", erro=str(ext["erro"]))
+            continue
+        processados += 1
+        doc_sha1 = ext["doc_sha1"]
+        # checkpoints por (documento, etapa): o que já foi concluído para este SHA1 não é refeito
+        chave = doc_sha1 or pdf.name
+        feitas = etapas_concluidas(chave)
+        ocr_pages, total_pages = ext["ocr_pages"], ext["total_pages"]
+        if ext.get("cache_ocr"):
+            gravar_ocr_lote((k, ResultadoOCR(**campos)) for k, campos in ext["cache_ocr"])
+        if ext.get("artefato"):
             try:
-                docling_res = extrair_vr_va_docling(str(pdf))  # type: ignore
+                salvar_artefato(ArtefatoPDF.de_dict(ext["artefato"]))
+                remover_artefatos(pdf.name, manter=doc_sha1)
             except Exception as e:
-                msg = str(e)
-                docling_res = {
-                    "vr": None, "va": None, "vr_float": None, "va_float": None, "origem": f"docling_error:{msg[:40]}"
-                }
-
-        # 1) Extract text for indexing and possible fallback
-        texto, ocr_pages, total_pages = extract_text_from_pdf(pdf)
+                print(f"Aviso: falha ao gravar artefato de extração de {pdf.name}: {e}")
+        if ext.get("artefato") or "extracao" not in feitas:
+            # artefato reaproveitado mantém a duração da extração original
+            registrar_etapa(
+                chave, pdf.name, "extracao", duracao_s=ext.get("duracao_s"),
+                paginas=total_pages, ocr_paginas=ocr_pages,
+            )
         if ocr_pages:
             ocr_summary.append((pdf.name, ocr_pages, total_pages))
-        parts = chunk_text(texto)
-        # Primeiro extraímos o sindicato, pois ele pode conter o estado correto (ex.: '... EST PARANA')
-        sindicato = (
-            infer_sindicato_from_text(texto)
-            or infer_sindicato_from_filename(pdf.stem)
-            or "DESCONHECIDO"
-        )
-        # Em seguida inferimos a UF priorizando: nome do arquivo (sigla) -> sindicato -> texto
-        uf = (
-            infer_uf_from_filename(pdf.stem)
-            or infer_uf_from_sindicato_name(sindicato)
-            or infer_uf_from_text(texto)
-            or "DESCONHECIDO"
-        )
-        # Resolve VR/VA: prefer Docling results; if empty, fallback to robust regex over extracted text
-        vr = docling_res.get("vr")
-        va = docling_res.get("va")
-        origem = (docling_res.get("origem") or "").strip()
-        vr_f = docling_res.get("vr_float")  # type: ignore
-        va_f = docling_res.get("va_float")  # type: ignore
-
-        if not (vr or va):
-            fb_vr, fb_va, fb_origin = _fallback_vr_va_from_text(texto)
-            vr = vr or fb_vr
-            va = va or fb_va
-            origem = origem or fb_origin
-            vr_f = _norm_brl_to_float(vr) if vr_f is None else vr_f
-            va_f = _norm_brl_to_float(va) if va_f is None else va_f
-
-        # Parse other simple rules from text (dias, periodicidade, estimativas) e flags de cláusula
-        regras = extract_rules_from_text(texto)
-        try:
-            txt_up = texto.upper()
-            tem_clausula_vr = bool(re.search(r"CL[AÁ]USULA[\s\S]{0,120}" + VR_LABELS.pattern, txt_up, flags=re.IGNORECASE))
-            tem_clausula_va = bool(re.search(r"CL[AÁ]USULA[\s\S]{0,120}" + VA_LABELS.pattern, txt_up, flags=re.IGNORECASE))
-            regras["tem_clausula_vr"] = tem_clausula_vr
-            regras["tem_clausula_va"] = tem_clausula_va
-        except Exception:
-            pass
-        # Prefer Docling's periodicidade/condicao when available
-        try:
-            if docling_res.get("periodicidade") is not None:
-                regras["periodicidade"] = docling_res.get("periodicidade")
-            if docling_res.get("condicao") is not None:
-                regras["condicao"] = docling_res.get("condicao")
-        except Exception:
-            pass
-        if vr:
-            regras["vr_valor"] = vr
-        if va:
-            regras["va_valor"] = va
-        # Add normalized floats and origin metadata
-        if vr_f is None:
-            vr_f = _norm_brl_to_float(regras.get("vr_valor"))
-        if va_f is None:
-            va_f = _norm_brl_to_float(regras.get("va_valor"))
-        if origem:
-            regras["origem"] = origem
-        if vr_f is not None:
-            regras["vr_float"] = vr_f
-        if va_f is not None:
-            regras["va_float"] = va_f
+        parts = ext["parts"]
+        sindicato, uf = ext["sindicato"], ext["uf"]
+        vig_ini, vig_fim = ext["vigencia_inicio"], ext["vigencia_fim"]
+        vr, va, vr_f, va_f, origem = ext["vr"], ext["va"], ext["vr_float"], ext["va_float"], ext["origem"]
+        regras = ext["regras"]
+        # ID canônico do sindicato: alias exato usa o canônico existente; qualquer outro nome
+        # vira novo canônico, e os parecidos com um existente ficam na fila de revisão
+        # (a aprovação liga o nome ao canônico sugerido; similaridade nunca vira alias sozinha)
+        sindicato_id = None
+        if sindicato != "DESCONHECIDO":
+            try:
+                corr = registro.mapear_ou_enfileirar(sindicato, uf, contexto=pdf.name)
+                if corr.confiavel:
+                    sindicato_id = corr.id
+                else:
+                    sindicato_id = registro.adicionar(sindicato, uf)
+            except Exception:
+                sindicato_id = None
         if regras:
-            rules_index.append({
-                "arquivo": pdf.name,
-                "uf": uf,
-                "sindicato": sindicato,
-                **regras,
-            })
             # Log concise source origin
             try:
                 src = regras.get("origem") or ""
@@ -536,10 +755,18 @@ def main():
             ufs_set.add(uf)
         if sindicato:
             sindicatos_set.add(sindicato)
+        # Trechos do documento: IDs determinísticos (SHA1 do PDF + índice), upsert em lotes
+        # assim que o documento termina; nada acumula entre documentos
+        ids: List[str] = []
+        metadatas: List[dict] = []
         for i, p in enumerate(parts):
-            docs.append(p)
-            ids.append(f"{pdf.stem}-{i}")
+            ids.append(f"{doc_sha1 or pdf.stem}-{i}")
             md = {"arquivo": pdf.name, "parte": i, "uf": uf, "sindicato": sindicato}
+            if sindicato_id:
+                md["sindicato_id"] = sindicato_id
+            if vig_ini and vig_fim:
+                md["vigencia_inicio"] = vig_ini
+                md["vigencia_fim"] = vig_fim
             if regras:
                 # Inclui algumas chaves úteis, sem inflar muito o metadata
                 if "vr_valor" in regras:
@@ -550,15 +777,52 @@ def main():
                     md["dias"] = regras["dias"]
             metadatas.append(md)
 
-        # Persist row into regras_cct (upsert by arquivo)
+        if "chroma" in feitas and not completo:
+            # execução anterior interrompida depois de gravar os trechos deste SHA1
+            print(f"[retomado] {pdf.name}: trechos já gravados no Chroma")
+            n_trechos += len(ids)
+        else:
+            t = time.perf_counter()
+            try:
+                n = upsert_em_lotes(collection, ids, parts, metadatas)
+                n_trechos += n
+            except Exception as e:
+                # sem a linha em regras_cct o arquivo é reprocessado na próxima execução
+                print(f"Aviso: falha ao gravar trechos de {pdf.name} no Chroma: {e}")
+                registrar_etapa(chave, pdf.name, "chroma", "erro", time.perf_counter() - t, erro=str(e))
+                continue
+            # Versão anterior do arquivo (ou execução interrompida): trechos que não foram
+            # regravados agora saem do Chroma
+            try:
+                remover_obsoletos(collection, {"arquivo": pdf.name}, ids)
+            except Exception as e:
+                print(f"Aviso: falha ao remover trechos antigos de {pdf.name}: {e}")
+            registrar_etapa(chave, pdf.name, "chroma", duracao_s=time.perf_counter() - t, trechos=n)
+
+        # Índice de cláusulas (entrada da extração LLM por UF/sindicato)
+        if doc_sha1:
+            t = time.perf_counter()
+            try:
+                clausulas = [Clausula(**c) for c in ext.get("clausulas") or []]
+                salvar_clausulas(doc_sha1, pdf.name, clausulas)
+                remover_clausulas(pdf.name, manter=doc_sha1)
+                registrar_etapa(chave, pdf.name, "clausulas", duracao_s=time.perf_counter() - t)
+            except Exception as e:
+                print(f"Aviso: falha ao gravar cláusulas de {pdf.name}: {e}")
+                registrar_etapa(chave, pdf.name, "clausulas", "erro", time.perf_counter() - t, erro=str(e))
+
+        # Persist row into regras_cct (upsert by arquivo); gravada por último, marca o
+        # documento como concluído para a ingestão incremental
+        t = time.perf_counter()
         try:
             with sqlite3.connect(str(DB_PATH)) as conn:
                 conn.execute("DELETE FROM regras_cct WHERE arquivo = ?", (pdf.name,))
                 conn.execute(
                     """
                     INSERT INTO regras_cct (
-                        arquivo, doc_sha1, uf, sindicato, vr, vr_float, va, va_float, origem, periodicidade, condicao
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                        arquivo, doc_sha1, uf, sindicato, vr, vr_float, va, va_float, origem, periodicidade, condicao,
+                        vigencia_inicio, vigencia_fim, sindicato_id, regras_json
+                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
                     """,
                     (
                         pdf.name,
@@ -572,16 +836,23 @@ def main():
                         origem or None,
                         regras.get("periodicidade"),
                         regras.get("condicao"),
+                        vig_ini,
+                        vig_fim,
+                        sindicato_id,
+                        json.dumps(regras or {}, ensure_ascii=False),
                     ),
                 )
+            registrar_etapa(chave, pdf.name, "regras", duracao_s=time.perf_counter() - t)
+            remover_checkpoints(pdf.name, manter=chave)
         except Exception as e:
             print(f"Aviso: falha ao salvar regras_cct para {pdf.name}: {e}")
+            registrar_etapa(chave, pdf.name, "regras", "erro", time.perf_counter() - t, erro=str(e))
 
-    if docs:
-        # Para simplicidade, fazemos reset de IDs existentes se houver conflito
-        # (Chroma pode lançar erro de ID duplicado). Aqui usamos add, que atualizará/ignora conforme backend.
-        collection.add(documents=docs, ids=ids, metadatas=metadatas)
-        print(f"Ingestão concluída. Documentos adicionados: {len(docs)}")
+    if not pendentes and not removidos:
+        print("Nenhuma CCT nova, alterada ou removida desde a última ingestão.")
+        return
+    if n_trechos:
+        print(f"Ingestão concluída. PDFs processados: {processados}. Documentos adicionados: {n_trechos}")
         if ocr_summary:
             print("Resumo OCR (arquivo: páginas_OCR/total):")
             for name, ocr_p, tot in ocr_summary:
@@ -592,25 +863,53 @@ def main():
             print("Sindicatos detectados nas CCTs (amostra):")
             for s in list(sorted(sindicatos_set))[:15]:
                 print(" -", s)
-        # Persiste índice simples de regras extraídas
-        try:
-            # Unified target
-            RULES_INDEX_ROOT.parent.mkdir(parents=True, exist_ok=True)
-            import json as _json
-            RULES_INDEX_ROOT.write_text(_json.dumps(rules_index, ensure_ascii=False, indent=2), encoding="utf-8")
-            print(f"Regras extraídas salvas em: {RULES_INDEX_ROOT}")
-            # Legacy copy for backward compatibility (optional)
-            try:
-                CHROMA_DIR.mkdir(parents=True, exist_ok=True)
-                legacy_path = CHROMA_DIR / "rules_index.json"
-                legacy_path.write_text(_json.dumps(rules_index, ensure_ascii=False, indent=2), encoding="utf-8")
-                print(f"Cópia legada salva em: {legacy_path}")
-            except Exception as le:
-                print(f"Aviso: falha ao salvar cópia legada em chromadb: {le}")
-        except Exception as e:
-            print("Falha ao salvar rules_index.json:", e)
-    else:
+    elif pendentes:
         print("Nenhum conteúdo foi gerado a partir dos PDFs.")
+    # Persiste índice simples de regras extraídas, remontado de regras_cct (inclui os PDFs
+    # inalterados que não foram reprocessados nesta execução)
+    try:
+        rules_index = reconstruir_rules_index()
+        # Unified target
+        RULES_INDEX_ROOT.parent.mkdir(parents=True, exist_ok=True)
+        RULES_INDEX_ROOT.write_text(json.dumps(rules_index, ensure_ascii=False, indent=2), encoding="utf-8")
+        print(f"Regras extraídas salvas em: {RULES_INDEX_ROOT}")
+        # Legacy copy for backward compatibility (optional)
+        try:
+            CHROMA_DIR.mkdir(parents=True, exist_ok=True)
+            legacy_path = CHROMA_DIR / "rules_index.json"
+            legacy_path.write_text(json.dumps(rules_index, ensure_ascii=False, indent=2), encoding="utf-8")
+            print(f"Cópia legada salva em: {legacy_path}")
+        except Exception as le:
+            print(f"Aviso: falha ao salvar cópia legada em chromadb: {le}")
+    except Exception as e:
+        print("Falha ao salvar rules_index.json:", e)
+    try:
+        salvar_registro(registro)
+        print(f"Registro de sindicatos: {len(registro.canonicos)} canônicos")
+    except Exception as e:
+        print(f"Aviso: falha ao salvar registro de sindicatos: {e}")
+    # Métricas por etapa desta execução (páginas/s, fração de OCR, mais lentos) para o dashboard;
+    # PDFs inalterados e etapas retomadas de checkpoint não entram
+    try:
+        met = gravar_resumo(desde=inicio_execucao)
+        print(
+            f"Métricas da ingestão: {met['paginas']} páginas | {met['paginas_por_s'] or 0} páginas/s | "
+            f"OCR {met['fracao_ocr']:.0%} | erros: {len(met['erros'])}"
+        )
+    except Exception as e:
+        print(f"Aviso: falha ao gravar métricas da ingestão: {e}")
 
 if __name__ == "__main__":
-    main()
+    import argparse
+
+    ap = argparse.ArgumentParser(description="Ingestão das CCTs (PDF -> Chroma, regras_cct, rules_index.json)")
+    ap.add_argument(
+        "--workers", type=int, default=int(os.getenv("VRVA_INGEST_WORKERS", "1")),
+        help="processos para a extração por PDF (1 = sequencial)",
+    )
+    ap.add_argument(
+        "--completo", action="store_true",
+        help="reprocessa todos os PDFs (ignora o SHA1 gravado em regras_cct)",
+    )
+    args = ap.parse_args()
+    main(workers=max(1, args.workers), completo=args.completo)
@@ -10,7 +10,10 @@ import json
 import time
 from ferramentas.calculadora_beneficios import calcular_financeiro_vr
 from io import BytesIO
-from utils.regras_resolver import resolve_cct_rules
+from utils.regras_resolver import resolve_cct_rules, limpar_cache_negativo
+from utils.datas import converter_datas, normalizar_colunas_data
+from utils.vector_store import recarregar as recarregar_vector_store, saude as saude_vector_store
+from utils.checkpoint_ingestao import METRICAS_PATH as INGESTAO_METRICAS
 from ferramentas.calculadora_beneficios import _find_col, _should_exclude, UF_MAP, _find_file_by_keywords
 from utils.config import get_competencia, set_competencia
 from utils.config import get_llm
@@ -298,6 +301,14 @@ elif page == "1-Importar Relatórios Base":
                         continue
                 except Exception as e:
                     erros.append(f"{fpath.name}: {e}")
+            # tabela normalizada (uf, sindicato) -> valores, indexada para o resolvedor de regras
+            try:
+                from utils.valores_lookup import materializar_valores_sindicato
+                n_lookup = materializar_valores_sindicato()
+                limpar_cache_negativo()
+                st.caption(f"valores_sindicato_lookup: {n_lookup} combinação(ões) UF/sindicato indexadas.")
+            except Exception as e:
+                erros.append(f"valores_sindicato_lookup: {e}")
             if erros:
                 st.warning("Ocorreram erros em alguns arquivos:\n- " + "\n- ".join(erros))
             st.success(f"Carregadas {total_tabs} tabela(s) no SQLite.")
@@ -457,10 +468,21 @@ elif page == "2-Importar CCTs":
             with open(out_path, "wb") as out:
                 out.write(f.read())
         st.success(f"Salvos em {CCTS_DIR}")
+    ingest_workers = st.number_input(
+        "Processos de extração", min_value=1, max_value=max(1, os.cpu_count() or 1), value=1, step=1,
+        help="PDFs extraídos em paralelo; a gravação continua única e na mesma ordem.",
+    )
+    ingest_completo = st.checkbox(
+        "Reprocessar todos os PDFs", value=False,
+        help="Por padrão só PDFs novos ou alterados (SHA1) são processados.",
+    )
     if st.button("Rodar ingestão de dados CCT"):
         with st.spinner("Ingerindo CCTs..."):
+            cmd = [sys.executable, str(BASE_DIR / "ingest_ccts.py"), "--workers", str(int(ingest_workers))]
+            if ingest_completo:
+                cmd.append("--completo")
             proc = subprocess.Popen(
-                [sys.executable, str(BASE_DIR / "ingest_ccts.py")],
+                cmd,
                 cwd=str(BASE_DIR), stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
                 text=True, bufsize=1
             )
@@ -470,7 +492,36 @@ elif page == "2-Importar CCTs":
                 lines.append(line.rstrip())
                 log.code("\n".join(lines))
             proc.wait()
+            # índice vetorial reescrito por outro processo: reabre o cliente compartilhado
+            recarregar_vector_store()
+            limpar_cache_negativo()
             st.success(f"Ingestão finalizada (exit={proc.returncode}).")
+            _sv = saude_vector_store()
+            if _sv.get("ok"):
+                st.caption(f"ChromaDB: {_sv.get('documentos', 0)} trechos na coleção '{_sv.get('colecao')}'.")
+            else:
+                st.warning(f"ChromaDB indisponível após ingestão: {_sv.get('erro')}")
+    # Métricas da última ingestão (checkpoints por documento/etapa)
+    if INGESTAO_METRICAS.exists():
+        try:
+            met = json.loads(INGESTAO_METRICAS.read_text(encoding="utf-8"))
+            c1, c2, c3, c4 = st.columns(4)
+            with c1:
+                st.metric("Documentos", int(met.get("documentos", 0)))
+            with c2:
+                st.metric("Páginas/s (extração)", met.get("paginas_por_s") or 0)
+            with c3:
+                st.metric("Páginas com OCR", f"{float(met.get('fracao_ocr') or 0):.0%}")
+            with c4:
+                st.metric("Etapas com erro", len(met.get("erros") or []))
+            if met.get("mais_lentos"):
+                st.caption(
+                    f"Documentos mais lentos na última ingestão ({met.get('desde') or ''} a {met.get('gerado_em', '')}; "
+                    "PDFs inalterados não entram):"
+                )
+                st.dataframe(pd.DataFrame(met["mais_lentos"]), use_container_width=True, hide_index=True)
+        except Exception as e:
+            st.caption(f"Métricas da ingestão indisponíveis: {e}")
 
 
     st.divider()
@@ -526,12 +577,22 @@ elif page == "2-Importar CCTs":
                 return FAISS.load_local(str(index_path), embeddings=emb, allow_dangerous_deserialization=True)
             except Exception:
                 pass
-        # construir
+        # construir: texto por página do artefato gravado na ingestão (sem reabrir o PDF);
+        # PDFs ainda não ingeridos são lidos com PyPDFLoader
+        from types import SimpleNamespace
+        from utils.artefato_pdf import carregar_artefato_pdf
         docs_all = []
         for pdf in CCTS_DIR.glob("*.pdf"):
             try:
-                loader = PyPDFLoader(str(pdf))
-                docs = loader.load()
+                art = carregar_artefato_pdf(pdf)
+                if art is not None:
+                    docs = [
+                        SimpleNamespace(page_content=txt, metadata={"source": str(pdf), "page": i})
+                        for i, txt in enumerate(art.paginas) if txt.strip()
+                    ]
+                else:
+                    loader = PyPDFLoader(str(pdf))
+                    docs = loader.load()
                 splitter = RecursiveCharacterTextSplitter(chunk_size=2000, chunk_overlap=200)
                 chunks = splitter.split_documents(docs)
                 for i, d in enumerate(chunks):
@@ -690,12 +751,8 @@ elif page == "4-Cadastro de Feriados":
             # filtra linhas sem data
             df_sav = df_sav[df_sav["data"].astype(str).str.strip() != ""]
             # valida datas
-            bad = []
-            for i, v in df_sav["data"].items():
-                try:
-                    pd.to_datetime(v).date()
-                except Exception:
-                    bad.append((i, v))
+            _, bad_cells = normalizar_colunas_data(df_sav, ["data"], "feriados")
+            bad = [(c["linha"], c["valor"]) for c in bad_cells]
             if bad:
                 st.error(f"Datas inválidas nas linhas: {[i for i, _ in bad]}")
             else:
@@ -760,12 +817,13 @@ elif page == "3-Validação de Regras CCT":
     else:
         st.info("Ainda não há base_conhecimento/rules_index.json. Rode a ingestão em 'Importar CCTs'.")
 
+    # overrides vêm da tabela SQLite (rules_overrides.json é apenas exportação)
     overrides = {}
-    if overrides_path.exists():
-        try:
-            overrides = json.loads(overrides_path.read_text(encoding="utf-8"))
-        except Exception as e:
-            st.warning(f"Falha ao ler rules_overrides.json: {e}")
+    try:
+        from utils.overrides_store import listar_overrides
+        overrides = listar_overrides()
+    except Exception as e:
+        st.warning(f"Falha ao ler overrides: {e}")
 
     # Index por (UF, Sindicato)
     def key(uf: str, sind: str) -> str:
@@ -800,8 +858,9 @@ elif page == "3-Validação de Regras CCT":
             df_over = pd.DataFrame([
                 {"UF": k.split("::",1)[0], "Sindicato": k.split("::",1)[1], **v}
                 for k, v in overrides.items()
-            ])
+            ]).drop(columns=["atualizado_em"], errors="ignore")
             st.dataframe(df_over, use_container_width=True, hide_index=True)
+            st.caption(f"Exportação JSON: {overrides_path}")
         else:
             st.info("Nenhum override salvo ainda.")
 
@@ -876,17 +935,29 @@ elif page == "3-Validação de Regras CCT":
     va_def = ""
     dias_def = 0
     notas_def = ""
+    vig_ini_def = ""
+    vig_fim_def = ""
+    # versão lida quando o override foi selecionado, por "UF::sindicato": o rerun do submit
+    # relê o banco, então a versão esperada no salvamento precisa vir da sessão
+    versoes_lidas = st.session_state.setdefault("override_versoes_lidas", {})
+    k_sel = None
     if sel_choice != "(novo)":
         try:
             uf_def, sind_def = [p.strip() for p in sel_choice.split("::", 1)]
             k_int = f"{uf_def}::{sind_def}"
+            k_sel = k_int
             ov = overrides.get(k_int, {})
             vr_def = str(ov.get("vr_valor") or "")
             va_def = str(ov.get("va_valor") or "")
             dias_def = int(ov.get("dias") or 0)
             notas_def = str(ov.get("notas") or "")
+            vig_ini_def = str(ov.get("vigencia_inicio") or "")
+            vig_fim_def = str(ov.get("vigencia_fim") or "")
+            if st.session_state.get("override_selecionado") != k_int or k_int not in versoes_lidas:
+                versoes_lidas[k_int] = int(ov.get("versao") or 0)
         except Exception:
             pass
+    st.session_state["override_selecionado"] = k_sel
 
     with st.form("form_override"):
         col1, col2 = st.columns(2)
@@ -897,49 +968,57 @@ elif page == "3-Validação de Regras CCT":
         with col2:
             sind_in = st.text_input("Sindicato (nome completo)", value=sind_def)
             va_in = st.text_input("VA (ex.: R$ 180,00)", value=va_def)
+        col3, col4 = st.columns(2)
+        with col3:
+            vig_ini_in = st.text_input("Vigência início (AAAA-MM-DD, opcional)", value=vig_ini_def)
+        with col4:
+            vig_fim_in = st.text_input("Vigência fim (AAAA-MM-DD, opcional)", value=vig_fim_def)
         notas_in = st.text_area("Notas (opcional)", value=notas_def, height=80)
+        autor_in = st.text_input("Autor", value=os.getenv("VRVA_AUTOR", ""))
         submitted = st.form_submit_button("Salvar Override")
         if submitted:
             if not uf_in or not sind_in:
                 st.error("Informe UF e Sindicato.")
             else:
+                from utils.overrides_store import ConflitoVersao, salvar_override
                 k = key(uf_in, sind_in)
-                overrides[k] = {
-                    "vr_valor": vr_in.strip() or None,
-                    "va_valor": va_in.strip() or None,
-                    "dias": int(dias_in) if dias_in else None,
-                    "notas": notas_in.strip() or None,
-                    "fonte": "override_manual",
-                }
+                # grava apenas se ninguém salvou depois da leitura (sem leitura: o par deve ser novo)
+                esperada = versoes_lidas.get(k, 0)
                 try:
-                    overrides_path.write_text(json.dumps(overrides, ensure_ascii=False, indent=2), encoding="utf-8")
-                    st.success("Override salvo com sucesso.")
+                    nova = salvar_override(
+                        uf_in, sind_in,
+                        {
+                            "vr_valor": vr_in.strip() or None,
+                            "va_valor": va_in.strip() or None,
+                            "dias": int(dias_in) if dias_in else None,
+                            "notas": notas_in.strip() or None,
+                            "fonte": "override_manual",
+                            "vigencia_inicio": vig_ini_in.strip() or None,
+                            "vigencia_fim": vig_fim_in.strip() or None,
+                        },
+                        autor=autor_in.strip() or None,
+                        versao_esperada=esperada,
+                    )
+                    versoes_lidas[k] = nova
+                    st.success(f"Override salvo com sucesso (versão {nova}).")
+                except ConflitoVersao as e:
+                    # a próxima seleção do par relê a versão atual
+                    versoes_lidas.pop(k, None)
+                    st.session_state["override_selecionado"] = None
+                    st.error(f"{e}. Recarregue a página para ver a versão atual antes de salvar.")
                 except Exception as e:
                     st.error(f"Falha ao salvar override: {e}")
 
     st.divider()
     st.markdown("### 3.4 Importar Overrides de CSV (opcional)")
-    st.caption("Colunas esperadas: UF, Sindicato, vr_valor, va_valor, dias, notas")
+    st.caption("Colunas esperadas: UF, Sindicato, vr_valor, va_valor, dias, notas (opcionais: periodicidade, vigencia_inicio, vigencia_fim)")
     up = st.file_uploader("CSV de overrides", type=["csv"], key="overcsv")
-    if up is not None:
+    # importa só no clique: cada rerun com o arquivo anexado regravaria versão e autor
+    if up is not None and st.button("Importar overrides do CSV", key="overcsv_importar"):
         try:
+            from utils.overrides_store import importar_overrides
             df_csv = pd.read_csv(up)
-            add = 0
-            for _, row in df_csv.iterrows():
-                uf = str(row.get("UF", "")).upper()
-                sind = str(row.get("Sindicato", ""))
-                if not uf or not sind:
-                    continue
-                k = key(uf, sind)
-                overrides[k] = {
-                    "vr_valor": row.get("vr_valor"),
-                    "va_valor": row.get("va_valor"),
-                    "dias": int(row.get("dias")) if pd.notna(row.get("dias")) else None,
-                    "notas": row.get("notas"),
-                    "fonte": "override_csv",
-                }
-                add += 1
-            overrides_path.write_text(json.dumps(overrides, ensure_ascii=False, indent=2), encoding="utf-8")
+            add = importar_overrides(df_csv, autor=os.getenv("VRVA_AUTOR") or None)
             st.success(f"{add} overrides importados.")
         except Exception as e:
             st.error(f"Falha ao importar CSV: {e}")
@@ -947,11 +1026,17 @@ elif page == "3-Validação de Regras CCT":
     st.divider()
     st.markdown("### 3.5 Validação de Compliance (OCR x Sistema)")
     st.caption("Compara regras extraídas por OCR (rules_index.json) com as regras resolvidas pelo sistema (overrides/SQLite/Chroma).")
+    incremental_cc = st.checkbox(
+        "Somente pares alterados desde o último relatório (incremental)", value=False, key="compliance_incremental"
+    )
     if st.button("Executar validação de compliance"):
         try:
             from ferramentas.validador_cct import validar_compliance_cct
-            rel = validar_compliance_cct()
+            rel = validar_compliance_cct(incremental=incremental_cc)
             resumo = rel.get("resumo", {})
+            exe = rel.get("execucao") or {}
+            if exe:
+                st.caption(f"Pares: {exe.get('pares', 0)} | reverificados: {exe.get('reverificados', 0)}")
             itens = rel.get("itens", [])
             col1, col2, col3, col4, col5, col6 = st.columns(6)
             with col1:
@@ -1156,11 +1241,9 @@ elif page == "6-Notificações":
         # Detecta coluna de admissão de forma tolerante (captura 'Admissão', 'Data de Admissão', etc.)
         adm_col = _find_col(admis.columns if admis is not None else [], ["data_admiss","admiss"]) 
         if adm_col and not admis.empty:
-            for _, r in admis.iterrows():
-                try:
-                    adm_map[str(r[admis.columns[0]])] = pd.to_datetime(r[adm_col], dayfirst=True).date()
-                except Exception:
-                    pass
+            _adm_dt = converter_datas(admis[adm_col])
+            _ok = _adm_dt.notna()
+            adm_map = dict(zip(admis.loc[_ok, admis.columns[0]].astype(str), _adm_dt[_ok].dt.date))
 
         # Exclusões por listas
         def _ids(df: pd.DataFrame) -> set[str]:
@@ -1217,20 +1300,17 @@ elif page == "6-Notificações":
             c_data = _find_col_any(deslig.columns, ["data_demissao","data_deslig","demiss","deslig"])
             c_stat = _find_col_any(deslig.columns, ["status","comunicado"])  # flag OK
             qtd_deslig_geral = int(deslig[deslig.columns[0]].astype(str).nunique())
-            for _, r in deslig.iterrows():
-                try:
-                    d = pd.to_datetime(r[c_data]).date() if c_data else None
-                except Exception:
-                    d = None
-                if d and d.year == y and d.month == m:
-                    if d.day <= 15:
-                        flag_ok = str(r.get(c_stat, "")).strip().upper().find("OK") >= 0 if c_stat else False
-                        if flag_ok:
-                            qtd_deslig_ate15_ok += 1
-                        else:
-                            qtd_deslig_ate15_sem_ok += 1
-                    else:
-                        qtd_deslig_16a_fim += 1
+            if c_data:
+                d_dt = converter_datas(deslig[c_data])
+                no_mes = (d_dt.dt.year == y) & (d_dt.dt.month == m)
+                ate15 = no_mes & (d_dt.dt.day <= 15)
+                if c_stat:
+                    flag_ok = deslig[c_stat].astype(object).fillna("").astype(str).str.upper().str.contains("OK", regex=False)
+                else:
+                    flag_ok = pd.Series(False, index=deslig.index)
+                qtd_deslig_ate15_ok = int((ate15 & flag_ok).sum())
+                qtd_deslig_ate15_sem_ok = int((ate15 & ~flag_ok).sum())
+                qtd_deslig_16a_fim = int((no_mes & ~ate15).sum())
 
         # Admitidos mês atual e mês anterior (mês anterior cheio) — robusto
         qtd_adm_mes = 0
@@ -1255,13 +1335,13 @@ elif page == "6-Notificações":
                     candidates = [c for c in admis.columns if any(k in c.lower() for k in ["admis", "data"]) ]
                     best_col, best_non_na = None, -1
                     for c in candidates or admis.columns:
-                        s = pd.to_datetime(admis[c], errors="coerce")
+                        s = converter_datas(admis[c])
                         nn = s.notna().sum()
                         if nn > best_non_na:
                             best_col, best_non_na = c, nn
                     _adm_col = best_col
                 if _adm_col:
-                    dts = pd.to_datetime(admis[_adm_col], errors="coerce", dayfirst=True)
+                    dts = converter_datas(admis[_adm_col])
                     mask_curr = (dts >= pd.Timestamp(curr_start)) & (dts <= pd.Timestamp(curr_end))
                     mask_prev = (dts >= pd.Timestamp(prev_start)) & (dts <= pd.Timestamp(prev_end))
                     qtd_adm_mes = int(mask_curr.sum())
@@ -1646,6 +1726,8 @@ elif page == "7-Dados Finais":
             res = json.loads(calcular_financeiro_vr.run(f"{competencia}|{produto}"))
             total_fmt = f"R$ {res['total_geral']:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
             st.success(f"Produto: {res.get('produto', produto)} | Linhas: {res['linhas']} | Total: {total_fmt}")
+            if res.get("cache") == "hit":
+                st.caption("Resultado reaproveitado do cache (entradas inalteradas desde o último cálculo).")
             # preparar arquivo de exportação com nome customizado
             export_path = Path(res["saida_xlsx"])  # default
             try:
@@ -43,3 +43,763 @@ def test_config_dias_fixos_and_valor_padrao_present():
         assert isinstance(DIAS_FIXOS_UF["RJ"], int)
 
     assert isinstance(VALOR_PADRAO, dict)
+
+
+def test_bitmap_dias_sobreposicao_ferias_afastamento():
+    from utils.dias_bitmap import montar_bitmap
+    # 2025-05-05 (seg) .. 2025-05-16 (sex): 10 dias úteis, sem feriados
+    bm = montar_bitmap(
+        date(2025, 5, 5), date(2025, 5, 16),
+        [date(2025, 5, 5)], [date(2025, 5, 16)], [None],
+        ferias={0: [(date(2025, 5, 5), date(2025, 5, 7))]},
+        afastamentos={0: [(date(2025, 5, 6), date(2025, 5, 8))]},
+    )
+    assert int(bm.dias_trabalhaveis()[0]) == 10
+    # união: 05..08 ausentes (4 dias), não 6
+    assert int(bm.dias_pagos()[0]) == 6
+    trilha = bm.trilha(0)
+    assert trilha["pago"].sum() == 6
+    assert set(trilha.loc[trilha["data"].dt.weekday >= 5, "motivo"]) == {"NAO_UTIL"}
+
+
+def test_matriculas_codigo_unico_entre_formatos():
+    from utils.matriculas import CODIGO_AUSENTE, DicionarioMatriculas
+    dic = DicionarioMatriculas()
+    cods = dic.codificar(pd.Series([1234, "1234.0", " 001234", 1234.0, None, "ab12", "AB12"], dtype=object))
+    assert len(set(cods[:4].tolist())) == 1 and int(cods[0]) == 1234
+    assert cods[4] == CODIGO_AUSENTE
+    assert cods[5] == cods[6] and cods[5] < 0
+    assert dic.decodificar(cods[[0, 5]]) == ["1234", "AB12"]
+
+
+def test_datas_formato_por_coluna_e_invalidas():
+    from utils.datas import como_date, inferir_formato, normalizar_colunas_data
+    assert inferir_formato(pd.Series(["01/05/2025", "31/05/2025"])) == "br"
+    assert inferir_formato(pd.Series([45778, 45779.0])) == "excel"
+    assert como_date(pd.Series(["2025-05-02", "02/05/2025", 45778, None], dtype=object)) == [
+        date(2025, 5, 2), date(2025, 5, 2), date(2025, 5, 1), None,
+    ]
+    df = pd.DataFrame({"data": ["01/05/2025", "", "32/05/2025"]})
+    conv, invalidas = normalizar_colunas_data(df, ["data"], "teste")
+    assert conv["data"].notna().tolist() == [True, False, False]
+    assert [(c["linha"], c["valor"]) for c in invalidas] == [(2, "32/05/2025")]
+
+
+def test_cache_resultados_lru_por_orcamento(tmp_path, monkeypatch):
+    import utils.cache_resultados as cr
+    monkeypatch.setattr(cr, "CACHE_DIR", tmp_path / "cache")
+    saidas = []
+    for i in range(3):
+        out = tmp_path / f"saida_{i}.xlsx"
+        out.write_bytes(b"x" * 1000)
+        saidas.append(out)
+        cr.guardar_resultado(f"k{i}", json.dumps({"saida_xlsx": str(out), "linhas": i}))
+    # restaura o arquivo de saída e devolve o JSON armazenado
+    saidas[0].write_bytes(b"alterado")
+    hit = json.loads(cr.obter_resultado("k0"))
+    assert hit["linhas"] == 0 and hit["cache"] == "hit"
+    assert saidas[0].read_bytes() == b"x" * 1000
+    # orçamento para ~2 entradas: k1 é a menos recentemente usada
+    cr._expulsar_lru(2500)
+    assert cr.obter_resultado("k1") is None
+    assert cr.obter_resultado("k0") is not None and cr.obter_resultado("k2") is not None
+
+
+def test_cache_resultados_chave_inclui_fontes_do_resolvedor(tmp_path, monkeypatch):
+    import utils.cache_resultados as cr
+    import utils.regras_resolver as rr
+
+    registro = tmp_path / "sindicatos_registro.json"
+    geracao = [0]
+    monkeypatch.setattr(cr, "DADOS_DIR", tmp_path / "entrada")
+    monkeypatch.setattr(cr, "DB_PATH", tmp_path / "t.db")
+    monkeypatch.setattr(rr, "REGISTRO_PATH", registro)
+    monkeypatch.setattr(rr, "geracao_extracao", lambda: geracao[0])
+    monkeypatch.setattr(rr, "versao_lookup", lambda: "sem_lookup")
+    monkeypatch.setattr(rr, "obter_snapshot", lambda: type("S", (), {"versao": "v1"})())
+    chaves = [cr.chave_resultado("2025-05")]
+    registro.write_text('{"canonicos": {}}', encoding="utf-8")  # alias aprovado
+    chaves.append(cr.chave_resultado("2025-05"))
+    geracao[0] += 1  # reingestão invalidou o cache de extração
+    chaves.append(cr.chave_resultado("2025-05"))
+    assert len(set(chaves)) == 3
+    assert cr.chave_resultado("2025-05") == chaves[-1]
+
+
+def test_snapshot_regras_precedencia_e_troca(tmp_path, monkeypatch):
+    import os
+    import utils.regras_snapshot as rs
+    idx = tmp_path / "rules_index.json"
+    ovr = tmp_path / "rules_overrides.json"
+    idx.write_text(json.dumps([
+        {"uf": "sp", "sindicato": " SIND A ", "vr_valor": "R$ 10,00"},
+        {"uf": "SP", "sindicato": "SIND A", "vr_valor": "R$ 99,00"},
+        {"uf": "RJ", "sindicato": "SIND B", "vr_valor": "R$ 20,00"},
+    ]), encoding="utf-8")
+    ovr.write_text(json.dumps({"RJ::SIND B": {"vr_valor": "R$ 30,00"}}), encoding="utf-8")
+    import utils.overrides_store as ost
+    monkeypatch.setattr(rs, "RULES_INDEX", idx)
+    monkeypatch.setattr(rs, "RULES_OVERRIDES", ovr)
+    monkeypatch.setattr(rs, "DB_PATH", tmp_path / "vazio.db")
+    monkeypatch.setattr(ost, "RULES_OVERRIDES", ovr)
+    monkeypatch.setattr(ost, "DB_PATH", tmp_path / "vazio.db")
+    rs.invalidar_snapshot()
+    snap = rs.obter_snapshot()
+    assert snap.consultar("SP", "SIND A") == {"vr_valor": "R$ 10,00", "origem": "ocr_index"}
+    assert snap.consultar("rj", "SIND B")["origem"] == "override"
+    assert snap.consultar("MG", "X") is None
+    assert rs.obter_snapshot() is snap
+    assert ost.remover_override("RJ", "SIND B")  # JSON legado foi migrado para a tabela
+    os.utime(tmp_path / "vazio.db", ns=(1, 1))
+    novo = rs.obter_snapshot()
+    assert novo is not snap and novo.versao != snap.versao
+    assert novo.consultar("RJ", "SIND B")["origem"] == "ocr_index"
+    rs.invalidar_snapshot()
+
+
+def test_cache_extracao_llm_single_flight(tmp_path, monkeypatch):
+    import threading
+    import time
+    import utils.cache_extracao as ce
+    monkeypatch.setattr(ce, "DB_PATH", tmp_path / "cache.db")
+    chamadas = []
+
+    def extrator(texto):
+        chamadas.append(texto)
+        time.sleep(0.05)
+        return json.dumps({"valor_vr": 30.0, "valor_va": None, "dias_uteis": 22})
+
+    out = []
+    ths = [
+        threading.Thread(target=lambda: out.append(ce.extrair_com_cache("sp", "SIND A", "texto", extrator, "1", "m")))
+        for _ in range(5)
+    ]
+    for t in ths:
+        t.start()
+    for t in ths:
+        t.join()
+    assert len(chamadas) == 1 and len(set(out)) == 1
+    # outra versão de prompt/modelo ou outro texto => nova extração
+    ce.extrair_com_cache("SP", "SIND A", "texto", extrator, "2", "m")
+    ce.extrair_com_cache("SP", "SIND A", "texto novo", extrator, "1", "m")
+    assert len(chamadas) == 3
+    assert ce.invalidar_cache_extracao("SP") == 3
+    ce.extrair_com_cache("SP", "SIND A", "texto", extrator, "1", "m")
+    assert len(chamadas) == 4
+
+
+def test_valores_sindicato_lookup_pontual_e_lote(tmp_path, monkeypatch):
+    import sqlite3
+    import utils.valores_lookup as vl
+    db = tmp_path / "t.db"
+    monkeypatch.setattr(vl, "DB_PATH", db)
+    with sqlite3.connect(str(db)) as conn:
+        pd.DataFrame({
+            "UF": ["sp ", "SP", "RJ"], "Sindicato": ["SIND A", "SIND A", "SIND B"],
+            "vr": ["R$ 10,00", "R$ 99,00", None], "dias": [22, 20, 21],
+        }).to_sql("base_sindicato_x_valor_a", conn, index=False)
+        pd.DataFrame({"uf": ["RJ"], "sindicato": ["SIND B"], "va": [15.5]}).to_sql(
+            "base_sindicato_x_valor_b", conn, index=False)
+    assert vl.materializar_valores_sindicato() == 3
+    r = vl.buscar_valores_sindicato("sp", "SIND A")
+    assert r == {"vr_valor": "R$ 10,00", "dias": 22, "origem": "sqlite::base_sindicato_x_valor_a"}
+    lote = vl.buscar_valores_sindicato_lote([("SP", "SIND A"), ("RJ", "SIND B"), ("MG", "X")])
+    assert set(lote) == {("SP", "SIND A"), ("RJ", "SIND B")}
+    assert lote[("RJ", "SIND B")]["origem"] == "sqlite::base_sindicato_x_valor_a"
+    assert vl.buscar_valores_sindicato("MG", "X") is None
+
+    # regravar uma tabela de origem pelo salvar_dataframe_db atualiza o lookup na hora
+    import ferramentas.persistencia_db as pdb
+    monkeypatch.setattr(pdb, "DB_PATH", db)
+    versao = vl.versao_lookup()
+    df = pd.DataFrame({"uf": ["SP"], "sindicato": ["SIND A"], "vr": ["R$ 12,00"]})
+    assert pdb.salvar_dataframe_db.invoke(
+        {"df_json": df.to_json(orient="records"), "nome_tabela": "base_sindicato_x_valor_a"}
+    ).startswith("OK")
+    assert vl.buscar_valores_sindicato("SP", "SIND A")["vr_valor"] == "R$ 12,00"
+    assert vl.versao_lookup() != versao
+
+
+def test_resolver_cache_negativo_por_versao(tmp_path, monkeypatch):
+    import utils.regras_resolver as rr
+    import utils.registro_sindicatos as rs
+
+    class _Snap:
+        versao = "v1"
+
+        def consultar(self, uf, sind, competencia=None):
+            return None
+
+    snap = _Snap()
+    cadeias = []
+    monkeypatch.setattr(rs, "DB_PATH", tmp_path / "t.db")
+    monkeypatch.setattr(rs, "_enfileirados", set())
+    reg = rs.RegistroSindicatos()
+    monkeypatch.setattr(rr, "obter_registro", lambda: reg)
+    monkeypatch.setattr(rr, "texto_cct_para_extracao", lambda uf, s: None)
+    monkeypatch.setattr(rr, "obter_snapshot", lambda: snap)
+    monkeypatch.setattr(rr, "obter_colecao", lambda nome: (_ for _ in ()).throw(RuntimeError("sem chroma")))
+    monkeypatch.setattr(rr, "buscar_valores_sindicato", lambda uf, s: cadeias.append((uf, s)))
+    rr.limpar_cache_negativo()
+    antes = rr.estatisticas_resolver()
+    for _ in range(3):
+        assert rr.resolve_cct_rules("sp", "SIND X") == {"origem": "nao_encontrado"}
+    assert len(cadeias) == 1
+    depois = rr.estatisticas_resolver()
+    assert depois["negativo_hits"] - antes["negativo_hits"] == 2
+    snap.versao = "v2"  # nova versão do snapshot invalida o negativo
+    rr.resolve_cct_rules("SP", "SIND X")
+    assert len(cadeias) == 2
+    rr.limpar_cache_negativo()
+
+
+def test_registro_sindicatos_alias_similaridade_e_revisao(tmp_path, monkeypatch):
+    import utils.registro_sindicatos as rs
+
+    monkeypatch.setattr(rs, "DB_PATH", tmp_path / "t.db")
+    monkeypatch.setattr(rs, "_enfileirados", set())
+    reg = rs.RegistroSindicatos()
+    sp = reg.adicionar("SINDPD SP - SIND.TRAB.EM PROC DADOS E EMPR.EMPRESAS PROC DADOS ESTADO DE SP.", "SP")
+    reg.adicionar("SINDPD RJ - SINDICATO PROFISSIONAIS DE PROC DADOS DO RIO DE JANEIRO", "RJ")
+
+    exato = reg.mapear("sindpd sp - sind trab em proc dados e empr empresas proc dados estado de sp", "SP")
+    assert exato.id == sp and exato.metodo == "exato" and exato.confianca == 1.0
+    aprox = reg.mapear("Sindicato dos Trabalhadores em Processamento de Dados do Estado de SP", "SP")
+    assert aprox.id == sp and aprox.metodo == "similaridade" and aprox.provavel and not aprox.confiavel
+
+    # similaridade nunca é aplicada sozinha: alta ou baixa, vai para a fila (uma vez por processo)
+    nome_aprox = "Sindicato dos Trabalhadores em Processamento de Dados do Estado de SP"
+    reg.mapear_ou_enfileirar(nome_aprox, "SP")
+    fraco = reg.mapear_ou_enfileirar("SINDICATO DOS METALURGICOS DE SAO PAULO", "SP")
+    assert not fraco.confiavel
+    sem_candidato = reg.mapear_ou_enfileirar("ASSOCIACAO XPTO", "MG")
+    assert sem_candidato.metodo == "sem_match" and sem_candidato.id is None
+    monkeypatch.setattr(rs, "enfileirar_revisao", lambda *a, **k: (_ for _ in ()).throw(AssertionError("regravou")))
+    reg.mapear_ou_enfileirar(nome_aprox, "SP")
+    fila = rs.listar_revisao()
+    assert sorted((f["nome_bruto"], f["candidato_id"]) for f in fila) == [
+        ("SINDICATO DOS METALURGICOS DE SAO PAULO", fraco.id), (nome_aprox, sp),
+    ]
+
+    # canônico provisório (ingestão) + aprovação: o nome passa para o canônico sugerido
+    provisorio = reg.adicionar(nome_aprox, "SP")
+    assert provisorio != sp and reg.mapear(nome_aprox, "SP").id == provisorio
+    reg.vincular_alias(sp, nome_aprox)
+    assert reg.mapear(nome_aprox, "SP").id == sp and provisorio not in reg.canonicos
+
+    reg.salvar(tmp_path / "reg.json")
+    de_novo = rs.RegistroSindicatos.de_dict(json.loads((tmp_path / "reg.json").read_text(encoding="utf-8")))
+    assert de_novo.aliases(sp) == reg.aliases(sp)
+
+
+def test_pre_resolucao_llm_paralela_com_retentativa(tmp_path, monkeypatch):
+    import threading
+    import utils.cache_extracao as ce
+    import utils.pre_resolucao_llm as pr
+
+    monkeypatch.setattr(ce, "DB_PATH", tmp_path / "cache.db")
+    monkeypatch.setattr(pr, "BACKOFF_S", 0.0)
+    monkeypatch.setattr(pr, "pares_sem_regra", lambda pares, competencia=None: sorted({(u, s) for u, s in pares}))
+    monkeypatch.setattr(pr, "texto_cct_para_extracao", lambda uf, s: None if s == "SEM TEXTO" else f"CCT {uf} {s}")
+    gravadas = []
+    monkeypatch.setattr(pr, "gravar_pre_resolvidas", gravadas.extend)
+    chamadas = {}
+    lk = threading.Lock()
+
+    def extrator(texto):
+        with lk:
+            chamadas[texto] = chamadas.get(texto, 0) + 1
+            n = chamadas[texto]
+        if texto.endswith("FALHA") and n == 1:
+            raise RuntimeError("429")
+        return json.dumps({"valor_vr": 37.5, "valor_va": None, "dias_uteis": 22})
+
+    resumo = pr.pre_resolver_llm(
+        [("SP", "SIND A"), ("RJ", "SIND FALHA"), ("PR", "SEM TEXTO"), ("SP", "SIND A")],
+        max_concorrencia=2, req_por_min=6000, tentativas=2, extrator=extrator,
+    )
+    assert resumo["pendentes"] == 3 and resumo["sem_texto"] == 1 and resumo["resolvidos"] == 2
+    assert chamadas["CCT RJ SIND FALHA"] == 2
+    assert {(r["uf"], r["vr_valor"], r["origem"]) for r in gravadas} == {("SP", "R$ 37,50", "llm_extract"), ("RJ", "R$ 37,50", "llm_extract")}
+
+
+def test_pares_sem_regra_respeita_competencia(tmp_path, monkeypatch):
+    from datetime import date
+    import utils.pre_resolucao_llm as pr
+    import utils.registro_sindicatos as rs
+
+    class _Snap:
+        # regra de SIND A datada: vale só a partir de 2025-06
+        def consultar(self, uf, sind, competencia=None):
+            if sind != "SIND A" or (competencia is not None and competencia < date(2025, 6, 1)):
+                return None
+            return {"vr_valor": "R$ 30,00"}
+
+    monkeypatch.setattr(rs, "DB_PATH", tmp_path / "t.db")
+    monkeypatch.setattr(pr, "obter_snapshot", lambda: _Snap())
+    monkeypatch.setattr(pr, "obter_registro", lambda: rs.RegistroSindicatos())
+    pares = [("SP", "SIND A"), ("SP", "SIND B")]
+    assert pr.pares_sem_regra(pares) == [("SP", "SIND B")]
+    assert pr.pares_sem_regra(pares, date(2025, 5, 1)) == [("SP", "SIND A"), ("SP", "SIND B")]
+    assert pr.pares_sem_regra(pares, date(2025, 7, 1)) == [("SP", "SIND B")]
+
+
+def test_overrides_store_versao_otimista_e_importacao(tmp_path, monkeypatch):
+    import pytest
+    import utils.overrides_store as ost
+
+    monkeypatch.setattr(ost, "DB_PATH", tmp_path / "ov.db")
+    monkeypatch.setattr(ost, "RULES_OVERRIDES", tmp_path / "rules_overrides.json")
+    assert ost.salvar_override("sp", "SIND A", {"vr_valor": "R$ 30,00", "dias": 22}, autor="ana", versao_esperada=0) == 1
+    v2 = ost.salvar_override("SP", "SIND A", {"vr_valor": "R$ 31,00"}, autor="bia", versao_esperada=1)
+    with pytest.raises(ost.ConflitoVersao):
+        ost.salvar_override("SP", "SIND A", {"vr_valor": "R$ 99,00"}, autor="ana", versao_esperada=1)
+    assert ost.obter_override("SP", "SIND A")["vr_valor"] == "R$ 31,00" and v2 == 2
+
+    df = pd.DataFrame({"UF": ["rj", "SP", None], "Sindicato": ["SIND B", "SIND A", "X"],
+                       "vr_valor": ["R$ 20,00", None, "R$ 1,00"], "dias": [21, float("nan"), 1]})
+    assert ost.importar_overrides(df, autor="lote") == 2
+    ov = ost.listar_overrides()
+    assert ov["RJ::SIND B"]["dias"] == 21 and ov["RJ::SIND B"]["fonte"] == "override_csv"
+    assert ov["SP::SIND A"]["versao"] == 3 and ov["SP::SIND A"]["autor"] == "lote"
+    export = json.loads((tmp_path / "rules_overrides.json").read_text(encoding="utf-8"))
+    assert set(export) == {"RJ::SIND B", "SP::SIND A"}
+
+
+def test_snapshot_vigencia_consulta_por_competencia(tmp_path, monkeypatch):
+    import utils.overrides_store as ost
+    import utils.regras_snapshot as rs
+    from utils.vigencia import inferir_vigencia
+
+    assert inferir_vigencia("VIGÊNCIA E DATA-BASE ... no período de 01º de maio de 2024 a 30 de abril de 2025", "x") == ("2024-05-01", "2025-04-30")
+    assert inferir_vigencia("a data-base da categoria em 01º de maio.", "CCT-2025_2026-SP") == ("2025-05-01", "2026-04-30")
+
+    idx = tmp_path / "rules_index.json"
+    idx.write_text(json.dumps([
+        {"uf": "SP", "sindicato": "SIND A", "vr_valor": "R$ 30,00", "vigencia_inicio": "2024-05-01", "vigencia_fim": "2025-04-30"},
+        {"uf": "SP", "sindicato": "SIND A", "vr_valor": "R$ 33,00", "vigencia_inicio": "2025-05-01", "vigencia_fim": "2026-04-30"},
+        {"uf": "SP", "sindicato": "SIND A", "vr_valor": "R$ 25,00"},
+    ]), encoding="utf-8")
+    monkeypatch.setattr(rs, "RULES_INDEX", idx)
+    monkeypatch.setattr(rs, "RULES_OVERRIDES", tmp_path / "ov.json")
+    monkeypatch.setattr(rs, "DB_PATH", tmp_path / "r.db")
+    monkeypatch.setattr(ost, "RULES_OVERRIDES", tmp_path / "ov.json")
+    monkeypatch.setattr(ost, "DB_PATH", tmp_path / "r.db")
+    ost.salvar_override("SP", "SIND A", {"vr_valor": "R$ 40,00", "vigencia_inicio": "01/01/2026", "vigencia_fim": "2026-01-31"})
+    rs.invalidar_snapshot()
+    snap = rs.obter_snapshot()
+    vr = lambda comp: snap.consultar("SP", "SIND A", comp)["vr_valor"]
+    assert vr("2025-04-01") == "R$ 30,00" and vr(date(2025, 5, 1)) == "R$ 33,00"
+    assert vr("2026-01-01") == "R$ 40,00" and vr("2026-02-01") == "R$ 33,00"
+    assert vr("2023-01-01") == "R$ 25,00" and vr("2027-01-01") == "R$ 25,00"
+    # sem competência: comportamento anterior (override sem considerar vigência)
+    assert snap.consultar("SP", "SIND A")["vr_valor"] == "R$ 40,00"
+    rs.invalidar_snapshot()
+
+
+def test_snapshot_vigencia_expirada_mantem_ultima_regra(tmp_path, monkeypatch):
+    import utils.overrides_store as ost
+    import utils.regras_snapshot as rs
+
+    idx = tmp_path / "rules_index.json"
+    idx.write_text(json.dumps([
+        {"uf": "SP", "sindicato": "SIND A", "vr_valor": "R$ 30,00", "origem": "ocr_index",
+         "vigencia_inicio": "2023-05-01", "vigencia_fim": "2024-04-30"},
+        {"uf": "SP", "sindicato": "SIND A", "vr_valor": "R$ 33,00", "origem": "ocr_index",
+         "vigencia_inicio": "2024-05-01", "vigencia_fim": "2025-04-30"},
+    ]), encoding="utf-8")
+    monkeypatch.setattr(rs, "RULES_INDEX", idx)
+    monkeypatch.setattr(rs, "RULES_OVERRIDES", tmp_path / "ov.json")
+    monkeypatch.setattr(rs, "DB_PATH", tmp_path / "r.db")
+    monkeypatch.setattr(ost, "RULES_OVERRIDES", tmp_path / "ov.json")
+    monkeypatch.setattr(ost, "DB_PATH", tmp_path / "r.db")
+    rs.invalidar_snapshot()
+    snap = rs.obter_snapshot()
+    vigente = snap.consultar("SP", "SIND A", "2025-04-01")
+    assert vigente["vr_valor"] == "R$ 33,00" and vigente["origem"] == "ocr_index"
+    # única CCT (2024-2025) vencida: mantém o último valor e sinaliza na origem
+    for comp in ("2025-05-01", date(2027, 1, 1)):
+        r = snap.consultar("SP", "SIND A", comp)
+        assert r["vr_valor"] == "R$ 33,00" and r["origem"] == "ocr_index;vigencia_expirada"
+    assert snap.consultar("SP", "SIND A", "2022-01-01") is None
+    rs.invalidar_snapshot()
+
+
+def test_compliance_lote_vetorizado_e_incremental(tmp_path, monkeypatch):
+    import ferramentas.validador_cct as vc
+
+    idx = tmp_path / "rules_index.json"
+    idx.write_text(json.dumps([
+        {"uf": "SP", "sindicato": "SIND A", "vr_valor": "R$ 30,00", "dias": 22},
+        {"uf": "RJ", "sindicato": "SIND B", "vr_valor": "R$ 20,00"},
+        {"uf": "PR", "sindicato": "SIND C"},
+    ]), encoding="utf-8")
+    monkeypatch.setattr(vc, "RULES_INDEX_ROOT", idx)
+    monkeypatch.setattr(vc, "RELATORIOS_DIR", tmp_path)
+    monkeypatch.setattr(vc, "CHROMA_DIR", tmp_path / "chroma")
+    sistema = {
+        ("SP", "SIND A"): {"vr_valor": "R$ 30,00", "dias": "22", "origem": "override"},
+        ("RJ", "SIND B"): {"vr_valor": "R$ 25,00", "origem": "override"},
+        ("PR", "SIND C"): {"origem": "nao_encontrado"},
+    }
+    chamadas = []
+
+    fontes = {"extracao_llm": 1}
+
+    def lote(pares, competencia=None):
+        chamadas.append(list(pares))
+        return {p: sistema[p] for p in pares}
+
+    def consultar(self, uf, s, competencia=None):
+        r = sistema.get((uf, s))
+        return r if r and r["origem"] == "override" else None
+
+    monkeypatch.setattr(vc, "resolver_regras_lote", lote)
+    monkeypatch.setattr(vc, "obter_snapshot", lambda: type("S", (), {"consultar": consultar})())
+    monkeypatch.setattr(vc, "versao_fontes_fallback", lambda: dict(fontes))
+    pre = []
+    monkeypatch.setattr(vc, "pre_resolver_llm", lambda pares, competencia=None: pre.append(list(pares)) or {"resolvidos": 0})
+    rel = vc.validar_compliance_cct()
+    assert [i["status"] for i in rel["itens"]] == ["ok", "mismatch", "missing_ocr"]
+    assert rel["itens"][1]["detalhes"] == "VR difere (OCR=R$ 20,00 vs SYS=R$ 25,00)"
+    assert json.loads((tmp_path / "cct_compliance.json").read_text(encoding="utf-8"))["resumo"] == rel["resumo"]
+
+    sistema[("RJ", "SIND B")] = {"vr_valor": "R$ 20,00", "origem": "override"}
+    rel2 = vc.validar_compliance_cct(incremental=True)
+    assert chamadas[-1] == [("RJ", "SIND B")] and rel2["execucao"]["reverificados"] == 1
+    assert rel2["resumo"]["ok"] == 2
+
+    # fonte da cadeia de fallback mudou: só o par resolvido fora do snapshot é refeito
+    fontes["extracao_llm"] = 2
+    sistema[("PR", "SIND C")] = {"vr_valor": "R$ 12,00", "origem": "llm_extract"}
+    rel3 = vc.validar_compliance_cct(incremental=True)
+    assert chamadas[-1] == [("PR", "SIND C")] and rel3["itens"][2]["origem_sistema"] == "llm_extract"
+    assert pre == chamadas  # pares a resolver passam antes pela pré-resolução em paralelo
+    vc.validar_compliance_cct(incremental=True, competencia="2025-05-01")
+    assert len(chamadas[-1]) == 1
+
+
+def test_artefato_pdf_por_sha1(tmp_path, monkeypatch):
+    import utils.artefato_pdf as ap
+
+    monkeypatch.setattr(ap, "DB_PATH", tmp_path / "art.db")
+    pdf = tmp_path / "cct.pdf"
+    pdf.write_bytes(b"%PDF-1.4 conteudo")
+    sha = ap.sha1_arquivo(pdf)
+    assert ap.carregar_artefato_pdf(pdf) is None
+
+    art = ap.ArtefatoPDF(
+        doc_sha1=sha, arquivo="cct.pdf", paginas=["CLAUSULA 1", "", "R$ 25,00"],
+        origens=["pymupdf", "", "ocr"], tabelas=[[], [], ["VR\tR$ 25,00"]], markdown="| VR | R$ 25,00 |",
+    )
+    ap.salvar_artefato(ap.ArtefatoPDF.de_dict(art.para_dict()))
+    lido = ap.carregar_artefato_pdf(pdf)
+    assert lido == art
+    assert lido.texto == "CLAUSULA 1\n\nR$ 25,00" and lido.ocr_paginas == 1 and lido.total_paginas == 3
+
+    # versão de extração nova invalida; conteúdo alterado muda o SHA1
+    monkeypatch.setattr(ap, "VERSAO_EXTRACAO", ap.VERSAO_EXTRACAO + 1)
+    assert ap.carregar_artefato(sha) is None
+    monkeypatch.setattr(ap, "VERSAO_EXTRACAO", ap.VERSAO_EXTRACAO - 1)
+    assert ap.remover_artefatos("cct.pdf") == 1 and ap.carregar_artefato(sha) is None
+
+
+def test_docling_conversor_reutilizado_e_cache_markdown(tmp_path, monkeypatch):
+    import ferramentas.extracao_cct_docling as dl
+
+    criados, convertidos = [], []
+
+    class FakeConverter:
+        def __init__(self, **kw):
+            criados.append(kw)
+
+        def convert(self, path, **kw):
+            convertidos.append((path, kw))
+            doc = type("D", (), {"export_to_markdown": lambda self: "| VR | R$ 30,00 |\n|---|---|\n| VR | R$ 30,00 |"})()
+            return type("R", (), {"document": doc})()
+
+    monkeypatch.setattr(dl, "DocumentConverter", FakeConverter)
+    monkeypatch.setattr(dl, "PdfPipelineOptions", None)
+    monkeypatch.setattr(dl, "CACHE_DIR", tmp_path)
+    monkeypatch.setattr(dl, "_conversores", {})
+    monkeypatch.setenv("VRVA_DOCLING_PAGINAS", "1-3")
+
+    md, erro = dl.converter_markdown("a.pdf", doc_sha1="aaa", digitalizado=False)
+    assert erro is None and "R$ 30,00" in md
+    assert dl.converter_markdown("a.pdf", doc_sha1="aaa", digitalizado=False) == (md, None)
+    dl.converter_markdown("b.pdf", doc_sha1="bbb", digitalizado=False)
+    assert len(criados) == 1 and [c[0] for c in convertidos] == ["a.pdf", "b.pdf"]
+    assert convertidos[0][1] == {"page_range": (1, 3)}
+    assert dl.extrair_vr_va_de_markdown(md)["origem"] == "docling_table"
+
+
+def test_ocr_adaptativo_classe_escada_dpi_e_cache(tmp_path, monkeypatch):
+    import numpy as np
+    import utils.ocr_adaptativo as oa
+
+    monkeypatch.setattr(oa, "DB_PATH", tmp_path / "ocr.db")
+    monkeypatch.setattr(oa, "DPIS", (200, 300, 400))
+    monkeypatch.setattr(oa, "CONF_MIN", 70.0)
+
+    branca = np.full((100, 80), 255, dtype=np.uint8)
+    texto = branca.copy()
+    texto[10:90:4, 5:60] = 0  # linhas curtas de "texto"
+    tabela = branca.copy()
+    tabela[[10, 40, 70, 95], :] = 0
+    tabela[:, [5, 75]] = 0
+    tabela[20:30, 20:40] = 0
+    assert oa.classificar_pagina(branca) == "branca"
+    assert oa.classificar_pagina(texto) == "texto"
+    assert oa.classificar_pagina(tabela) == "tabela"
+
+    chamadas = []
+
+    def reconhecer(img, psm):
+        dpi = int(img)
+        chamadas.append((dpi, psm))
+        conf = {200: 40, 300: 85, 400: 95}[dpi]
+        return {"text": ["VALE", "REFEICAO", "R$", "25,00"], "conf": [conf] * 4,
+                "block_num": [1] * 4, "par_num": [1] * 4, "line_num": [1, 1, 2, 2]}
+
+    def renderizar(dpi):
+        return texto if dpi == oa.DPI_CLASSIFICACAO else dpi
+
+    res = oa.ocr_pagina(renderizar, reconhecer)
+    assert (res.texto, res.dpi, res.psm, res.confianca) == ("VALE REFEICAO\nR$ 25,00", 300, 6, 85.0)
+    assert chamadas == [(200, 6), (300, 6)]
+
+    assert oa.ocr_pagina(renderizar, reconhecer).do_cache and len(chamadas) == 2
+    vazia = oa.ocr_pagina(lambda dpi: branca, reconhecer)
+    assert vazia.texto == "" and vazia.classe == "branca" and len(chamadas) == 2
+
+    # worker de processo: entradas novas vão para o coletor; o processo principal grava em lote
+    pendentes = []
+    tabela_res = oa.ocr_pagina(lambda dpi: tabela if dpi == oa.DPI_CLASSIFICACAO else dpi, reconhecer,
+                               gravar=lambda chave, r: pendentes.append((chave, r)))
+    assert len(pendentes) == 1 and oa.ler_ocr(pendentes[0][0]) is None
+    assert oa.gravar_ocr_lote(pendentes) == 1
+    assert oa.ler_ocr(pendentes[0][0]).texto == tabela_res.texto
+
+
+def test_vector_store_upsert_em_lotes_e_obsoletos():
+    from utils.vector_store import remover_obsoletos, upsert_em_lotes
+
+    class FakeColecao:
+        def __init__(self):
+            self.itens, self.lotes = {}, []
+
+        def upsert(self, ids, documents, metadatas):
+            self.lotes.append(len(ids))
+            self.itens.update({i: (d, m) for i, d, m in zip(ids, documents, metadatas)})
+
+        def get(self, where, include):
+            return {"ids": [i for i, (_, m) in self.itens.items() if all(m.get(k) == v for k, v in where.items())]}
+
+        def delete(self, ids):
+            for i in ids:
+                self.itens.pop(i)
+
+    col = FakeColecao()
+    col.itens["a.pdf-0"] = ("legado", {"arquivo": "a.pdf"})
+    col.itens["x-0"] = ("outro", {"arquivo": "b.pdf"})
+    ids = [f"sha-{i}" for i in range(5)]
+    assert upsert_em_lotes(col, ids, [f"t{i}" for i in range(5)], [{"arquivo": "a.pdf"}] * 5, tamanho=2) == 5
+    assert col.lotes == [2, 2, 1]
+    upsert_em_lotes(col, ids[:2], ["n0", "n1"], [{"arquivo": "a.pdf"}] * 2, tamanho=2)
+    assert col.itens["sha-0"][0] == "n0"
+    assert remover_obsoletos(col, {"arquivo": "a.pdf"}, ids[:2]) == 4
+    assert sorted(col.itens) == ["sha-0", "sha-1", "x-0"]
+
+
+def test_palavras_chave_varredura_unica():
+    import re
+    from utils.palavras_chave import MOEDA_RE, ROTULOS_VR, contar_ufs, primeiro_par, proximas, seguido_por, varrer
+
+    assert contar_ufs("Sindicato de São Paulo - SP, Mato Grosso do Sul e PARA") == {"SP": 2, "MS": 1, "PA": 1}
+
+    s = "CLÁUSULA 5ª - DO VALE REFEIÇÃO: a empresa pagará R$ 32,50 por dia útil trabalhado, sem qualquer desconto em folha de pagamento, inclusive nas férias e afastamentos. Cesta básica de R$ 180,00 e 12% de VA."
+    occ = varrer(s)
+    moeda = [o for o in occ["brl"] if MOEDA_RE.fullmatch(o.texto)]
+    legado = re.search(rf"{ROTULOS_VR}[^\n\r]{{0,80}}(R\$\s?\d{{1,3}}(?:\.\d{{3}})*,\d{{2}})", s, re.I)
+    assert primeiro_par(occ["vr"], moeda, 80).texto == legado.group(1) == "R$ 32,50"
+    assert primeiro_par(occ["va"], moeda, 80).texto == "R$ 180,00"
+    assert [o.texto for o in proximas(occ["pct"], occ["va"], 80)] == ["12%"]
+    assert seguido_por(occ["clausula"], occ["vr"], 120)
+    assert not seguido_por(occ["clausula"], occ["va"], 10)
+
+
+def test_palavras_chave_rotulos_das_regras_sem_cesta():
+    from utils.palavras_chave import valores_vr_va
+
+    s = (
+        "CLÁUSULA 10ª - VALE REFEIÇÃO: o vale refeição será de R$ 35,00 por dia. "
+        "CLÁUSULA 11ª - CESTA BÁSICA: a empresa fornecerá cesta básica de R$ 200,00."
+    )
+    vr, va = valores_vr_va(s)
+    assert vr.texto == "R$ 35,00" and va is None
+    vr, va = valores_vr_va("Ticket alimentação de R$ 22,00 por dia trabalhado.")
+    assert vr is None and va.texto == "R$ 22,00"
+
+
+def test_clausulas_segmentadas_e_rotulo_de_beneficio(tmp_path, monkeypatch):
+    import sqlite3
+    import utils.clausulas as cl
+
+    monkeypatch.setattr(cl, "DB_PATH", tmp_path / "cl.db")
+    texto = (
+        "SINDICATO DOS EMPREGADOS NO COMÉRCIO\n"
+        "CLÁUSULA PRIMEIRA - VIGÊNCIA\nDe 01/01/2025 a 31/12/2025, conforme cláusula décima.\n"
+        "## CLÁUSULA DÉCIMA QUARTA\nAUXÍLIO ALIMENTAÇÃO\nVale alimentação de R$ 25,00 por dia.\n"
+        "CLÁUSULA 15ª – BENEFÍCIOS\nO vale refeição será de R$ 30,00 por dia útil.\n"
+    )
+    cls = cl.segmentar_clausulas(texto)
+    assert [(c.numero, c.titulo, c.beneficio) for c in cls] == [
+        ("PRIMEIRA", "VIGÊNCIA", ""), ("DÉCIMA QUARTA", "AUXÍLIO ALIMENTAÇÃO", "va"), ("15ª", "BENEFÍCIOS", "vr"),
+    ]
+    assert texto[cls[1].inicio: cls[1].fim].startswith("## CLÁUSULA DÉCIMA QUARTA")
+    alvo = cl.texto_beneficio(cls)
+    assert "R$ 25,00" in alvo and "R$ 30,00" in alvo and "VIGÊNCIA" not in alvo
+    assert cl.texto_para_regras("sem cláusulas, VR de R$ 10,00") == "sem cláusulas, VR de R$ 10,00"
+
+    cl.salvar_clausulas("sha", "cct.pdf", cls)
+    assert cl.carregar_clausulas("sha") == cls
+    with sqlite3.connect(str(cl.DB_PATH)) as conn:
+        conn.execute("CREATE TABLE regras_cct (arquivo TEXT, doc_sha1 TEXT, uf TEXT, sindicato TEXT)")
+        conn.execute("INSERT INTO regras_cct VALUES ('cct.pdf', 'sha', 'SP', 'SINDX')")
+    assert cl.texto_beneficio_sindicato("SP", "SINDX") == alvo
+    assert cl.remover_clausulas("cct.pdf", manter="sha") == 0 and cl.remover_clausulas("cct.pdf") == 3
+
+
+def test_valores_vr_va_clausula_a_clausula():
+    import ferramentas.extracao_cct_docling as dl
+    from utils.clausulas import segmentar_clausulas, texto_beneficio, valores_por_clausula
+    from utils.palavras_chave import valores_vr_va
+
+    texto = (
+        "CLÁUSULA DÉCIMA - VALE REFEIÇÃO\nO vale refeição será de R$ 35,00 por dia.\n"
+        "CLÁUSULA DÉCIMA PRIMEIRA - AUXÍLIO ALIMENTAÇÃO\nO auxílio alimentação será de R$ 200,00 por mês.\n"
+    )
+    cls = segmentar_clausulas(texto)
+    assert [c.beneficio for c in cls] == ["vr", "va"]
+    # texto concatenado: a janela de ±80 do rótulo de VA alcança o valor da cláusula anterior
+    _, va_junto = valores_vr_va(" ".join(texto_beneficio(cls).split()))
+    assert va_junto.texto == "R$ 35,00"
+    vr, va = valores_por_clausula(cls, lambda t: valores_vr_va(" ".join(t.split())))
+    assert (vr.texto, va.texto) == ("R$ 35,00", "R$ 200,00")
+    res = dl.extrair_vr_va_de_markdown(texto)
+    assert (res["vr"], res["va"], res["origem"]) == ("R$ 35,00", "R$ 200,00", "docling_text")
+
+
+def test_checkpoint_ingestao_etapas_e_metricas(tmp_path, monkeypatch):
+    import json
+    import utils.checkpoint_ingestao as ck
+
+    monkeypatch.setattr(ck, "DB_PATH", tmp_path / "ck.db")
+    assert ck.etapas_concluidas("a1") == set()
+    ck.registrar_etapa("a1", "a.pdf", "extracao", duracao_s=2.0, paginas=10, ocr_paginas=4)
+    ck.registrar_etapa("a1", "a.pdf", "chroma", duracao_s=1.0, trechos=7)
+    ck.registrar_etapa("a1", "a.pdf", "regras", "erro", 0.5, erro="database is locked")
+    ck.registrar_etapa("b1", "b.pdf", "extracao", duracao_s=3.0, paginas=20, ocr_paginas=0)
+    assert ck.etapas_concluidas("a1") == {"extracao", "chroma"}
+
+    met = ck.gravar_resumo(tmp_path / "met.json")
+    assert json.loads((tmp_path / "met.json").read_text(encoding="utf-8")) == met
+    assert (met["documentos"], met["paginas"], met["ocr_paginas"], met["trechos"]) == (2, 30, 4, 7)
+    assert met["paginas_por_s"] == 6.0 and met["fracao_ocr"] == round(4 / 30, 4)
+    assert [d["arquivo"] for d in met["mais_lentos"]] == ["a.pdf", "b.pdf"]
+    assert met["erros"] == [{"arquivo": "a.pdf", "etapa": "regras", "erro": "database is locked"}]
+
+    # execução seguinte: só as etapas gravadas desde o seu início entram no resumo
+    import time
+    inicio = time.time()
+    ck.registrar_etapa("c1", "c.pdf", "extracao", duracao_s=1.0, paginas=4, ocr_paginas=1)
+    run = ck.resumo_metricas(desde=inicio)
+    assert (run["documentos"], run["paginas"], run["paginas_por_s"]) == (1, 4, 4.0) and run["desde"]
+    assert ck.resumo_metricas()["documentos"] == 3
+
+    # nova versão do arquivo: checkpoints do SHA1 antigo saem
+    ck.registrar_etapa("a2", "a.pdf", "extracao", duracao_s=1.0, paginas=10)
+    assert ck.remover_checkpoints("a.pdf", manter="a2") == 3 and ck.etapas_concluidas("a2") == {"extracao"}
+
+
+def test_pre_resolucoes_abaixo_do_indice_e_apagadas_na_invalidacao(tmp_path, monkeypatch):
+    import utils.cache_extracao as ce
+    import utils.overrides_store as ost
+    import utils.regras_snapshot as rs
+
+    db = tmp_path / "r.db"
+    idx = tmp_path / "rules_index.json"
+    idx.write_text(json.dumps([{"uf": "SP", "sindicato": "SIND A", "vr_valor": "R$ 30,00"}]), encoding="utf-8")
+    for mod in (ce, rs, ost):
+        monkeypatch.setattr(mod, "DB_PATH", db)
+    monkeypatch.setattr(rs, "RULES_INDEX", idx)
+    monkeypatch.setattr(rs, "RULES_OVERRIDES", tmp_path / "ov.json")
+    monkeypatch.setattr(ost, "RULES_OVERRIDES", tmp_path / "ov.json")
+    g0 = ce.geracao_extracao()
+    ce.gravar_pre_resolvidas([
+        {"uf": "SP", "sindicato": "SIND A", "vr_valor": "R$ 99,00", "origem": "llm_extract"},
+        {"uf": "RJ", "sindicato": "SIND B", "vr_valor": "R$ 20,00", "origem": "llm_extract"},
+    ])
+    assert ce.geracao_extracao() == g0 + 1
+    rs.invalidar_snapshot()
+    snap = rs.obter_snapshot()
+    assert snap.consultar("SP", "SIND A")["vr_valor"] == "R$ 30,00"
+    assert snap.consultar("RJ", "SIND B")["origem"] == "llm_extract;pre_resolucao"
+
+    ce.invalidar_cache_extracao()
+    rs.invalidar_snapshot()
+    assert rs.obter_snapshot().consultar("RJ", "SIND B") is None and ce.geracao_extracao() == g0 + 2
+
+
+def test_selecionar_pdfs_incremental_e_rules_index(tmp_path, monkeypatch):
+    import sqlite3
+    import utils.ingestao_incremental as ii
+
+    pdfs = [tmp_path / n for n in ("a.pdf", "b.pdf", "c.pdf", "d.pdf")]
+    atuais = {"a.pdf": "sa", "b.pdf": "sb2", "c.pdf": "sc", "d.pdf": "sd"}
+    chamadas = []
+
+    def sha1(p):
+        chamadas.append(p.name)
+        return atuais[p.name]
+
+    ingeridos = {
+        "a.pdf": ("sa", True),    # inalterado: ignorado
+        "b.pdf": ("sb", True),    # alterado: reprocessado
+        "d.pdf": ("sd", False),   # sem regras gravadas: reprocessado
+        "x.pdf": ("sx", True),    # saiu da pasta: removido
+    }
+    sel = ii.selecionar_pdfs(pdfs, ingeridos, sha1=sha1)
+    assert [(p.name, s) for p, s in sel.pendentes] == [("b.pdf", "sb2"), ("c.pdf", "sc"), ("d.pdf", "sd")]
+    assert sel.removidos == ["x.pdf"] and sel.ignorados == 1 and sel.invalidar_extracao
+    assert sorted(chamadas) == ["a.pdf", "b.pdf", "c.pdf", "d.pdf"]  # um SHA1 por PDF
+
+    # nada mudou: nada a processar e o cache LLM continua válido
+    sem_mudanca = {"a.pdf": ("sa", True)}
+    sel = ii.selecionar_pdfs(pdfs[:1], sem_mudanca, sha1=sha1)
+    assert not sel.pendentes and not sel.removidos and sel.ignorados == 1 and not sel.invalidar_extracao
+    # completo: reprocessa tudo, mas sem SHA1 diferente não invalida
+    sel = ii.selecionar_pdfs(pdfs[:1], sem_mudanca, completo=True, sha1=sha1)
+    assert [p.name for p, _ in sel.pendentes] == ["a.pdf"] and not sel.invalidar_extracao
+
+    db = tmp_path / "r.db"
+    monkeypatch.setattr(ii, "DB_PATH", db)
+    assert ii.ingeridos_regras_cct() == {}
+    with sqlite3.connect(str(db)) as conn:
+        conn.execute(
+            "CREATE TABLE regras_cct (arquivo TEXT, uf TEXT, sindicato TEXT, sindicato_id TEXT, doc_sha1 TEXT, "
+            "regras_json TEXT, vigencia_inicio TEXT, vigencia_fim TEXT)"
+        )
+        conn.executemany(
+            "INSERT INTO regras_cct VALUES (?,?,?,?,?,?,?,?)",
+            [
+                ("b.pdf", "RJ", "SIND B", "sb", "h2", json.dumps({"vr_valor": "R$ 20,00"}), "2025-01-01", None),
+                ("a.pdf", "SP", "SIND A", "sa", "h1", json.dumps({"vr_valor": "R$ 30,00"}), "2024-05-01", "2025-04-30"),
+                ("c.pdf", "MG", "SIND C", "sc", "h3", None, None, None),
+                ("d.pdf", "PR", "SIND D", "sd", "h4", "{}", None, None),
+            ],
+        )
+    assert ii.ingeridos_regras_cct()["a.pdf"] == ("h1", True) and ii.ingeridos_regras_cct()["c.pdf"] == ("h3", False)
+    idx = ii.reconstruir_rules_index()
+    assert [r["arquivo"] for r in idx] == ["a.pdf", "b.pdf"]
+    assert idx[0]["vr_valor"] == "R$ 30,00" and idx[0]["vigencia_fim"] == "2025-04-30" and idx[1]["uf"] == "RJ"
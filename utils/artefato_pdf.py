@@ -0,0 +1,172 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import sqlite3
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from ferramentas.persistencia_db import DB_PATH
+
+# Artefato de extração por PDF: texto por página (PyMuPDF -> pdfplumber -> OCR), tabelas das
+# páginas lidas pelo pdfplumber e o markdown do Docling, gravados uma única vez em SQLite
+# por SHA1 do arquivo. Ingestão (regras e chunks do Chroma), o índice FAISS do chat e a
+# reingestão com --completo leem daqui em vez de reabrir o PDF.
+# VERSAO_EXTRACAO muda quando a lógica de extração muda (artefatos antigos deixam de valer).
+
+VERSAO_EXTRACAO = 2
+TABELA_DOC = "pdf_artefatos"
+TABELA_PAGINA = "pdf_artefatos_paginas"
+
+
+@dataclass
+class ArtefatoPDF:
+    doc_sha1: str
+    arquivo: str
+    paginas: List[str]
+    origens: List[str] = field(default_factory=list)  # pymupdf | pdfplumber | ocr | "" por página
+    tabelas: List[List[str]] = field(default_factory=list)  # linhas (células separadas por tab) por página
+    markdown: Optional[str] = None
+    docling_erro: Optional[str] = None
+
+    @property
+    def texto(self) -> str:
+        return "\n".join(self.paginas)
+
+    @property
+    def total_paginas(self) -> int:
+        return len(self.paginas)
+
+    @property
+    def ocr_paginas(self) -> int:
+        return sum(1 for o in self.origens if o == "ocr")
+
+    def para_dict(self) -> Dict[str, Any]:
+        return {
+            "doc_sha1": self.doc_sha1, "arquivo": self.arquivo, "paginas": self.paginas,
+            "origens": self.origens, "tabelas": self.tabelas, "markdown": self.markdown,
+            "docling_erro": self.docling_erro,
+        }
+
+    @classmethod
+    def de_dict(cls, d: Dict[str, Any]) -> "ArtefatoPDF":
+        return cls(
+            doc_sha1=d["doc_sha1"], arquivo=d.get("arquivo") or "", paginas=list(d.get("paginas") or []),
+            origens=list(d.get("origens") or []), tabelas=list(d.get("tabelas") or []),
+            markdown=d.get("markdown"), docling_erro=d.get("docling_erro"),
+        )
+
+
+def sha1_arquivo(path: Path) -> Optional[str]:
+    try:
+        return hashlib.sha1(Path(path).read_bytes()).hexdigest()
+    except Exception:
+        return None
+
+
+def _conn() -> sqlite3.Connection:
+    DB_PATH.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(DB_PATH), timeout=30)
+    conn.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS {TABELA_DOC} (
+            doc_sha1 TEXT PRIMARY KEY,
+            arquivo TEXT,
+            versao INTEGER NOT NULL,
+            total_paginas INTEGER,
+            markdown TEXT,
+            docling_erro TEXT,
+            criado_em REAL
+        )
+        """
+    )
+    conn.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS {TABELA_PAGINA} (
+            doc_sha1 TEXT NOT NULL,
+            pagina INTEGER NOT NULL,
+            texto TEXT,
+            origem TEXT,
+            tabelas TEXT,
+            PRIMARY KEY (doc_sha1, pagina)
+        )
+        """
+    )
+    conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{TABELA_DOC}_arquivo ON {TABELA_DOC}(arquivo)")
+    return conn
+
+
+def carregar_artefato(doc_sha1: Optional[str]) -> Optional[ArtefatoPDF]:
+    """Artefato gravado para o SHA1 (na versão de extração atual), ou None."""
+    if not doc_sha1:
+        return None
+    try:
+        with _conn() as conn:
+            doc = conn.execute(
+                f"SELECT arquivo, versao, markdown, docling_erro FROM {TABELA_DOC} WHERE doc_sha1 = ?",
+                (doc_sha1,),
+            ).fetchone()
+            if not doc or int(doc[1]) != VERSAO_EXTRACAO:
+                return None
+            rows = conn.execute(
+                f"SELECT texto, origem, tabelas FROM {TABELA_PAGINA} WHERE doc_sha1 = ? ORDER BY pagina",
+                (doc_sha1,),
+            ).fetchall()
+    except Exception:
+        return None
+    return ArtefatoPDF(
+        doc_sha1=doc_sha1,
+        arquivo=doc[0] or "",
+        paginas=[r[0] or "" for r in rows],
+        origens=[r[1] or "" for r in rows],
+        tabelas=[json.loads(r[2]) if r[2] else [] for r in rows],
+        markdown=doc[2],
+        docling_erro=doc[3],
+    )
+
+
+def carregar_artefato_pdf(path: Path) -> Optional[ArtefatoPDF]:
+    """Artefato de um PDF em disco (pelo SHA1 do conteúdo atual), ou None se ainda não extraído."""
+    return carregar_artefato(sha1_arquivo(path))
+
+
+def salvar_artefato(art: ArtefatoPDF) -> None:
+    with _conn() as conn:
+        conn.execute(f"DELETE FROM {TABELA_PAGINA} WHERE doc_sha1 = ?", (art.doc_sha1,))
+        conn.execute(
+            f"""
+            INSERT OR REPLACE INTO {TABELA_DOC}
+                (doc_sha1, arquivo, versao, total_paginas, markdown, docling_erro, criado_em)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            """,
+            (art.doc_sha1, art.arquivo, VERSAO_EXTRACAO, art.total_paginas, art.markdown, art.docling_erro, time.time()),
+        )
+        conn.executemany(
+            f"INSERT INTO {TABELA_PAGINA} (doc_sha1, pagina, texto, origem, tabelas) VALUES (?, ?, ?, ?, ?)",
+            [
+                (
+                    art.doc_sha1, i, txt,
+                    art.origens[i] if i < len(art.origens) else "",
+                    json.dumps(art.tabelas[i], ensure_ascii=False) if i < len(art.tabelas) and art.tabelas[i] else None,
+                )
+                for i, txt in enumerate(art.paginas)
+            ],
+        )
+
+
+def remover_artefatos(arquivo: str, manter: Optional[str] = None) -> int:
+    """Apaga os artefatos gravados para o nome de arquivo (exceto o SHA1 `manter`)."""
+    try:
+        with _conn() as conn:
+            shas = [
+                r[0] for r in conn.execute(f"SELECT doc_sha1 FROM {TABELA_DOC} WHERE arquivo = ?", (arquivo,))
+                if r[0] != manter
+            ]
+            for sha in shas:
+                conn.execute(f"DELETE FROM {TABELA_PAGINA} WHERE doc_sha1 = ?", (sha,))
+                conn.execute(f"DELETE FROM {TABELA_DOC} WHERE doc_sha1 = ?", (sha,))
+        return len(shas)
+    except Exception:
+        return 0
@@ -0,0 +1,237 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+from ferramentas.persistencia_db import DB_PATH
+
+# Cache persistente (SQLite) da extração de regras de CCT via LLM.
+# Chave: (uf, sindicato, hash do texto/chunks recuperados, versão do prompt, modelo).
+# Chamadas concorrentes para a mesma chave são de-duplicadas (single-flight): apenas uma
+# thread chama o LLM, as demais aguardam e leem o resultado gravado.
+# A reingestão das CCTs invalida o cache explicitamente (`invalidar_cache_extracao`).
+# As regras pré-resolvidas em lote (utils/pre_resolucao_llm) ficam em TABELA_PRE, separadas
+# da tabela consolidada: o snapshot as coloca abaixo de overrides e do rules_index, e a
+# invalidação apaga as duas. A geração (TABELA_META) muda a cada invalidação/gravação e
+# entra nas chaves de quem guarda resultados derivados (cache de resultados, validador).
+
+TABELA = "cache_extracao_llm"
+TABELA_PRE = "regras_cct_pre_resolvidas"
+TABELA_META = "cache_extracao_meta"
+
+# resultados vazios (LLM sem valores/erro transitório) expiram para permitir nova tentativa
+TTL_VAZIO_S = float(os.getenv("VRVA_LLM_CACHE_TTL_VAZIO_H", "24")) * 3600
+
+Chave = Tuple[str, str, str, str, str]
+
+_locks: Dict[Chave, threading.Lock] = {}
+_locks_guard = threading.Lock()
+
+
+def hash_texto(texto: str) -> str:
+    return hashlib.sha1((texto or "").encode("utf-8")).hexdigest()
+
+
+def _conn() -> sqlite3.Connection:
+    DB_PATH.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(DB_PATH), timeout=30)
+    conn.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS {TABELA} (
+            uf TEXT NOT NULL,
+            sindicato TEXT NOT NULL,
+            chunks_hash TEXT NOT NULL,
+            prompt_versao TEXT NOT NULL,
+            modelo TEXT NOT NULL,
+            resultado TEXT NOT NULL,
+            vazio INTEGER NOT NULL DEFAULT 0,
+            criado_em REAL NOT NULL,
+            PRIMARY KEY (uf, sindicato, chunks_hash, prompt_versao, modelo)
+        )
+        """
+    )
+    conn.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS {TABELA_PRE} (
+            uf TEXT NOT NULL,
+            sindicato TEXT NOT NULL,
+            vr_valor TEXT,
+            va_valor TEXT,
+            periodicidade TEXT,
+            dias INTEGER,
+            origem TEXT,
+            confidence REAL,
+            criado_em REAL NOT NULL,
+            PRIMARY KEY (uf, sindicato)
+        )
+        """
+    )
+    conn.execute(f"CREATE TABLE IF NOT EXISTS {TABELA_META} (chave TEXT PRIMARY KEY, valor INTEGER NOT NULL)")
+    return conn
+
+
+def _incrementar_geracao(conn: sqlite3.Connection) -> None:
+    conn.execute(
+        f"""
+        INSERT INTO {TABELA_META} (chave, valor) VALUES ('geracao', 1)
+        ON CONFLICT(chave) DO UPDATE SET valor = valor + 1
+        """
+    )
+
+
+def geracao_extracao() -> int:
+    """Contador que muda a cada invalidação do cache ou gravação de pré-resoluções."""
+    try:
+        with _conn() as conn:
+            row = conn.execute(f"SELECT valor FROM {TABELA_META} WHERE chave = 'geracao'").fetchone()
+        return int(row[0]) if row else 0
+    except Exception:
+        return 0
+
+
+def gravar_pre_resolvidas(linhas: Iterable[Dict[str, Any]]) -> int:
+    """Grava (upsert por UF+sindicato) as regras extraídas em lote pela pré-resolução LLM."""
+    agora = time.time()
+    dados = [
+        (
+            (r.get("uf") or "").upper(), (r.get("sindicato") or "").strip(), r.get("vr_valor"), r.get("va_valor"),
+            r.get("periodicidade"), r.get("dias"), r.get("origem") or "llm_extract", r.get("confidence"), agora,
+        )
+        for r in linhas
+    ]
+    if not dados:
+        return 0
+    with _conn() as conn:
+        conn.executemany(
+            f"""
+            INSERT OR REPLACE INTO {TABELA_PRE}
+                (uf, sindicato, vr_valor, va_valor, periodicidade, dias, origem, confidence, criado_em)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            dados,
+        )
+        _incrementar_geracao(conn)
+    return len(dados)
+
+
+def _vazio(resultado: str) -> bool:
+    try:
+        data = json.loads(resultado)
+        return not isinstance(data, dict) or all(v is None for v in data.values())
+    except Exception:
+        return True
+
+
+def ler_cache(chave: Chave) -> Optional[str]:
+    try:
+        with _conn() as conn:
+            row = conn.execute(
+                f"""
+                SELECT resultado, vazio, criado_em FROM {TABELA}
+                WHERE uf = ? AND sindicato = ? AND chunks_hash = ? AND prompt_versao = ? AND modelo = ?
+                """,
+                chave,
+            ).fetchone()
+    except Exception:
+        return None
+    if not row:
+        return None
+    resultado, vazio, criado_em = row
+    if vazio and (time.time() - float(criado_em)) > TTL_VAZIO_S:
+        return None
+    return resultado
+
+
+def gravar_cache(chave: Chave, resultado: str) -> None:
+    try:
+        with _conn() as conn:
+            conn.execute(
+                f"""
+                INSERT OR REPLACE INTO {TABELA}
+                    (uf, sindicato, chunks_hash, prompt_versao, modelo, resultado, vazio, criado_em)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (*chave, resultado, int(_vazio(resultado)), time.time()),
+            )
+    except Exception:
+        pass
+
+
+def _lock_da_chave(chave: Chave) -> threading.Lock:
+    with _locks_guard:
+        lk = _locks.get(chave)
+        if lk is None:
+            lk = threading.Lock()
+            _locks[chave] = lk
+        return lk
+
+
+def extrair_com_cache(
+    uf: str,
+    sindicato: str,
+    texto: str,
+    extrator: Callable[[str], str],
+    prompt_versao: str,
+    modelo: str,
+) -> str:
+    """
+    Resultado (JSON str) da extração para o texto informado, consultando o cache antes de
+    chamar `extrator`. Para a mesma chave, somente um chamador executa o extrator por vez.
+    """
+    chave: Chave = ((uf or "").upper(), (sindicato or "").strip(), hash_texto(texto), str(prompt_versao), str(modelo))
+    hit = ler_cache(chave)
+    if hit is not None:
+        return hit
+    lk = _lock_da_chave(chave)
+    with lk:
+        # outro chamador pode ter preenchido enquanto aguardávamos o lock
+        hit = ler_cache(chave)
+        if hit is not None:
+            return hit
+        resultado = extrator(texto)
+        if not isinstance(resultado, str):
+            resultado = json.dumps(resultado, ensure_ascii=False)
+        gravar_cache(chave, resultado)
+    with _locks_guard:
+        if _locks.get(chave) is lk and not lk.locked():
+            _locks.pop(chave, None)
+    return resultado
+
+
+def invalidar_cache_extracao(uf: Optional[str] = None, sindicato: Optional[str] = None) -> int:
+    """
+    Remove entradas do cache e as pré-resoluções correspondentes (todas, por UF ou por
+    UF+sindicato). Retorna quantas entradas do cache foram removidas.
+    """
+    where = ""
+    params: list = []
+    conds = []
+    if uf:
+        conds.append("uf = ?")
+        params.append(uf.upper())
+    if sindicato:
+        conds.append("sindicato = ?")
+        params.append(sindicato.strip())
+    if conds:
+        where = " WHERE " + " AND ".join(conds)
+    try:
+        with _conn() as conn:
+            cur = conn.execute(f"DELETE FROM {TABELA}{where}", params)
+            conn.execute(f"DELETE FROM {TABELA_PRE}{where}", params)
+            # linhas llm_extract gravadas na tabela consolidada por versões anteriores
+            try:
+                conn.execute(
+                    f"DELETE FROM regras_cct_vrva_resolvidas{where}{' AND' if where else ' WHERE'} origem LIKE 'llm_extract%'",
+                    params,
+                )
+            except sqlite3.OperationalError:
+                pass
+            _incrementar_geracao(conn)
+            return int(cur.rowcount or 0)
+    except Exception:
+        return 0
@@ -0,0 +1,209 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from ferramentas.persistencia_db import DB_PATH
+from utils.config import COMPETENCIA_PATH, RULES_SETTINGS_PATH
+from utils.regras_resolver import versao_fontes_fallback
+
+# Cache de resultados completos do cálculo de benefícios.
+# A chave é uma impressão digital de tudo que altera o resultado: arquivos de dados_entrada,
+# tabelas de regras no SQLite, overrides/rules_index, competencia.json, rules_settings.json,
+# fontes da cadeia de fallback do resolvedor (registro de sindicatos, geração do cache de
+# extração LLM, modelo, lookup), VRVA_VAL_BASE e o produto/competência pedidos. Cada entrada guarda o JSON de retorno e
+# cópias dos arquivos gerados; o acerto restaura os arquivos e devolve o JSON sem recalcular.
+# Expulsão LRU (mtime do meta.json) por orçamento de disco.
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+DADOS_DIR = BASE_DIR / "dados_entrada"
+CACHE_DIR = Path(os.getenv("VRVA_CACHE_DIR", str(BASE_DIR / "base_conhecimento" / "cache" / "resultados")))
+CHROMA_DIR = BASE_DIR / "base_conhecimento" / "chromadb"
+RULES_INDEX = BASE_DIR / "base_conhecimento" / "rules_index.json"
+RULES_OVERRIDES = CHROMA_DIR / "rules_overrides.json"
+
+# incrementar quando a lógica do cálculo mudar de forma que invalide resultados antigos
+VERSAO_CACHE = "2"
+
+_lock = threading.Lock()
+# hash de conteúdo por (caminho, tamanho, mtime_ns) — evita reler arquivos inalterados
+_hash_arquivos: Dict[Tuple[str, int, int], str] = {}
+
+
+def cache_habilitado() -> bool:
+    return os.getenv("VRVA_CACHE_RESULTADOS", "1").strip().lower() not in {"0", "false", "nao", "não", "off"}
+
+
+def _orcamento_bytes() -> int:
+    try:
+        return int(float(os.getenv("VRVA_CACHE_MAX_MB", "200")) * 1024 * 1024)
+    except Exception:
+        return 200 * 1024 * 1024
+
+
+def hash_arquivo(path: Path) -> Optional[str]:
+    """SHA1 do conteúdo; None se o arquivo não existir."""
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    k = (str(path), st.st_size, st.st_mtime_ns)
+    h = _hash_arquivos.get(k)
+    if h is None:
+        sha = hashlib.sha1()
+        with open(path, "rb") as f:
+            for bloco in iter(lambda: f.read(1 << 20), b""):
+                sha.update(bloco)
+        h = sha.hexdigest()
+        _hash_arquivos[k] = h
+    return h
+
+
+def _tabelas_regras(conn: sqlite3.Connection) -> List[str]:
+    nomes = [r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")]
+    out = []
+    for n in nomes:
+        ln = n.lower()
+        if ln.startswith("regras_cct") or ("sindicato" in ln and "valor" in ln):
+            out.append(n)
+    return sorted(out)
+
+
+def versao_tabelas_regras() -> str:
+    """Hash do conteúdo das tabelas de regras consultadas pelo resolvedor (tabelas pequenas)."""
+    sha = hashlib.sha1()
+    try:
+        if not DB_PATH.exists():
+            return "sem_db"
+        with sqlite3.connect(str(DB_PATH)) as conn:
+            for t in _tabelas_regras(conn):
+                sha.update(t.encode("utf-8"))
+                for row in conn.execute(f'SELECT * FROM "{t}" ORDER BY 1'):
+                    sha.update(repr(row).encode("utf-8"))
+    except Exception as e:
+        sha.update(f"erro:{e}".encode("utf-8"))
+    return sha.hexdigest()
+
+
+def _arquivos_entrada() -> Iterable[Path]:
+    if not DADOS_DIR.exists():
+        return []
+    return sorted(p for p in DADOS_DIR.iterdir() if p.is_file() and not p.name.startswith((".", "~$")))
+
+
+def impressao_digital(mes_referencia: str) -> Dict[str, Any]:
+    """Componentes da chave (úteis para diagnóstico)."""
+    return {
+        "versao": VERSAO_CACHE,
+        "pedido": (mes_referencia or "").strip().upper().replace(" ", ""),
+        "val_base": os.getenv("VRVA_VAL_BASE", "CCT").upper(),
+        "dados_entrada": {p.name: hash_arquivo(p) for p in _arquivos_entrada()},
+        "tabelas_regras": versao_tabelas_regras(),
+        "overrides": hash_arquivo(RULES_OVERRIDES),
+        "rules_index": hash_arquivo(RULES_INDEX),
+        "competencia": hash_arquivo(COMPETENCIA_PATH),
+        "rules_settings": hash_arquivo(RULES_SETTINGS_PATH),
+        "fallback": versao_fontes_fallback(),
+    }
+
+
+def chave_resultado(mes_referencia: str) -> str:
+    comp = impressao_digital(mes_referencia)
+    return hashlib.sha256(json.dumps(comp, sort_keys=True).encode("utf-8")).hexdigest()[:32]
+
+
+def _campos_arquivo(res: Dict[str, Any]) -> List[str]:
+    return [k for k, v in res.items() if isinstance(v, str) and (k.endswith("_xlsx") or k.endswith("_csv"))]
+
+
+def obter_resultado(chave: str) -> Optional[str]:
+    """JSON do resultado em cache (arquivos de saída restaurados) ou None."""
+    d = CACHE_DIR / chave
+    meta = d / "meta.json"
+    with _lock:
+        if not meta.exists():
+            return None
+        try:
+            res = json.loads(meta.read_text(encoding="utf-8"))
+            for campo in _campos_arquivo(res):
+                copia = d / campo
+                destino = Path(res[campo])
+                if not copia.exists():
+                    return None
+                if hash_arquivo(destino) != hash_arquivo(copia):
+                    destino.parent.mkdir(parents=True, exist_ok=True)
+                    shutil.copy2(copia, destino)
+            agora = time.time()
+            os.utime(meta, (agora, agora))
+        except Exception:
+            return None
+    res["cache"] = "hit"
+    return json.dumps(res)
+
+
+def guardar_resultado(chave: str, resultado_json: str) -> None:
+    """Armazena o resultado (JSON + arquivos gerados) e aplica o orçamento de disco."""
+    try:
+        res = json.loads(resultado_json)
+    except Exception:
+        return
+    if not isinstance(res, dict) or res.get("erro"):
+        return
+    d = CACHE_DIR / chave
+    tmp = CACHE_DIR / f".{chave}.{os.getpid()}.tmp"
+    with _lock:
+        try:
+            shutil.rmtree(tmp, ignore_errors=True)
+            tmp.mkdir(parents=True, exist_ok=True)
+            for campo in _campos_arquivo(res):
+                origem = Path(res[campo])
+                if origem.exists():
+                    shutil.copy2(origem, tmp / campo)
+            (tmp / "meta.json").write_text(json.dumps(res, ensure_ascii=False), encoding="utf-8")
+            shutil.rmtree(d, ignore_errors=True)
+            os.replace(tmp, d)
+        except Exception:
+            shutil.rmtree(tmp, ignore_errors=True)
+            return
+        _expulsar_lru(_orcamento_bytes())
+
+
+def _tamanho(d: Path) -> int:
+    return sum(f.stat().st_size for f in d.iterdir() if f.is_file())
+
+
+def _expulsar_lru(orcamento: int) -> None:
+    try:
+        entradas = []
+        for d in CACHE_DIR.iterdir():
+            meta = d / "meta.json"
+            if d.is_dir() and meta.exists():
+                entradas.append((meta.stat().st_mtime, _tamanho(d), d))
+    except Exception:
+        return
+    total = sum(e[1] for e in entradas)
+    # mais antigo (menos recentemente usado) primeiro; a entrada mais recente é sempre mantida
+    for _, tam, d in sorted(entradas, key=lambda e: e[0])[:-1]:
+        if total <= orcamento:
+            break
+        shutil.rmtree(d, ignore_errors=True)
+        total -= tam
+
+
+def limpar_cache() -> int:
+    """Remove todas as entradas; retorna quantas foram removidas."""
+    n = 0
+    with _lock:
+        if CACHE_DIR.exists():
+            for d in CACHE_DIR.iterdir():
+                if d.is_dir():
+                    shutil.rmtree(d, ignore_errors=True)
+                    n += 1
+    return n
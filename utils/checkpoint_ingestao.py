@@ -0,0 +1,160 @@
+from __future__ import annotations
+
+import json
+import sqlite3
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set
+
+from ferramentas.persistencia_db import DB_PATH
+
+# Checkpoints da ingestão de CCTs: uma linha por (documento, etapa) com status, duração,
+# páginas, páginas com OCR e trechos gravados. Cada etapa de um PDF é registrada assim que
+# termina; uma execução interrompida (OCR, Docling, subprocesso do Streamlit encerrado)
+# retoma da última etapa concluída daquele SHA1. A linha em regras_cct continua sendo o
+# marcador final do documento (ingestão incremental).
+# Ao final de cada execução, o resumo das métricas da execução (etapas gravadas desde o seu
+# início) vai para METRICAS_PATH (dashboard).
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+METRICAS_PATH = BASE_DIR / "base_conhecimento" / "ingestao_metricas.json"
+TABELA = "ingestao_etapas"
+ETAPAS = ("extracao", "clausulas", "chroma", "regras")
+
+
+def _conn() -> sqlite3.Connection:
+    DB_PATH.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(DB_PATH), timeout=30)
+    conn.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS {TABELA} (
+            doc_sha1 TEXT NOT NULL,
+            etapa TEXT NOT NULL,
+            arquivo TEXT,
+            status TEXT NOT NULL,
+            duracao_s REAL,
+            paginas INTEGER,
+            ocr_paginas INTEGER,
+            trechos INTEGER,
+            erro TEXT,
+            atualizado_em REAL NOT NULL,
+            PRIMARY KEY (doc_sha1, etapa)
+        )
+        """
+    )
+    conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{TABELA}_arquivo ON {TABELA}(arquivo)")
+    return conn
+
+
+def registrar_etapa(
+    doc_sha1: str,
+    arquivo: str,
+    etapa: str,
+    status: str = "ok",
+    duracao_s: Optional[float] = None,
+    paginas: Optional[int] = None,
+    ocr_paginas: Optional[int] = None,
+    trechos: Optional[int] = None,
+    erro: Optional[str] = None,
+) -> None:
+    """Grava (ou substitui) o checkpoint da etapa; status "ok" ou "erro"."""
+    try:
+        with _conn() as conn:
+            conn.execute(
+                f"""
+                INSERT OR REPLACE INTO {TABELA}
+                    (doc_sha1, etapa, arquivo, status, duracao_s, paginas, ocr_paginas, trechos, erro, atualizado_em)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (doc_sha1, etapa, arquivo, status, duracao_s, paginas, ocr_paginas, trechos,
+                 (erro or "")[:500] or None, time.time()),
+            )
+    except Exception:
+        pass
+
+
+def etapas_concluidas(doc_sha1: Optional[str]) -> Set[str]:
+    if not doc_sha1:
+        return set()
+    try:
+        with _conn() as conn:
+            rows = conn.execute(
+                f"SELECT etapa FROM {TABELA} WHERE doc_sha1 = ? AND status = 'ok'", (doc_sha1,)
+            ).fetchall()
+    except Exception:
+        return set()
+    return {r[0] for r in rows}
+
+
+def remover_checkpoints(arquivo: str, manter: Optional[str] = None) -> int:
+    """Apaga os checkpoints do nome de arquivo (exceto os do SHA1 `manter`)."""
+    try:
+        with _conn() as conn:
+            cur = conn.execute(
+                f"DELETE FROM {TABELA} WHERE arquivo = ? AND doc_sha1 != ?", (arquivo, manter or "")
+            )
+            return cur.rowcount
+    except Exception:
+        return 0
+
+
+def resumo_metricas(top: int = 5, desde: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Resumo dos checkpoints: páginas/s da extração, fração de páginas com OCR, tempo e
+    contagem por etapa, documentos mais lentos e etapas com erro.
+    `desde` (epoch): só as etapas gravadas a partir desse instante (uma execução); sem ele,
+    o acumulado da tabela.
+    """
+    try:
+        with _conn() as conn:
+            rows = conn.execute(
+                f"""
+                SELECT doc_sha1, etapa, arquivo, status, duracao_s, paginas, ocr_paginas, trechos, erro
+                FROM {TABELA} WHERE atualizado_em >= ?
+                """,
+                (desde or 0.0,),
+            ).fetchall()
+    except Exception:
+        rows = []
+    por_etapa: Dict[str, Dict[str, Any]] = {e: {"ok": 0, "erro": 0, "segundos": 0.0} for e in ETAPAS}
+    docs: Dict[str, Dict[str, Any]] = {}
+    erros: List[Dict[str, Any]] = []
+    for sha, etapa, arquivo, status, dur, pags, ocr, trechos, erro in rows:
+        e = por_etapa.setdefault(etapa, {"ok": 0, "erro": 0, "segundos": 0.0})
+        e["ok" if status == "ok" else "erro"] += 1
+        e["segundos"] += dur or 0.0
+        d = docs.setdefault(sha, {"arquivo": arquivo, "segundos": 0.0, "paginas": 0, "ocr_paginas": 0, "trechos": 0})
+        d["segundos"] += dur or 0.0
+        if etapa == "extracao" and status == "ok":
+            d["paginas"], d["ocr_paginas"] = pags or 0, ocr or 0
+        if etapa == "chroma" and status == "ok":
+            d["trechos"] = trechos or 0
+        if status != "ok":
+            erros.append({"arquivo": arquivo, "etapa": etapa, "erro": erro})
+    paginas = sum(d["paginas"] for d in docs.values())
+    ocr = sum(d["ocr_paginas"] for d in docs.values())
+    seg_extracao = por_etapa["extracao"]["segundos"]
+    for e in por_etapa.values():
+        e["segundos"] = round(e["segundos"], 3)
+    lentos = sorted(docs.values(), key=lambda d: d["segundos"], reverse=True)[:top]
+    return {
+        "gerado_em": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "desde": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(desde)) if desde else None,
+        "documentos": len(docs),
+        "paginas": paginas,
+        "ocr_paginas": ocr,
+        "fracao_ocr": round(ocr / paginas, 4) if paginas else 0.0,
+        "paginas_por_s": round(paginas / seg_extracao, 3) if seg_extracao else None,
+        "trechos": sum(d["trechos"] for d in docs.values()),
+        "etapas": por_etapa,
+        "mais_lentos": [{**d, "segundos": round(d["segundos"], 3)} for d in lentos],
+        "erros": erros,
+    }
+
+
+def gravar_resumo(path: Optional[Path] = None, desde: Optional[float] = None) -> Dict[str, Any]:
+    resumo = resumo_metricas(desde=desde)
+    path = path or METRICAS_PATH
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(resumo, ensure_ascii=False, indent=2), encoding="utf-8")
+    return resumo
@@ -0,0 +1,205 @@
+from __future__ import annotations
+
+import re
+import sqlite3
+from dataclasses import asdict, dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from ferramentas.persistencia_db import DB_PATH
+from utils.palavras_chave import proximas, sem_acento, varrer
+
+# Índice de cláusulas das CCTs.
+# A ingestão segmenta o texto de cada CCT nas cláusulas numeradas ("CLÁUSULA DÉCIMA - ...",
+# "CLÁUSULA 5ª: ...") e grava título, posições (no texto do artefato) e o rótulo de benefício
+# ("vr", "va", "vr+va" ou "") por SHA1 do PDF. Regex de regras, a busca por proximidade do
+# Docling e a extração por LLM rodam só sobre as cláusulas de benefício; sem cabeçalhos de
+# cláusula ou sem cláusula de benefício, os chamadores usam o texto inteiro como antes.
+# O texto só é gravado para as cláusulas de benefício (as demais ficam com título e posições).
+
+TABELA = "cct_clausulas"
+LIMITE_TEXTO_LLM = 20000
+
+_ORDINAL = (
+    r"(?:primeir|segund|terceir|quart|quint|sext|setim|oitav|non|decim|vigesim|trigesim|"
+    r"quadragesim|quinquagesim|sexagesim|septuagesim|setuagesim|octogesim|nonagesim|centesim)[ao]"
+)
+# cabeçalho em início de linha (aceita marcação de markdown do Docling: #, *, >, -)
+_CABECALHO = re.compile(
+    rf"^[ \t#*>\-]*clausula\s+"
+    rf"(?P<numero>\d{{1,3}}\s*[ao]?\.?|{_ORDINAL}(?:[\s\-]+(?:e\s+)?{_ORDINAL}){{0,3}}|unica)\b"
+    r"[ \t*]*[-–—:.)]*[ \t*]*(?P<titulo>[^\n]*)$",
+    re.IGNORECASE | re.MULTILINE,
+)
+
+
+@dataclass
+class Clausula:
+    ordem: int
+    numero: str
+    titulo: str
+    inicio: int
+    fim: int
+    beneficio: str = ""
+    texto: str = ""
+
+
+def rotulo_beneficio(titulo: str, corpo: str) -> str:
+    """
+    "vr", "va", "vr+va" ou "": pelo título da cláusula ou, sem rótulo no título, por
+    valor (R$ ou %) a até 80 caracteres de um rótulo de VR/VA no corpo.
+    """
+    occ = varrer(titulo or "")
+    tem = {t for t in ("vr", "va") if occ[t]}
+    if not tem and corpo:
+        occ = varrer(" ".join(corpo.split()))
+        valores = sorted(occ["brl"] + occ["pct"], key=lambda o: o.inicio)
+        tem = {t for t in ("vr", "va") if occ[t] and proximas(valores, occ[t], 80)}
+    return "+".join(t for t in ("vr", "va") if t in tem)
+
+
+def segmentar_clausulas(texto: str) -> List[Clausula]:
+    """Cláusulas numeradas do texto (preâmbulo antes da primeira fica de fora)."""
+    texto = texto or ""
+    heads = list(_CABECALHO.finditer(sem_acento(texto)))
+    out: List[Clausula] = []
+    for k, m in enumerate(heads):
+        fim = heads[k + 1].start() if k + 1 < len(heads) else len(texto)
+        titulo = texto[m.start("titulo"): m.end("titulo")].strip(" \t*#")
+        corpo = texto[m.end(): fim]
+        if not titulo:
+            # título na linha seguinte ao cabeçalho
+            prox = next((ln.strip(" \t*#") for ln in corpo.splitlines() if ln.strip()), "")
+            titulo = prox if len(prox) <= 120 else ""
+        trecho = texto[m.start(): fim]
+        beneficio = rotulo_beneficio(titulo, corpo)
+        out.append(Clausula(
+            ordem=k,
+            numero=" ".join(texto[m.start("numero"): m.end("numero")].split()),
+            titulo=titulo,
+            inicio=m.start(),
+            fim=fim,
+            beneficio=beneficio,
+            texto=trecho.strip() if beneficio else "",
+        ))
+    return out
+
+
+def texto_beneficio(clausulas: List[Clausula]) -> Optional[str]:
+    """Texto das cláusulas de benefício, ou None se não houver (usar o texto inteiro)."""
+    partes = [c.texto for c in clausulas if c.beneficio and c.texto]
+    return "\n\n".join(partes) if partes else None
+
+
+def valores_por_clausula(
+    clausulas: List[Clausula], extrair: Callable[[str], Tuple[Any, Any]]
+) -> Tuple[Any, Any]:
+    """
+    (VR, VA) extraídos cláusula a cláusula por `extrair(texto) -> (vr, va)`: VR só das
+    cláusulas rotuladas "vr", VA só das "va" (a primeira que tiver valor). A busca por
+    proximidade não atravessa o limite entre cláusulas.
+    """
+    vr = va = None
+    for c in clausulas:
+        if not (c.beneficio and c.texto) or (vr is not None and va is not None):
+            continue
+        c_vr, c_va = extrair(c.texto)
+        if vr is None and "vr" in c.beneficio:
+            vr = c_vr
+        if va is None and "va" in c.beneficio:
+            va = c_va
+    return vr, va
+
+
+def texto_para_regras(texto: str) -> str:
+    """Cláusulas de benefício do texto ou, na falta delas, o próprio texto."""
+    return texto_beneficio(segmentar_clausulas(texto)) or texto
+
+
+def clausulas_para_dicts(clausulas: List[Clausula]) -> List[Dict[str, Any]]:
+    return [asdict(c) for c in clausulas]
+
+
+def _conn() -> sqlite3.Connection:
+    DB_PATH.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(DB_PATH), timeout=30)
+    conn.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS {TABELA} (
+            doc_sha1 TEXT NOT NULL,
+            ordem INTEGER NOT NULL,
+            arquivo TEXT,
+            numero TEXT,
+            titulo TEXT,
+            inicio INTEGER,
+            fim INTEGER,
+            beneficio TEXT,
+            texto TEXT,
+            PRIMARY KEY (doc_sha1, ordem)
+        )
+        """
+    )
+    conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{TABELA}_arquivo ON {TABELA}(arquivo)")
+    return conn
+
+
+def salvar_clausulas(doc_sha1: str, arquivo: str, clausulas: List[Clausula]) -> None:
+    with _conn() as conn:
+        conn.execute(f"DELETE FROM {TABELA} WHERE doc_sha1 = ?", (doc_sha1,))
+        conn.executemany(
+            f"""
+            INSERT INTO {TABELA} (doc_sha1, ordem, arquivo, numero, titulo, inicio, fim, beneficio, texto)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            [
+                (doc_sha1, c.ordem, arquivo, c.numero, c.titulo, c.inicio, c.fim, c.beneficio, c.texto or None)
+                for c in clausulas
+            ],
+        )
+
+
+def carregar_clausulas(doc_sha1: Optional[str], so_beneficio: bool = False) -> List[Clausula]:
+    if not doc_sha1:
+        return []
+    sql = f"SELECT ordem, numero, titulo, inicio, fim, beneficio, texto FROM {TABELA} WHERE doc_sha1 = ?"
+    if so_beneficio:
+        sql += " AND beneficio != ''"
+    try:
+        with _conn() as conn:
+            rows = conn.execute(sql + " ORDER BY ordem", (doc_sha1,)).fetchall()
+    except Exception:
+        return []
+    return [
+        Clausula(ordem=r[0], numero=r[1] or "", titulo=r[2] or "", inicio=r[3], fim=r[4],
+                 beneficio=r[5] or "", texto=r[6] or "")
+        for r in rows
+    ]
+
+
+def remover_clausulas(arquivo: str, manter: Optional[str] = None) -> int:
+    """Apaga as cláusulas gravadas para o nome de arquivo (exceto o SHA1 `manter`)."""
+    try:
+        with _conn() as conn:
+            cur = conn.execute(
+                f"DELETE FROM {TABELA} WHERE arquivo = ? AND doc_sha1 != ?", (arquivo, manter or "")
+            )
+            return cur.rowcount
+    except Exception:
+        return 0
+
+
+def texto_beneficio_sindicato(uf: str, sindicato: str, limite: int = LIMITE_TEXTO_LLM) -> Optional[str]:
+    """Cláusulas de benefício das CCTs ingeridas para (UF, sindicato), para a extração por LLM."""
+    try:
+        with _conn() as conn:
+            rows = conn.execute(
+                f"""
+                SELECT c.texto FROM {TABELA} c JOIN regras_cct r ON r.doc_sha1 = c.doc_sha1
+                WHERE r.uf = ? AND r.sindicato = ? AND c.beneficio != '' AND c.texto IS NOT NULL
+                ORDER BY r.arquivo, c.ordem
+                """,
+                (uf, sindicato),
+            ).fetchall()
+    except Exception:
+        return None
+    texto = "\n\n".join(r[0] for r in rows)
+    return texto[:limite] if texto else None
@@ -32,6 +32,14 @@ def get_llm():
         return ChatGoogleGenerativeAI(model=model, temperature=temperature)
 
 
+def get_llm_id() -> str:
+    """Identificador 'provedor:modelo' do LLM configurado (usado como chave de caches)."""
+    provider = (get_env("LLM_PROVIDER", "google") or "google").lower()
+    if provider == "groq":
+        return f"groq:{get_env('GROQ_MODEL', 'llama-3.1-8b-instant')}"
+    return f"google:{get_env('GENAI_MODEL', 'gemini-1.5-pro')}"
+
+
 # ---------------------------------------------------------------------------
 # Parametrização de regras de negócio (customizável por .env se desejar)
 # ---------------------------------------------------------------------------
@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+from datetime import date
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Normalização de colunas de data das bases de entrada.
+# O formato de cada coluna é inferido uma vez a partir de uma amostra (datetime nativo do
+# Excel, serial do Excel, ISO ou dd/mm/aaaa) e a coluna inteira é convertida de uma vez
+# com `pd.to_datetime(format=..., errors="coerce")`. Células não vazias que não viram
+# data são reportadas em bloco, em vez de try/except célula a célula.
+
+_HORA = r"(?:[ T]\d{1,2}:\d{2}(?::\d{2}(?:\.\d+)?)?)?"
+
+# (nome, regex da parte de data, formato strptime); hora opcional é aceita e descartada
+_PADROES: List[Tuple[str, str, Optional[str]]] = [
+    ("iso", r"\d{4}-\d{1,2}-\d{1,2}", "%Y-%m-%d"),
+    ("br", r"\d{1,2}/\d{1,2}/\d{4}", "%d/%m/%Y"),
+    ("br_traco", r"\d{1,2}-\d{1,2}-\d{4}", "%d-%m-%Y"),
+    ("br_ponto", r"\d{1,2}\.\d{1,2}\.\d{4}", "%d.%m.%Y"),
+    ("br_curto", r"\d{1,2}/\d{1,2}/\d{2}", "%d/%m/%y"),
+    ("excel", r"\d{4,5}(?:[.,]\d+)?", None),
+]
+FORMATOS: Dict[str, Optional[str]] = {nome: fmt for nome, _, fmt in _PADROES}
+_REGEX: Dict[str, str] = {nome: rx for nome, rx, _ in _PADROES}
+
+_VAZIOS = {"", "nan", "nat", "none", "<na>", "null", "-"}
+# seriais do Excel plausíveis: 1900-01-01 .. 9999-12-31
+_SERIAL_MIN, _SERIAL_MAX = 1, 2958465
+
+
+def _nao_vazios(serie: pd.Series) -> pd.Series:
+    if serie.dtype == object or pd.api.types.is_string_dtype(serie):
+        txt = serie.astype(str).str.strip().str.lower()
+        return serie.notna() & ~txt.isin(_VAZIOS)
+    return serie.notna()
+
+
+def inferir_formato(serie: Optional[pd.Series], amostra: int = 200) -> Optional[str]:
+    """
+    Formato predominante de uma coluna de datas: 'datetime' (já convertida pelo leitor),
+    'excel' (serial numérico), um dos nomes de `FORMATOS` ou 'misto' quando nenhum padrão
+    cobre a amostra. None para coluna vazia.
+    """
+    if serie is None or len(serie) == 0:
+        return None
+    if pd.api.types.is_datetime64_any_dtype(serie):
+        return "datetime"
+    s = serie[_nao_vazios(serie)]
+    if s.empty:
+        return None
+    s = s.head(amostra)
+    tipo = pd.api.types.infer_dtype(s, skipna=True)
+    if tipo in ("datetime", "datetime64", "date"):
+        return "datetime"
+    if tipo in ("integer", "floating", "mixed-integer-float", "decimal"):
+        return "excel"
+    txt = s.astype(str).str.strip()
+    melhor, cobertura = "misto", 0.0
+    for nome, rx, _ in _PADROES:
+        c = float(txt.str.fullmatch(rx + _HORA).mean())
+        if c > cobertura:
+            melhor, cobertura = nome, c
+    # padrão dominante; o restante (formatos divergentes) é tratado em nova passada
+    return melhor if cobertura > 0 else "misto"
+
+
+def _converter(serie: pd.Series, formato: str) -> pd.Series:
+    if formato == "datetime":
+        if pd.api.types.is_datetime64_any_dtype(serie):
+            out = serie
+        else:
+            # somente objetos datetime/date; textos ficam para a passada seguinte
+            eh_data = serie.map(lambda v: isinstance(v, (date, np.datetime64)))
+            out = pd.to_datetime(serie.where(eh_data), errors="coerce")
+    elif formato == "excel":
+        num = pd.to_numeric(serie.astype(str).str.strip().str.replace(",", ".", regex=False), errors="coerce")
+        num = num.where((num >= _SERIAL_MIN) & (num <= _SERIAL_MAX))
+        out = pd.to_datetime(num, unit="D", origin="1899-12-30", errors="coerce")
+    elif formato == "misto":
+        out = pd.to_datetime(serie.astype(str).str.strip(), errors="coerce", dayfirst=True, format="mixed")
+    else:
+        parte = serie.astype(str).str.strip().str.extract(f"^({_REGEX[formato]}){_HORA}$", expand=False)
+        out = pd.to_datetime(parte, format=FORMATOS[formato], errors="coerce")
+    out = pd.Series(out, index=serie.index)
+    if getattr(out.dt, "tz", None) is not None:
+        out = out.dt.tz_localize(None)
+    return out.dt.normalize().astype("datetime64[ns]")
+
+
+def converter_datas(serie: Optional[pd.Series], formato: Optional[str] = None) -> pd.Series:
+    """
+    Converte uma coluna inteira para datetime64 (meia-noite), NaT para vazios/inválidos.
+    Usa o formato inferido da coluna; células em formato divergente passam por uma nova
+    inferência apenas sobre o restante (ex.: coluna datetime com alguns textos dd/mm/aaaa).
+    """
+    if serie is None:
+        return pd.Series([], dtype="datetime64[ns]")
+    out = pd.Series(pd.NaT, index=serie.index, dtype="datetime64[ns]")
+    pend = _nao_vazios(serie)
+    fmt = formato or inferir_formato(serie)
+    tentados = set()
+    while fmt and fmt not in tentados and pend.any():
+        tentados.add(fmt)
+        conv = _converter(serie[pend], fmt)
+        out.loc[conv.index] = conv
+        pend = pend & out.isna()
+        # células restantes: nova inferência; as que casam com um formato já tentado são inválidas
+        fmt = inferir_formato(serie[pend]) if pend.any() else None
+    return out
+
+
+def para_dias(serie: pd.Series) -> np.ndarray:
+    """Coluna de datas como `datetime64[D]` (NaT preservado)."""
+    return converter_datas(serie).to_numpy(dtype="datetime64[D]")
+
+
+def como_date(serie: pd.Series) -> List[Optional[date]]:
+    """Lista de `datetime.date` (None para NaT) — para código que ainda trabalha com `date`."""
+    conv = converter_datas(serie)
+    return [None if pd.isna(v) else v.date() for v in conv]
+
+
+def normalizar_colunas_data(
+    df: Optional[pd.DataFrame],
+    colunas: Iterable[Optional[str]],
+    base: str = "",
+) -> Tuple[Dict[str, pd.Series], List[Dict[str, object]]]:
+    """
+    Converte as colunas de data informadas de um DataFrame.
+    Retorna ({coluna: série datetime64}, invalidas), onde `invalidas` lista as células não
+    vazias que não puderam ser convertidas (base, coluna, linha, valor, formato).
+    """
+    convertidas: Dict[str, pd.Series] = {}
+    invalidas: List[Dict[str, object]] = []
+    if df is None or df.empty:
+        return convertidas, invalidas
+    for col in colunas:
+        if not col or col not in df.columns or col in convertidas:
+            continue
+        fmt = inferir_formato(df[col])
+        conv = converter_datas(df[col], fmt)
+        convertidas[col] = conv
+        ruins = _nao_vazios(df[col]) & conv.isna()
+        if ruins.any():
+            for idx, val in df.loc[ruins, col].items():
+                invalidas.append({"base": base, "coluna": col, "linha": idx, "valor": str(val), "formato": fmt})
+    return convertidas, invalidas
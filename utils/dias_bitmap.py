@@ -0,0 +1,174 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import date
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from utils.calendario import is_feriado
+
+# Álgebra de dias por colaborador: cada conjunto (janela da competência, dias úteis,
+# férias, afastamentos) vira uma matriz booleana (colaboradores × dias) sobre a mesma
+# grade de dias corridos. Dias pagos = popcount(janela & util & ~ausencia).
+
+
+def grade_dias(inicio: date, fim: date) -> np.ndarray:
+    """Vetor datetime64[D] com todos os dias corridos de [inicio, fim] (inclusivo)."""
+    if fim < inicio:
+        return np.array([], dtype="datetime64[D]")
+    return np.arange(np.datetime64(inicio, "D"), np.datetime64(fim, "D") + 1, dtype="datetime64[D]")
+
+
+def mascara_uteis(dias: np.ndarray, uf: Optional[str], municipio: Optional[str] = None) -> np.ndarray:
+    """
+    Máscara (n_dias,) de dias úteis: segunda a sexta e não feriado para a UF/município.
+    Mesma regra de `dias_uteis_periodo`; em caso de falha no calendário, considera apenas seg-sex.
+    """
+    seg_sex = np.is_busday(dias)
+    try:
+        feriado = np.array(
+            [bool(seg_sex[k]) and is_feriado(d.item(), uf, municipio) for k, d in enumerate(dias)],
+            dtype=bool,
+        )
+    except Exception:
+        feriado = np.zeros(len(dias), dtype=bool)
+    return seg_sex & ~feriado
+
+
+def mascara_intervalos(
+    dias: np.ndarray,
+    n_linhas: int,
+    linhas: Sequence[int],
+    inicios: Sequence,
+    fins: Sequence,
+) -> np.ndarray:
+    """
+    Matriz bool (n_linhas × n_dias) com True nos dias cobertos por cada intervalo
+    [inicio, fim] atribuído à linha correspondente. Intervalos sobrepostos da mesma
+    linha são unidos (OR), datas fora da grade são recortadas e NaT é ignorado.
+    """
+    n_dias = len(dias)
+    out = np.zeros((n_linhas, n_dias), dtype=bool)
+    if n_dias == 0 or len(linhas) == 0:
+        return out
+    linhas_a = np.asarray(linhas, dtype=np.int64)
+    ini_a = np.asarray(inicios, dtype="datetime64[D]")
+    fim_a = np.asarray(fins, dtype="datetime64[D]")
+    validos = ~(np.isnat(ini_a) | np.isnat(fim_a))
+    linhas_a, ini_a, fim_a = linhas_a[validos], ini_a[validos], fim_a[validos]
+    s = np.clip((ini_a - dias[0]).astype(np.int64), 0, n_dias)
+    e = np.clip((fim_a - dias[0]).astype(np.int64) + 1, 0, n_dias)
+    ok = e > s
+    if not ok.any():
+        return out
+    # vetor de diferenças: +1 no início, -1 após o fim; soma acumulada > 0 marca cobertura
+    diff = np.zeros((n_linhas, n_dias + 1), dtype=np.int32)
+    np.add.at(diff, (linhas_a[ok], s[ok]), 1)
+    np.add.at(diff, (linhas_a[ok], e[ok]), -1)
+    return np.cumsum(diff[:, :-1], axis=1) > 0
+
+
+def primeiros_n(mascara: np.ndarray, n: Sequence[int]) -> np.ndarray:
+    """Mantém, por linha, apenas os N primeiros dias marcados (bloco sintético a partir do início)."""
+    n_a = np.asarray(n, dtype=np.int64).reshape(-1, 1)
+    return mascara & (np.cumsum(mascara, axis=1) <= n_a)
+
+
+def popcount(mascara: np.ndarray) -> np.ndarray:
+    """Quantidade de dias marcados por linha."""
+    return np.count_nonzero(mascara, axis=1).astype(np.int64)
+
+
+def mascara_uteis_por_linha(dias: np.ndarray, ufs: Sequence[Optional[str]]) -> np.ndarray:
+    """Matriz de dias úteis por linha, calculando o calendário uma única vez por UF distinta."""
+    codigos, unicos = pd.factorize(pd.Series(list(ufs), dtype=object), use_na_sentinel=False)
+    if len(unicos) == 0:
+        return np.zeros((0, len(dias)), dtype=bool)
+    base = np.stack([
+        mascara_uteis(dias, u if isinstance(u, str) and u else None) for u in unicos
+    ])
+    return base[codigos]
+
+
+@dataclass
+class BitmapDias:
+    """Conjuntos de dias por colaborador sobre a grade `dias` (colunas) — uma linha por colaborador."""
+
+    dias: np.ndarray
+    janela: np.ndarray
+    util: np.ndarray
+    ferias: np.ndarray
+    afastamento: np.ndarray
+
+    @property
+    def ausencia(self) -> np.ndarray:
+        return self.ferias | self.afastamento
+
+    def dias_trabalhaveis(self) -> np.ndarray:
+        return popcount(self.janela & self.util)
+
+    def dias_pagos(self) -> np.ndarray:
+        return popcount(self.janela & self.util & ~self.ausencia)
+
+    def trilha(self, linha: int) -> pd.DataFrame:
+        """Trilha de auditoria dia a dia de um colaborador (motivo de cada dia pago/não pago)."""
+        j = self.janela[linha]
+        u = self.util[linha]
+        f = self.ferias[linha]
+        a = self.afastamento[linha]
+        motivo = np.select(
+            [~j, ~u, f, a],
+            ["FORA_JANELA", "NAO_UTIL", "FERIAS", "AFASTAMENTO"],
+            default="PAGO",
+        )
+        return pd.DataFrame({
+            "data": self.dias.astype("datetime64[ns]"),
+            "janela": j,
+            "util": u,
+            "ferias": f,
+            "afastamento": a,
+            "pago": j & u & ~(f | a),
+            "motivo": motivo,
+        })
+
+
+def montar_bitmap(
+    inicio: date,
+    fim: date,
+    janelas_ini: Sequence,
+    janelas_fim: Sequence,
+    ufs: Sequence[Optional[str]],
+    ferias: Optional[Dict[int, list]] = None,
+    afastamentos: Optional[Dict[int, list]] = None,
+    ferias_sinteticas: Optional[Sequence[int]] = None,
+) -> BitmapDias:
+    """
+    Monta o `BitmapDias` de uma população.
+
+    - janelas_ini/janelas_fim: janela efetiva por linha (admissão/desligamento já aplicados); NaT = sem dias
+    - ufs: UF por linha (feriados estaduais)
+    - ferias/afastamentos: {linha: [(inicio, fim), ...]}
+    - ferias_sinteticas: N dias úteis de férias por linha quando só há quantidade (sem datas);
+      ocupa os N primeiros dias úteis da janela.
+    """
+    dias = grade_dias(inicio, fim)
+    n = len(ufs)
+    janela = mascara_intervalos(dias, n, np.arange(n), janelas_ini, janelas_fim)
+    util = mascara_uteis_por_linha(dias, ufs) if n else np.zeros((0, len(dias)), dtype=bool)
+
+    def _expandir(mapa: Optional[Dict[int, list]]) -> np.ndarray:
+        linhas, ini, fi = [], [], []
+        for i, periodos in (mapa or {}).items():
+            for (s, e) in periodos:
+                linhas.append(i)
+                ini.append(s)
+                fi.append(e)
+        return mascara_intervalos(dias, n, linhas, ini, fi)
+
+    m_ferias = _expandir(ferias)
+    if ferias_sinteticas is not None and n:
+        m_ferias = m_ferias | primeiros_n(janela & util, ferias_sinteticas)
+    m_afast = _expandir(afastamentos)
+    return BitmapDias(dias=dias, janela=janela, util=util, ferias=m_ferias, afastamento=m_afast)
@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+import json
+import sqlite3
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from ferramentas.persistencia_db import DB_PATH
+from utils.artefato_pdf import sha1_arquivo
+
+# Seleção incremental da ingestão de CCTs e remontagem do rules_index.
+# regras_cct é o marcador final de cada PDF: arquivo -> (doc_sha1, regras gravadas).
+# Só PDFs novos ou alterados (SHA1 diferente) são reprocessados (todos com `completo`);
+# os que sumiram da pasta são removidos. O SHA1 de cada PDF é calculado uma única vez e
+# segue com o PDF até a extração.
+
+
+@dataclass
+class SelecaoIngestao:
+    pendentes: List[Tuple[Path, Optional[str]]] = field(default_factory=list)  # (pdf, sha1) na ordem da pasta
+    removidos: List[str] = field(default_factory=list)
+    ignorados: int = 0
+    # CCT nova, alterada ou removida: extrações LLM e pré-resoluções deixam de valer
+    invalidar_extracao: bool = False
+
+
+def ingeridos_regras_cct() -> Dict[str, Tuple[Optional[str], bool]]:
+    """arquivo -> (doc_sha1, tem regras_json) dos PDFs já gravados em regras_cct."""
+    try:
+        with sqlite3.connect(str(DB_PATH)) as conn:
+            rows = conn.execute("SELECT arquivo, doc_sha1, regras_json IS NOT NULL FROM regras_cct").fetchall()
+        return {r[0]: (r[1], bool(r[2])) for r in rows}
+    except Exception:
+        return {}
+
+
+def selecionar_pdfs(
+    pdfs: Iterable[Path],
+    ingeridos: Dict[str, Tuple[Optional[str], bool]],
+    completo: bool = False,
+    sha1: Callable[[Path], Optional[str]] = sha1_arquivo,
+) -> SelecaoIngestao:
+    """PDFs a processar (com o SHA1 já calculado), arquivos removidos e se o cache LLM cai."""
+    pdfs = list(pdfs)
+    nomes = {p.name for p in pdfs}
+    sel = SelecaoIngestao(removidos=sorted(a for a in ingeridos if a not in nomes))
+    for pdf in pdfs:
+        atual = sha1(pdf)
+        sha1_gravado, tem_regras = ingeridos.get(pdf.name, (None, False))
+        if sha1_gravado != atual:
+            sel.invalidar_extracao = True
+        elif tem_regras and sha1_gravado and not completo:
+            sel.ignorados += 1
+            continue
+        sel.pendentes.append((pdf, atual))
+    sel.invalidar_extracao = sel.invalidar_extracao or bool(sel.removidos)
+    return sel
+
+
+def reconstruir_rules_index() -> List[dict]:
+    """rules_index a partir de regras_cct (todos os PDFs ingeridos, em ordem de arquivo)."""
+    with sqlite3.connect(str(DB_PATH)) as conn:
+        rows = conn.execute(
+            "SELECT arquivo, uf, sindicato, sindicato_id, regras_json, vigencia_inicio, vigencia_fim "
+            "FROM regras_cct WHERE regras_json IS NOT NULL ORDER BY arquivo"
+        ).fetchall()
+    out: List[dict] = []
+    for arquivo, uf, sindicato, sindicato_id, regras_json, vig_ini, vig_fim in rows:
+        try:
+            regras = json.loads(regras_json)
+        except Exception:
+            continue
+        if not regras:
+            continue
+        out.append({
+            "arquivo": arquivo,
+            "uf": uf,
+            "sindicato": sindicato,
+            "sindicato_id": sindicato_id,
+            **regras,
+            "vigencia_inicio": vig_ini,
+            "vigencia_fim": vig_fim,
+        })
+    return out
@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+# Normalização única de matrículas para todas as bases (ATIVOS, FÉRIAS, DESLIGADOS, ...).
+# Planilhas diferentes trazem a mesma matrícula como 1234, "1234", 1234.0 ou "001234";
+# todas viram a forma canônica "1234" e o código inteiro 1234.
+
+CODIGO_AUSENTE = np.int64(np.iinfo(np.int64).min)
+
+_VAZIOS = {"", "nan", "none", "nat", "<na>", "null"}
+
+
+def canonizar_matricula(v) -> Optional[str]:
+    """Forma canônica (str) de uma matrícula; None quando vazia."""
+    if v is None:
+        return None
+    if isinstance(v, float):
+        if np.isnan(v):
+            return None
+        if v.is_integer():
+            return str(int(v))
+    s = str(v).strip()
+    if s.lower() in _VAZIOS:
+        return None
+    # artefato de float vindo de Excel/CSV: "1234.0" / "1234,00"
+    if s.replace(".", "", 1).replace(",", "", 1).isdigit():
+        inteiro, _, frac = s.replace(",", ".").partition(".")
+        if not frac.strip("0"):
+            s = inteiro
+    if s.isdigit():
+        s = s.lstrip("0") or "0"
+        return s
+    return s.upper()
+
+
+def canonizar_serie(serie: pd.Series) -> pd.Series:
+    """Versão vetorizada de `canonizar_matricula` (dtype object, None para vazios)."""
+    if serie is None or len(serie) == 0:
+        return pd.Series([], dtype=object)
+    s = serie.astype(str).str.strip()
+    vazio = s.str.lower().isin(_VAZIOS) | serie.isna()
+    s = s.str.replace(r"^(\d+)[.,]0*$", r"\1", regex=True)
+    dig = s.str.fullmatch(r"\d+")
+    s = s.where(~dig, s.str.lstrip("0").replace("", "0"))
+    s = s.where(dig, s.str.upper()).astype(object)
+    s[vazio.to_numpy(dtype=bool)] = None
+    return s
+
+
+class DicionarioMatriculas:
+    """
+    Codificação int64 compartilhada entre bases de uma mesma execução.
+    Matrículas numéricas usam o próprio valor como código (estável entre bases);
+    matrículas alfanuméricas recebem códigos negativos sequenciais do dicionário.
+    Vazios viram `CODIGO_AUSENTE`.
+    """
+
+    def __init__(self) -> None:
+        self._alfa: Dict[str, int] = {}
+        self._rev: Dict[int, str] = {}
+
+    def codificar(self, valores: Iterable) -> np.ndarray:
+        serie = valores if isinstance(valores, pd.Series) else pd.Series(list(valores), dtype=object)
+        canon = canonizar_serie(serie)
+        out = np.full(len(canon), CODIGO_AUSENTE, dtype=np.int64)
+        if len(canon) == 0:
+            return out
+        dig = canon.str.fullmatch(r"\d{1,18}").fillna(False).to_numpy(dtype=bool)
+        if dig.any():
+            out[dig] = canon[dig].astype(np.int64).to_numpy()
+        alfa = (~dig) & canon.notna().to_numpy()
+        if alfa.any():
+            codigos, unicos = pd.factorize(canon[alfa])
+            mapa = np.array([self._codigo_alfa(u) for u in unicos], dtype=np.int64)
+            out[alfa] = mapa[codigos]
+        return out
+
+    def _codigo_alfa(self, s: str) -> int:
+        c = self._alfa.get(s)
+        if c is None:
+            c = -(len(self._alfa) + 1)
+            self._alfa[s] = c
+            self._rev[c] = s
+        return c
+
+    def codificar_coluna(self, df: Optional[pd.DataFrame], col: Optional[str] = None) -> np.ndarray:
+        """Códigos da coluna `col` (padrão: primeira coluna) de um DataFrame; vazio se ausente."""
+        if df is None or df.empty or len(df.columns) == 0:
+            return np.array([], dtype=np.int64)
+        return self.codificar(df[col if col is not None else df.columns[0]])
+
+    def decodificar(self, codigos: Iterable[int]) -> List[Optional[str]]:
+        out: List[Optional[str]] = []
+        for c in codigos:
+            c = int(c)
+            if c == CODIGO_AUSENTE:
+                out.append(None)
+            elif c >= 0:
+                out.append(str(c))
+            else:
+                out.append(self._rev.get(c))
+        return out
@@ -0,0 +1,192 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import sqlite3
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from ferramentas.persistencia_db import DB_PATH
+
+# OCR adaptativo de página digitalizada.
+# 1) Renderiza em baixa resolução (DPI_CLASSIFICACAO) e classifica a página pela tinta e
+#    pelas linhas de grade: branca (sem OCR), esparsa, tabela ou texto.
+# 2) O PSM do Tesseract sai da classe (os demais só se o primeiro não devolver texto).
+# 3) Começa no menor DPI da escada e só sobe quando a confiança média das palavras
+#    (`image_to_data`) fica abaixo de CONF_MIN; fica o resultado de maior confiança.
+# O resultado é gravado por hash da imagem em baixa resolução (+ assinatura da configuração):
+# página idêntica em outro PDF ou em outra versão do mesmo PDF não passa pelo OCR de novo.
+# Em workers de processo, `ocr_pagina(..., gravar=...)` só coleta as entradas novas; quem
+# grava no SQLite (gravar_ocr_lote) é o processo principal.
+
+DPI_CLASSIFICACAO = 72
+DPIS = tuple(int(d) for d in os.getenv("VRVA_OCR_DPIS", "200,300,400").split(",") if d.strip())
+CONF_MIN = float(os.getenv("VRVA_OCR_CONF_MIN", "70"))
+IDIOMA = "por+eng"
+MIN_CHARS = 10
+
+LIMIAR_BRANCA = 0.002  # fração de pixels escuros abaixo da qual a página é considerada em branco
+LIMIAR_ESPARSA = 0.02
+PSM_POR_CLASSE: Dict[str, Tuple[int, ...]] = {
+    "texto": (6, 4, 11),
+    "tabela": (4, 6, 11),
+    "esparsa": (11, 6, 4),
+}
+
+TABELA = "cache_ocr_paginas"
+ASSINATURA = f"v1|{','.join(map(str, DPIS))}|{CONF_MIN:g}|{IDIOMA}"
+
+
+@dataclass
+class ResultadoOCR:
+    texto: str
+    classe: str
+    dpi: Optional[int] = None
+    psm: Optional[int] = None
+    confianca: float = 0.0
+    do_cache: bool = False
+
+
+def classificar_pagina(cinza: np.ndarray) -> str:
+    """branca | esparsa | tabela | texto, a partir da imagem em tons de cinza (2D)."""
+    if cinza.ndim == 3:
+        cinza = cinza.mean(axis=2)
+    escuro = cinza < 128
+    tinta = float(escuro.mean()) if escuro.size else 0.0
+    if tinta < LIMIAR_BRANCA:
+        return "branca"
+    if tinta < LIMIAR_ESPARSA:
+        return "esparsa"
+    # grade de tabela: várias linhas horizontais longas e colunas verticais longas
+    horizontais = int((escuro.mean(axis=1) > 0.5).sum())
+    verticais = int((escuro.mean(axis=0) > 0.3).sum())
+    if horizontais >= 3 and verticais >= 2:
+        return "tabela"
+    return "texto"
+
+
+def texto_e_confianca(dados: Dict[str, List[Any]]) -> Tuple[str, float]:
+    """Texto (linhas na ordem de leitura) e confiança média das palavras de `image_to_data`."""
+    linhas: Dict[Tuple[int, int, int], List[str]] = {}
+    confs: List[float] = []
+    for i, palavra in enumerate(dados.get("text") or []):
+        palavra = (palavra or "").strip()
+        if not palavra:
+            continue
+        try:
+            conf = float(dados["conf"][i])
+        except Exception:
+            conf = -1.0
+        if conf >= 0:
+            confs.append(conf)
+        chave = (int(dados["block_num"][i]), int(dados["par_num"][i]), int(dados["line_num"][i]))
+        linhas.setdefault(chave, []).append(palavra)
+    texto = "\n".join(" ".join(p) for _, p in sorted(linhas.items()))
+    return texto, (sum(confs) / len(confs) if confs else 0.0)
+
+
+def chave_pagina(cinza_baixa: np.ndarray) -> str:
+    h = hashlib.sha1(np.ascontiguousarray(cinza_baixa).tobytes())
+    h.update(f"{cinza_baixa.shape}|{ASSINATURA}".encode("utf-8"))
+    return h.hexdigest()
+
+
+def _conn() -> sqlite3.Connection:
+    DB_PATH.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(DB_PATH), timeout=30)
+    conn.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS {TABELA} (
+            chave TEXT PRIMARY KEY,
+            texto TEXT NOT NULL,
+            classe TEXT,
+            dpi INTEGER,
+            psm INTEGER,
+            confianca REAL,
+            criado_em REAL NOT NULL
+        )
+        """
+    )
+    return conn
+
+
+def ler_ocr(chave: str) -> Optional[ResultadoOCR]:
+    try:
+        with _conn() as conn:
+            row = conn.execute(
+                f"SELECT texto, classe, dpi, psm, confianca FROM {TABELA} WHERE chave = ?", (chave,)
+            ).fetchone()
+    except Exception:
+        return None
+    if not row:
+        return None
+    return ResultadoOCR(texto=row[0], classe=row[1] or "", dpi=row[2], psm=row[3], confianca=row[4] or 0.0, do_cache=True)
+
+
+def gravar_ocr_lote(itens: Iterable[Tuple[str, ResultadoOCR]]) -> int:
+    """Grava várias entradas do cache numa única transação; retorna quantas foram gravadas."""
+    agora = time.time()
+    dados = [(chave, r.texto, r.classe, r.dpi, r.psm, r.confianca, agora) for chave, r in itens]
+    if not dados:
+        return 0
+    try:
+        with _conn() as conn:
+            conn.executemany(
+                f"""
+                INSERT OR REPLACE INTO {TABELA} (chave, texto, classe, dpi, psm, confianca, criado_em)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                """,
+                dados,
+            )
+    except Exception:
+        return 0
+    return len(dados)
+
+
+def gravar_ocr(chave: str, res: ResultadoOCR) -> None:
+    gravar_ocr_lote([(chave, res)])
+
+
+def ocr_pagina(
+    renderizar: Callable[[int], np.ndarray],
+    reconhecer: Callable[[Any, int], Dict[str, List[Any]]],
+    preprocessar: Optional[Callable[[np.ndarray], Any]] = None,
+    usar_cache: bool = True,
+    gravar: Optional[Callable[[str, ResultadoOCR], None]] = None,
+) -> ResultadoOCR:
+    """
+    OCR de uma página. `renderizar(dpi)` devolve a imagem (cinza) no DPI pedido,
+    `reconhecer(imagem, psm)` devolve o dicionário de `pytesseract.image_to_data` e
+    `preprocessar` (opcional) prepara a imagem antes do reconhecimento.
+    `gravar(chave, resultado)` substitui a gravação direta no cache (padrão: gravar_ocr).
+    """
+    baixa = renderizar(DPI_CLASSIFICACAO)
+    chave = chave_pagina(baixa) if usar_cache else None
+    if chave:
+        hit = ler_ocr(chave)
+        if hit is not None:
+            return hit
+    classe = classificar_pagina(baixa)
+    melhor = ResultadoOCR(texto="", classe=classe)
+    if classe != "branca":
+        for dpi in DPIS or (300,):
+            img = renderizar(dpi)
+            if preprocessar is not None:
+                img = preprocessar(img)
+            for psm in PSM_POR_CLASSE.get(classe, PSM_POR_CLASSE["texto"]):
+                try:
+                    texto, conf = texto_e_confianca(reconhecer(img, psm))
+                except Exception:
+                    continue
+                if len(texto.strip()) >= MIN_CHARS:
+                    if conf > melhor.confianca or not melhor.texto:
+                        melhor = ResultadoOCR(texto=texto, classe=classe, dpi=dpi, psm=psm, confianca=conf)
+                    break
+            if melhor.texto and melhor.confianca >= CONF_MIN:
+                break
+    if chave:
+        (gravar or gravar_ocr)(chave, melhor)
+    return melhor
@@ -0,0 +1,318 @@
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+import time
+from datetime import date, datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+import pandas as pd
+
+from ferramentas.persistencia_db import DB_PATH
+
+# Overrides manuais de regras de CCT em tabela SQLite indexada por (uf, sindicato).
+# Cada linha tem vigência (datas ISO opcionais), autor e versão: a gravação pelo editor
+# informa a versão que leu e falha com `ConflitoVersao` se outra pessoa salvou antes
+# (concorrência otimista). `rules_overrides.json` passa a ser apenas exportação, regravada
+# após cada escrita; na criação da tabela o JSON existente é importado uma única vez.
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+RULES_OVERRIDES = BASE_DIR / "base_conhecimento" / "chromadb" / "rules_overrides.json"
+TABELA = "regras_cct_overrides"
+
+_CAMPOS = ("vr_valor", "va_valor", "dias", "periodicidade", "notas", "fonte", "vigencia_inicio", "vigencia_fim")
+
+
+class ConflitoVersao(Exception):
+    """O override foi alterado por outro editor depois de lido."""
+
+
+def _autor_padrao() -> str:
+    return os.getenv("VRVA_AUTOR") or os.getenv("USER") or os.getenv("USERNAME") or "desconhecido"
+
+
+def _criar_tabela(conn: sqlite3.Connection) -> bool:
+    """Cria a tabela se necessário; True quando acabou de ser criada."""
+    existe = conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (TABELA,)).fetchone()
+    if existe:
+        return False
+    conn.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS {TABELA} (
+            uf TEXT NOT NULL,
+            sindicato TEXT NOT NULL,
+            vr_valor TEXT,
+            va_valor TEXT,
+            dias INTEGER,
+            periodicidade TEXT,
+            notas TEXT,
+            fonte TEXT,
+            vigencia_inicio TEXT,
+            vigencia_fim TEXT,
+            autor TEXT,
+            versao INTEGER NOT NULL DEFAULT 1,
+            atualizado_em REAL,
+            PRIMARY KEY (uf, sindicato)
+        )
+        """
+    )
+    return True
+
+
+def _conn() -> sqlite3.Connection:
+    DB_PATH.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(DB_PATH), timeout=30)
+    with conn:
+        if _criar_tabela(conn):
+            _migrar_json(conn)
+    return conn
+
+
+def garantir_tabela() -> None:
+    """Cria a tabela (migrando o JSON legado) sem outras escritas."""
+    _conn().close()
+
+
+def _migrar_json(conn: sqlite3.Connection) -> int:
+    try:
+        data = json.loads(RULES_OVERRIDES.read_text(encoding="utf-8")) if RULES_OVERRIDES.exists() else {}
+    except Exception:
+        data = {}
+    linhas = []
+    for k, v in (data or {}).items():
+        if "::" not in str(k) or not isinstance(v, dict):
+            continue
+        uf, sind = str(k).split("::", 1)
+        linhas.append({"uf": uf, "sindicato": sind, **v})
+    return _upsert(conn, linhas, autor="migracao_json") if linhas else 0
+
+
+def _valor(v: Any) -> Any:
+    if v is None:
+        return None
+    try:
+        if pd.isna(v):
+            return None
+    except (TypeError, ValueError):
+        pass
+    v = v.item() if hasattr(v, "item") else v
+    if isinstance(v, str):
+        v = v.strip()
+        return v or None
+    return v
+
+
+def _dias(v: Any) -> Optional[int]:
+    v = _valor(v)
+    if v is None:
+        return None
+    try:
+        return int(float(v))
+    except Exception:
+        return None
+
+
+def _data(v: Any) -> Optional[str]:
+    """Data de vigência em ISO (aceita date, ISO e dd/mm/aaaa); ValueError se inválida."""
+    v = _valor(v)
+    if v is None:
+        return None
+    if isinstance(v, (date, datetime)):
+        return (v.date() if isinstance(v, datetime) else v).isoformat()
+    txt = str(v).strip()
+    for fmt in ("%Y-%m-%d", "%d/%m/%Y"):
+        try:
+            return datetime.strptime(txt[:10], fmt).date().isoformat()
+        except ValueError:
+            continue
+    raise ValueError(f"data de vigência inválida: {txt}")
+
+
+def _data_ou_none(v: Any) -> Optional[str]:
+    try:
+        return _data(v)
+    except ValueError:
+        return None
+
+
+def _upsert(conn: sqlite3.Connection, linhas: Iterable[Dict[str, Any]], autor: str) -> int:
+    agora = time.time()
+    params = []
+    for r in linhas:
+        uf = (str(_valor(r.get("uf")) or "")).upper()
+        sind = str(_valor(r.get("sindicato")) or "")
+        if not uf or not sind:
+            continue
+        params.append((
+            uf, sind, _valor(r.get("vr_valor")), _valor(r.get("va_valor")), _dias(r.get("dias")),
+            _valor(r.get("periodicidade")), _valor(r.get("notas")), _valor(r.get("fonte")),
+            _data_ou_none(r.get("vigencia_inicio")), _data_ou_none(r.get("vigencia_fim")), autor, agora,
+        ))
+    conn.executemany(
+        f"""
+        INSERT INTO {TABELA}
+            (uf, sindicato, vr_valor, va_valor, dias, periodicidade, notas, fonte,
+             vigencia_inicio, vigencia_fim, autor, versao, atualizado_em)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 1, ?)
+        ON CONFLICT(uf, sindicato) DO UPDATE SET
+            vr_valor=excluded.vr_valor,
+            va_valor=excluded.va_valor,
+            dias=excluded.dias,
+            periodicidade=excluded.periodicidade,
+            notas=excluded.notas,
+            fonte=excluded.fonte,
+            vigencia_inicio=excluded.vigencia_inicio,
+            vigencia_fim=excluded.vigencia_fim,
+            autor=excluded.autor,
+            versao={TABELA}.versao + 1,
+            atualizado_em=excluded.atualizado_em
+        """,
+        params,
+    )
+    return len(params)
+
+
+def listar_overrides() -> Dict[str, Dict[str, Any]]:
+    """Overrides no formato do JSON legado ("UF::SINDICATO" -> campos), com autor e versão."""
+    with _conn() as conn:
+        cur = conn.execute(f"SELECT * FROM {TABELA} ORDER BY uf, sindicato")
+        cols = [d[0] for d in cur.description]
+        rows = cur.fetchall()
+    out: Dict[str, Dict[str, Any]] = {}
+    for row in rows:
+        r = dict(zip(cols, row))
+        out[f"{r.pop('uf')}::{r.pop('sindicato')}"] = r
+    return out
+
+
+def obter_override(uf: str, sindicato: str) -> Optional[Dict[str, Any]]:
+    with _conn() as conn:
+        cur = conn.execute(
+            f"SELECT * FROM {TABELA} WHERE uf = ? AND sindicato = ?", ((uf or "").upper(), (sindicato or "").strip())
+        )
+        row = cur.fetchone()
+        return dict(zip([d[0] for d in cur.description], row)) if row else None
+
+
+def salvar_override(
+    uf: str,
+    sindicato: str,
+    dados: Dict[str, Any],
+    autor: Optional[str] = None,
+    versao_esperada: Optional[int] = None,
+) -> int:
+    """
+    Grava um override e devolve a nova versão.
+    `versao_esperada`: versão lida pelo editor (0 = novo). Se a linha mudou desde então,
+    levanta `ConflitoVersao` em vez de sobrescrever. None grava sem checagem.
+    """
+    uf_k, sind_k = (uf or "").upper().strip(), (sindicato or "").strip()
+    if not uf_k or not sind_k:
+        raise ValueError("UF e sindicato são obrigatórios")
+    autor = autor or _autor_padrao()
+    vals = [
+        _dias(dados.get(c)) if c == "dias" else _data(dados.get(c)) if c.startswith("vigencia_") else _valor(dados.get(c))
+        for c in _CAMPOS
+    ]
+    if vals[6] and vals[7] and vals[6] > vals[7]:
+        raise ValueError("vigência: início posterior ao fim")
+    with _conn() as conn:
+        atual = conn.execute(
+            f"SELECT versao FROM {TABELA} WHERE uf = ? AND sindicato = ?", (uf_k, sind_k)
+        ).fetchone()
+        versao_atual = int(atual[0]) if atual else 0
+        if versao_esperada is not None and int(versao_esperada) != versao_atual:
+            raise ConflitoVersao(
+                f"{uf_k}::{sind_k} foi alterado por outro editor (versão {versao_atual}, esperada {versao_esperada})"
+            )
+        if atual:
+            sets = ", ".join(f"{c} = ?" for c in _CAMPOS)
+            cur = conn.execute(
+                f"""
+                UPDATE {TABELA} SET {sets}, autor = ?, versao = versao + 1, atualizado_em = ?
+                WHERE uf = ? AND sindicato = ? AND versao = ?
+                """,
+                (*vals, autor, time.time(), uf_k, sind_k, versao_atual),
+            )
+            if cur.rowcount == 0:
+                raise ConflitoVersao(f"{uf_k}::{sind_k} foi alterado por outro editor")
+        else:
+            try:
+                conn.execute(
+                    f"""
+                    INSERT INTO {TABELA} (uf, sindicato, {", ".join(_CAMPOS)}, autor, versao, atualizado_em)
+                    VALUES (?, ?, {", ".join("?" * len(_CAMPOS))}, ?, 1, ?)
+                    """,
+                    (uf_k, sind_k, *vals, autor, time.time()),
+                )
+            except sqlite3.IntegrityError:
+                raise ConflitoVersao(f"{uf_k}::{sind_k} foi criado por outro editor")
+    exportar_json()
+    return versao_atual + 1
+
+
+def remover_override(uf: str, sindicato: str) -> bool:
+    with _conn() as conn:
+        cur = conn.execute(
+            f"DELETE FROM {TABELA} WHERE uf = ? AND sindicato = ?", ((uf or "").upper(), (sindicato or "").strip())
+        )
+        removido = bool(cur.rowcount)
+    if removido:
+        exportar_json()
+    return removido
+
+
+def importar_overrides(df: pd.DataFrame, autor: Optional[str] = None, fonte: str = "override_csv") -> int:
+    """
+    Importação em lote (executemany) de um DataFrame com colunas UF, Sindicato e campos
+    opcionais (vr_valor, va_valor, dias, periodicidade, notas, vigencia_inicio, vigencia_fim).
+    """
+    cols = {str(c).strip().lower(): c for c in df.columns}
+    base = pd.DataFrame({
+        "uf": df[cols["uf"]].astype(str).str.upper().str.strip() if "uf" in cols else "",
+        "sindicato": df[cols["sindicato"]].astype(str).str.strip() if "sindicato" in cols else "",
+    })
+    for c in _CAMPOS:
+        base[c] = df[cols[c]] if c in cols else None
+    base["fonte"] = base["fonte"].where(base["fonte"].notna(), fonte)
+    base = base[(base["uf"] != "") & (base["sindicato"] != "") & (base["sindicato"].str.lower() != "nan")]
+    with _conn() as conn:
+        n = _upsert(conn, base.to_dict("records"), autor=autor or _autor_padrao())
+    exportar_json()
+    return n
+
+
+def exportar_json(path: Optional[Path] = None) -> int:
+    """Regrava o JSON de exportação a partir da tabela (formato legado + vigência/autor/versão)."""
+    path = path or RULES_OVERRIDES
+    overrides = listar_overrides()
+    export: Dict[str, Dict[str, Any]] = {}
+    for k, r in overrides.items():
+        item = {c: r.get(c) for c in ("vr_valor", "va_valor", "dias", "notas", "fonte")}
+        for c in ("periodicidade", "vigencia_inicio", "vigencia_fim", "autor", "versao"):
+            if r.get(c) is not None:
+                item[c] = r.get(c)
+        export[k] = item
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(export, ensure_ascii=False, indent=2), encoding="utf-8")
+        os.replace(tmp, path)
+    except Exception:
+        pass
+    return len(export)
+
+
+def overrides_como_regras() -> List[Dict[str, Any]]:
+    """Linhas (uf, sindicato, campos da regra) para o snapshot compilado."""
+    out: List[Dict[str, Any]] = []
+    for k, r in listar_overrides().items():
+        uf, sind = k.split("::", 1)
+        regra = {c: r.get(c) for c in ("vr_valor", "va_valor", "dias", "notas", "fonte")}
+        for c in ("periodicidade", "vigencia_inicio", "vigencia_fim"):
+            if r.get(c) is not None:
+                regra[c] = r.get(c)
+        out.append({"uf": uf, "sindicato": sind, "regra": regra})
+    return out
@@ -0,0 +1,213 @@
+from __future__ import annotations
+
+import re
+import unicodedata
+from functools import lru_cache
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+# Reconhecedor único de palavras-chave das CCTs.
+# Uma alternância compilada uma vez, com grupos nomeados, encontra numa única passada linear
+# siglas de UF, nomes de estado, rótulos de VR/VA, "cláusula", valores em R$ e percentuais.
+# A varredura roda sobre uma cópia sem acentos do mesmo tamanho do texto, então as posições
+# valem para o texto original. Proximidade (rótulo perto de valor) vira um merge de duas
+# listas ordenadas por posição, sem janelas de ±N caracteres nem regex por valor.
+
+ROTULOS_VR = (
+    r"(?:\bVR\b|"
+    r"vale[-\s]?refei[cç][aã]o|aux[ií]lio[-\s]?refei[cç][aã]o|refei[cç][aã]o|tele[-\s]?refei[cç][aã]o|"
+    r"ticket[-\s]?refei[cç][aã]o|cart[aã]o[-\s]?refei[cç][aã]o|benef[ií]cio[-\s]?refei[cç][aã]o|refei[cç][aã]o[-\s]?conv[eê]nio"
+    r")"
+)
+ROTULOS_VA = (
+    r"(?:\bVA\b|"
+    r"vale[-\s]?alimenta[cç][aã]o|aux[ií]lio[-\s]?alimenta[cç][aã]o|alimenta[cç][aã]o|"
+    r"ticket[-\s]?alimenta[cç][aã]o|cart[aã]o[-\s]?alimenta[cç][aã]o|cesta[-\s]?b[aá]sica|aux[ií]lio[-\s]?cesta|alimenta[cç][aã]o[-\s]?conv[eê]nio"
+    r")"
+)
+
+# Rótulos das regras da ingestão (extract_rules_from_text): o conjunto original, mais
+# estreito que o do fallback (sem cesta básica/auxílio cesta, ticket, cartão...), para o
+# valor da cesta não ser atribuído ao VA. Aplicados dentro das ocorrências da varredura.
+ROTULOS_VR_REGRAS = r"(?:\bVR\b|refei[cç][aã]o|vale[\s\-_]*refei[cç][aã]o|aux[ií]lio[\s\-_]*refei[cç][aã]o)"
+ROTULOS_VA_REGRAS = r"(?:\bVA\b|alimenta[cç][aã]o|vale[\s\-_]*alimenta[cç][aã]o|aux[ií]lio[\s\-_]*alimenta[cç][aã]o)"
+_VR_REGRAS_RE = re.compile(ROTULOS_VR_REGRAS, re.IGNORECASE)
+_VA_REGRAS_RE = re.compile(ROTULOS_VA_REGRAS, re.IGNORECASE)
+
+UFS = {"AC","AL","AP","AM","BA","CE","DF","ES","GO","MA","MT","MS","MG","PA","PB","PR","PE","PI","RJ","RN","RS","RO","RR","SC","SP","SE","TO"}
+
+# Nomes de estados (PT-BR, sem acento) -> UF
+ESTADOS = {
+    "acre": "AC",
+    "alagoas": "AL",
+    "amapa": "AP",
+    "amazonas": "AM",
+    "bahia": "BA",
+    "ceara": "CE",
+    "distrito federal": "DF",
+    "espirito santo": "ES",
+    "goias": "GO",
+    "maranhao": "MA",
+    "mato grosso": "MT",
+    "mato grosso do sul": "MS",
+    "minas gerais": "MG",
+    "para": "PA",
+    "paraiba": "PB",
+    "parana": "PR",
+    "pernambuco": "PE",
+    "piaui": "PI",
+    "rio de janeiro": "RJ",
+    "rio grande do norte": "RN",
+    "rio grande do sul": "RS",
+    "rondonia": "RO",
+    "roraima": "RR",
+    "santa catarina": "SC",
+    "sao paulo": "SP",
+    "sergipe": "SE",
+    "tocantins": "TO",
+}
+
+# valor em R$ no formato estrito (R$ 1.234,56)
+MOEDA_RE = re.compile(r"R\$\s?\d{1,3}(?:\.\d{3})*,\d{2}")
+
+# nomes mais longos primeiro: "mato grosso do sul" vence "mato grosso" na mesma posição
+_NOMES = "|".join(re.escape(n) for n in sorted(ESTADOS, key=len, reverse=True))
+_PADRAO = re.compile(
+    "|".join([
+        r"(?P<clausula>(?i:cl[aá]usula))",
+        rf"(?P<vr>(?i:{ROTULOS_VR}))",
+        rf"(?P<va>(?i:{ROTULOS_VA}))",
+        rf"(?P<estado>(?i:\b(?:{_NOMES})\b))",
+        r"(?P<uf>\b(?:" + "|".join(sorted(UFS)) + r")\b)",
+        r"(?P<pct>\d{1,3}(?:,\d+)?\s*%)",
+        r"(?P<brl>(?:R?\$\s*)?(?:\d{1,3}(?:\.\d{3})*,\d{2}|\d+(?:,\d{2})?))",
+    ])
+)
+TIPOS = ("clausula", "vr", "va", "estado", "uf", "pct", "brl")
+
+
+class Ocorrencia(NamedTuple):
+    tipo: str
+    inicio: int
+    fim: int
+    texto: str
+
+
+class _SemAcento(dict):
+    """Tabela para str.translate: cada caractere vira sua base ASCII (1 para 1, mesmo tamanho)."""
+
+    def __missing__(self, cp: int) -> str:
+        ch = chr(cp)
+        base = unicodedata.normalize("NFKD", ch).encode("ascii", "ignore").decode("ascii")
+        out = base[0] if base else ch
+        self[cp] = out
+        return out
+
+
+_SEM_ACENTO = _SemAcento()
+
+
+def sem_acento(texto: str) -> str:
+    return (texto or "").translate(_SEM_ACENTO)
+
+
+@lru_cache(maxsize=8)
+def varrer(texto: str) -> Dict[str, List[Ocorrencia]]:
+    """
+    Ocorrências por tipo (listas ordenadas por posição). Resultado em cache para o mesmo
+    texto: as heurísticas da ingestão compartilham uma única varredura. Não altere as listas.
+    """
+    out: Dict[str, List[Ocorrencia]] = {t: [] for t in TIPOS}
+    for m in _PADRAO.finditer(sem_acento(texto)):
+        tipo = m.lastgroup
+        out[tipo].append(Ocorrencia(tipo, m.start(), m.end(), texto[m.start(): m.end()]))
+    return out
+
+
+def contar_ufs(texto: str) -> Dict[str, int]:
+    """Ocorrências de cada UF no texto (siglas isoladas + nomes de estado)."""
+    occ = varrer(texto)
+    counts: Dict[str, int] = {}
+    for o in occ["estado"]:
+        sigla = ESTADOS[sem_acento(o.texto).lower()]
+        counts[sigla] = counts.get(sigla, 0) + 1
+    for o in occ["uf"]:
+        counts[o.texto] = counts.get(o.texto, 0) + 1
+    return counts
+
+
+def proximas(valores: Sequence[Ocorrencia], rotulos: Sequence[Ocorrencia], janela: int) -> List[Ocorrencia]:
+    """Valores com algum rótulo inteiro dentro de [inicio - janela, fim + janela] (merge linear)."""
+    out: List[Ocorrencia] = []
+    j = 0
+    for v in valores:
+        while j < len(rotulos) and rotulos[j].inicio < v.inicio - janela:
+            j += 1
+        k = j
+        while k < len(rotulos) and rotulos[k].inicio <= v.fim + janela:
+            if rotulos[k].fim <= v.fim + janela:
+                out.append(v)
+                break
+            k += 1
+    return out
+
+
+def primeiro_par(rotulos: Sequence[Ocorrencia], valores: Sequence[Ocorrencia], distancia: int) -> Optional[Ocorrencia]:
+    """
+    Valor do primeiro par "rótulo ... valor" ou "valor ... rótulo" com até `distancia`
+    caracteres entre os dois (o que começa primeiro no texto). Para "rótulo ... valor"
+    fica o valor mais distante dentro do limite, como na busca gulosa por regex.
+    """
+    i = j = 0
+    while i < len(rotulos) or j < len(valores):
+        if j >= len(valores) or (i < len(rotulos) and rotulos[i].inicio <= valores[j].inicio):
+            r = rotulos[i]
+            i += 1
+            escolhido = None
+            k = j
+            while k < len(valores) and valores[k].inicio <= r.fim + distancia:
+                if valores[k].inicio >= r.fim:
+                    escolhido = valores[k]
+                k += 1
+            if escolhido is not None:
+                return escolhido
+        else:
+            v = valores[j]
+            j += 1
+            # rótulos ainda não visitados começam depois do valor (as ocorrências não se sobrepõem)
+            if i < len(rotulos) and rotulos[i].inicio <= v.fim + distancia:
+                return v
+    return None
+
+
+def seguido_por(ancoras: Sequence[Ocorrencia], rotulos: Sequence[Ocorrencia], distancia: int) -> bool:
+    """Existe rótulo começando até `distancia` caracteres depois do fim de alguma âncora."""
+    j = 0
+    for a in ancoras:
+        while j < len(rotulos) and rotulos[j].inicio < a.fim:
+            j += 1
+        if j < len(rotulos) and rotulos[j].inicio <= a.fim + distancia:
+            return True
+    return False
+
+
+def restringir(rotulos: Sequence[Ocorrencia], padrao: "re.Pattern[str]") -> List[Ocorrencia]:
+    """Trecho de cada ocorrência que casa com `padrao` (posição ajustada); as demais saem."""
+    out: List[Ocorrencia] = []
+    for o in rotulos:
+        m = padrao.search(o.texto)
+        if m:
+            out.append(Ocorrencia(o.tipo, o.inicio + m.start(), o.inicio + m.end(), m.group(0)))
+    return out
+
+
+def valores_vr_va(texto: str, distancia: int = 80) -> Tuple[Optional[Ocorrencia], Optional[Ocorrencia]]:
+    """
+    Valores em R$ (formato estrito) de VR e VA: primeiro par rótulo/valor de cada benefício
+    com até `distancia` caracteres entre os dois, com os rótulos das regras da ingestão.
+    """
+    occ = varrer(texto)
+    moeda = [o for o in occ["brl"] if MOEDA_RE.fullmatch(o.texto)]
+    return (
+        primeiro_par(restringir(occ["vr"], _VR_REGRAS_RE), moeda, distancia),
+        primeiro_par(restringir(occ["va"], _VA_REGRAS_RE), moeda, distancia),
+    )
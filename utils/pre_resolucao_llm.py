@@ -0,0 +1,200 @@
+from __future__ import annotations
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from agentes.especialista_vrva import _peso_origem
+from ferramentas.extracao_cct_llm import PROMPT_VERSAO, extrair_regras_da_cct
+from utils.cache_extracao import extrair_com_cache, gravar_pre_resolvidas
+from utils.config import get_llm_id
+from utils.regras_resolver import limpar_cache_negativo, regra_de_extracao, texto_cct_para_extracao
+from utils.regras_snapshot import obter_snapshot
+from utils.registro_sindicatos import obter_registro
+
+# Pré-resolução em lote dos pares (UF, sindicato) sem regra determinística.
+# Antes do cálculo, coleta os pares que cairiam na extração LLM do `resolve_cct_rules`,
+# executa as extrações em paralelo (pool de threads limitado + token bucket + retentativas)
+# e grava o resultado em `regras_cct_pre_resolvidas` (utils/cache_extracao) com origem
+# `llm_extract`. O snapshot passa a conter esses pares abaixo de overrides e do rules_index,
+# o laço de cálculo não faz mais I/O de rede, e a reingestão das CCTs apaga as pré-resoluções
+# junto com o cache de extração. A tabela consolidada (regras_cct_vrva_resolvidas) não é tocada.
+
+MAX_CONCORRENCIA = int(os.getenv("VRVA_LLM_CONCORRENCIA", "4"))
+TAXA_POR_MIN = float(os.getenv("VRVA_LLM_REQ_POR_MIN", "30"))
+TENTATIVAS = int(os.getenv("VRVA_LLM_TENTATIVAS", "3"))
+BACKOFF_S = float(os.getenv("VRVA_LLM_BACKOFF_S", "2"))
+
+
+class TokenBucket:
+    """Limitador de taxa: `taxa` fichas por segundo, rajada máxima de `capacidade`."""
+
+    def __init__(self, taxa: float, capacidade: Optional[float] = None) -> None:
+        self.taxa = max(float(taxa), 1e-6)
+        self.capacidade = max(float(capacidade if capacidade is not None else 1.0), 1.0)
+        self._fichas = self.capacidade
+        self._ultimo = time.monotonic()
+        self._lock = threading.Lock()
+
+    def adquirir(self) -> None:
+        """Bloqueia até haver uma ficha disponível."""
+        while True:
+            with self._lock:
+                agora = time.monotonic()
+                self._fichas = min(self.capacidade, self._fichas + (agora - self._ultimo) * self.taxa)
+                self._ultimo = agora
+                if self._fichas >= 1.0:
+                    self._fichas -= 1.0
+                    return
+                espera = (1.0 - self._fichas) / self.taxa
+            time.sleep(espera)
+
+
+def _vazio(payload: Any) -> bool:
+    try:
+        return not regra_de_extracao(payload)
+    except Exception:
+        return True
+
+
+def _com_retentativas(extrator: Callable[[str], str], bucket: TokenBucket, tentativas: int) -> Callable[[str], str]:
+    """
+    Envolve o extrator com o limitador de taxa e retentativas com backoff exponencial.
+    A ferramenta de extração devolve JSON nulo em caso de erro do LLM, então resultado
+    vazio também é tratado como falha transitória (o último resultado é devolvido).
+    """
+
+    def executar(texto: str) -> str:
+        ultimo: Optional[str] = None
+        erro: Optional[Exception] = None
+        for n in range(max(tentativas, 1)):
+            if n:
+                time.sleep(BACKOFF_S * (2 ** (n - 1)))
+            bucket.adquirir()
+            try:
+                ultimo = extrator(texto)
+                erro = None
+            except Exception as e:
+                erro = e
+                continue
+            if not _vazio(ultimo):
+                return ultimo
+        if ultimo is None and erro is not None:
+            raise erro
+        return ultimo  # type: ignore[return-value]
+
+    return executar
+
+
+def _fmt_brl(v: Any) -> Any:
+    # a tabela resolvida guarda valores em BRL texto (mesmo formato das demais origens)
+    try:
+        return f"R$ {float(v):,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
+    except Exception:
+        return v
+
+
+def pares_sem_regra(
+    pares: Iterable[Tuple[Optional[str], Optional[str]]], competencia: Any = None
+) -> List[Tuple[str, str]]:
+    """
+    Pares que não resolvem pelo snapshot (nem pelos aliases do sindicato canônico) na
+    `competencia`: mesma consulta as-of que o `resolver_regras_lote` do cálculo fará.
+    """
+    snap = obter_snapshot()
+    reg = obter_registro()
+    pendentes: List[Tuple[str, str]] = []
+    vistos = set()
+    for uf, sind in pares:
+        chave = ((uf or "").upper(), (sind or "").strip() if isinstance(sind, str) else "")
+        if not chave[1] or chave in vistos:
+            continue
+        vistos.add(chave)
+        if snap.consultar(*chave, competencia) is not None:
+            continue
+        corr = reg.mapear(chave[1], chave[0])
+        if corr.confiavel and any(snap.consultar(chave[0], a, competencia) is not None for a in reg.aliases(corr.id)):
+            continue
+        pendentes.append(chave)
+    return pendentes
+
+
+def pre_resolver_llm(
+    pares: Iterable[Tuple[Optional[str], Optional[str]]],
+    competencia: Any = None,
+    max_concorrencia: Optional[int] = None,
+    req_por_min: Optional[float] = None,
+    tentativas: Optional[int] = None,
+    extrator: Optional[Callable[[str], str]] = None,
+) -> Dict[str, Any]:
+    """
+    Extrai em paralelo as regras dos pares sem regra determinística e grava as encontradas
+    em `regras_cct_pre_resolvidas` (origem `llm_extract`). Retorna um resumo da execução.
+    `competencia` (date ou ISO): a do cálculo; pares com regra só fora da vigência também
+    são pré-resolvidos.
+    """
+    t0 = time.time()
+    pendentes = pares_sem_regra(pares, competencia)
+    resumo: Dict[str, Any] = {"pendentes": len(pendentes), "sem_texto": 0, "resolvidos": 0, "falhas": 0}
+    if not pendentes:
+        resumo["segundos"] = round(time.time() - t0, 3)
+        return resumo
+
+    # textos do Chroma: leitura local, sequencial (a coleção é compartilhada no processo)
+    tarefas: List[Tuple[str, str, str]] = []
+    for uf, sind in pendentes:
+        try:
+            texto = texto_cct_para_extracao(uf, sind)
+        except Exception:
+            texto = None
+        if texto:
+            tarefas.append((uf, sind, texto))
+        else:
+            resumo["sem_texto"] += 1
+
+    taxa = (req_por_min if req_por_min is not None else TAXA_POR_MIN) / 60.0
+    workers = max(1, int(max_concorrencia or MAX_CONCORRENCIA))
+    bucket = TokenBucket(taxa, capacidade=workers)
+    fn = _com_retentativas(extrator or extrair_regras_da_cct.run, bucket, tentativas or TENTATIVAS)
+    modelo = get_llm_id()
+
+    def _extrair(tarefa: Tuple[str, str, str]) -> Optional[Dict[str, Any]]:
+        uf, sind, texto = tarefa
+        payload = extrair_com_cache(uf, sind, texto, fn, prompt_versao=PROMPT_VERSAO, modelo=modelo)
+        regra = regra_de_extracao(payload)
+        if not regra:
+            return None
+        return {
+            "uf": uf,
+            "sindicato": sind,
+            "vr_valor": _fmt_brl(regra.get("vr_valor")) if regra.get("vr_valor") is not None else None,
+            "va_valor": _fmt_brl(regra.get("va_valor")) if regra.get("va_valor") is not None else None,
+            "periodicidade": "dia",
+            "dias": regra.get("dias"),
+            "origem": "llm_extract",
+            "confidence": _peso_origem("llm_extract"),
+        }
+
+    linhas: List[Dict[str, Any]] = []
+    if tarefas:
+        with ThreadPoolExecutor(max_workers=min(workers, len(tarefas)), thread_name_prefix="llm-cct") as ex:
+            futuros = [ex.submit(_extrair, t) for t in tarefas]
+            for fut in futuros:
+                try:
+                    linha = fut.result()
+                except Exception:
+                    resumo["falhas"] += 1
+                    continue
+                if linha:
+                    linhas.append(linha)
+                else:
+                    resumo["falhas"] += 1
+
+    if linhas:
+        gravar_pre_resolvidas(linhas)
+        limpar_cache_negativo()
+    resumo["resolvidos"] = len(linhas)
+    resumo["segundos"] = round(time.time() - t0, 3)
+    return resumo
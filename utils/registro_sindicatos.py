@@ -0,0 +1,393 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from ferramentas.persistencia_db import DB_PATH
+from utils.uf_mapping import infer_uf_from_sindicato
+
+# Registro canônico de sindicatos.
+# O mesmo sindicato aparece com grafias diferentes em ATIVOS, nas CCTs (texto/OCR) e nos
+# overrides ("SINDPD SP - SIND.TRAB.EM PROC DADOS..." x "SINDICATO DOS EMPREGADOS EM
+# EMPRESAS DE PROCESSAMENTO DE DADOS..."). Cada sindicato recebe um ID canônico com seus
+# aliases; nomes brutos são mapeados por alias exato (normalizado) ou por similaridade
+# (tokens sem acento com abreviações expandidas + trigramas), com uma confiança.
+# Só alias exato (mapa_sindicatos.json, nomes já registrados ou aprovados na revisão) é
+# confiável: toda correspondência por similaridade vai para a fila de revisão (SQLite), com o
+# candidato sugerido, e só vira alias quando aprovada (`aprovar_revisao`).
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+REGISTRO_PATH = BASE_DIR / "base_conhecimento" / "sindicatos_registro.json"
+MAPA_ALIASES = BASE_DIR / "dados_entrada" / "mapa_sindicatos.json"
+TABELA_REVISAO = "sindicatos_revisao"
+
+LIMIAR_AUTO = float(os.getenv("VRVA_SIND_LIMIAR_AUTO", "0.6"))  # candidato "provável" na revisão
+LIMIAR_REVISAO = float(os.getenv("VRVA_SIND_LIMIAR_REVISAO", "0.3"))
+
+_ABREV = {
+    "SIND": "SINDICATO", "SINDIC": "SINDICATO",
+    "TRAB": "TRABALHADORES", "TRABS": "TRABALHADORES",
+    "EMP": "EMPRESAS", "EMPR": "EMPRESAS", "EMPRS": "EMPRESAS",
+    "EMPREG": "EMPREGADOS",
+    "PROC": "PROCESSAMENTO", "PROCESS": "PROCESSAMENTO",
+    "EST": "ESTADO", "INFORM": "INFORMATICA", "INF": "INFORMATICA",
+    "TEC": "TECNOLOGIA", "SERV": "SERVICOS", "COMP": "COMPUTACAO",
+    "PROF": "PROFISSIONAIS", "CTBA": "CURITIBA", "REG": "REGIAO", "METROP": "METROPOLITANA",
+}
+_STOP = {
+    "DE", "DA", "DO", "DAS", "DOS", "E", "EM", "NO", "NA", "NOS", "NAS", "A", "O", "AS", "OS",
+    "CNPJ", "N", "NESTE", "ATO", "COM", "SEDE",
+}
+
+
+def normalizar_nome(nome: Optional[str]) -> str:
+    """Maiúsculas, sem acentos, pontuação vira espaço, espaços colapsados."""
+    s = unicodedata.normalize("NFKD", str(nome or "")).encode("ascii", "ignore").decode("ascii").upper()
+    s = re.sub(r"[^A-Z0-9]+", " ", s)
+    return re.sub(r"\s+", " ", s).strip()
+
+
+def tokens_nome(nome: Optional[str]) -> frozenset:
+    toks = []
+    for t in normalizar_nome(nome).split():
+        if t.isdigit() or t in _STOP:
+            continue
+        toks.append(_ABREV.get(t, t))
+    return frozenset(toks)
+
+
+def trigramas_nome(nome: Optional[str]) -> frozenset:
+    s = " " + " ".join(sorted(tokens_nome(nome))) + " "
+    return frozenset(s[i:i + 3] for i in range(len(s) - 2)) if len(s) > 3 else frozenset()
+
+
+def _id_canonico(nome: str, uf: Optional[str]) -> str:
+    return f"{(uf or 'NA').upper()}-{hashlib.sha1(normalizar_nome(nome).encode('utf-8')).hexdigest()[:8]}"
+
+
+@dataclass(frozen=True)
+class Correspondencia:
+    id: Optional[str]
+    nome_canonico: Optional[str]
+    confianca: float
+    metodo: str  # exato | similaridade | sem_match
+
+    @property
+    def confiavel(self) -> bool:
+        """Pode ser usada sem revisão: apenas alias exato."""
+        return self.id is not None and self.metodo == "exato"
+
+    @property
+    def provavel(self) -> bool:
+        """Similaridade alta: candidato sugerido na fila de revisão (nunca aplicado sozinho)."""
+        return self.id is not None and self.metodo == "similaridade" and self.confianca >= LIMIAR_AUTO
+
+
+class RegistroSindicatos:
+    """IDs canônicos, aliases e índices (alias exato, tokens, trigramas) de sindicatos."""
+
+    def __init__(self) -> None:
+        self.canonicos: Dict[str, Dict[str, object]] = {}
+        self._exato: Dict[str, str] = {}
+        self._tok_idx: Dict[str, Set[str]] = {}
+        self._tri_idx: Dict[str, Set[str]] = {}
+        self._tokens: Dict[str, List[frozenset]] = {}
+        self._trigramas: Dict[str, List[frozenset]] = {}
+        self._memo: Dict[Tuple[str, str], Correspondencia] = {}
+
+    # ----------------------------- construção -----------------------------
+    def adicionar(self, nome: str, uf: Optional[str] = None, aliases: Iterable[str] = (),
+                  id_canonico: Optional[str] = None) -> str:
+        """Cria (ou reaproveita, se o nome já for alias conhecido) um sindicato canônico."""
+        existente = self._exato.get(normalizar_nome(nome))
+        if existente and id_canonico is None:
+            for a in aliases:
+                self.adicionar_alias(existente, a)
+            return existente
+        uf = uf or infer_uf_from_sindicato(nome)[0]
+        cid = id_canonico or _id_canonico(nome, uf)
+        if cid not in self.canonicos:
+            self.canonicos[cid] = {"nome": nome, "uf": uf, "aliases": []}
+        for a in [nome, *aliases]:
+            self.adicionar_alias(cid, a)
+        return cid
+
+    def adicionar_alias(self, cid: str, alias: str) -> None:
+        norm = normalizar_nome(alias)
+        if not norm or cid not in self.canonicos:
+            return
+        als = self.canonicos[cid]["aliases"]
+        if alias not in als:
+            als.append(alias)  # type: ignore[union-attr]
+        self._exato.setdefault(norm, cid)
+        toks, tris = tokens_nome(alias), trigramas_nome(alias)
+        self._tokens.setdefault(cid, []).append(toks)
+        self._trigramas.setdefault(cid, []).append(tris)
+        for t in toks:
+            self._tok_idx.setdefault(t, set()).add(cid)
+        for t in tris:
+            self._tri_idx.setdefault(t, set()).add(cid)
+        self._memo.clear()
+
+    def vincular_alias(self, cid: str, alias: str) -> None:
+        """Liga o nome ao canônico `cid`, tirando-o do canônico em que estava (aprovação de revisão)."""
+        norm = normalizar_nome(alias)
+        atual = self._exato.get(norm)
+        if atual is not None and atual != cid and cid in self.canonicos:
+            restantes = [a for a in self.aliases(atual) if normalizar_nome(a) != norm]
+            if restantes:
+                self.canonicos[atual]["aliases"] = restantes
+            else:
+                del self.canonicos[atual]
+            self._reindexar()
+        self.adicionar_alias(cid, alias)
+
+    def _reindexar(self) -> None:
+        novo = RegistroSindicatos.de_dict(self.para_dict())
+        self.__dict__.update(novo.__dict__)
+
+    def aliases(self, cid: Optional[str]) -> List[str]:
+        if not cid or cid not in self.canonicos:
+            return []
+        return list(self.canonicos[cid]["aliases"])  # type: ignore[arg-type]
+
+    # ----------------------------- consulta -----------------------------
+    def mapear(self, nome: Optional[str], uf: Optional[str] = None) -> Correspondencia:
+        """Nome bruto -> ID canônico com confiança (memoizado)."""
+        chave = (str(nome or ""), (uf or "").upper())
+        hit = self._memo.get(chave)
+        if hit is not None:
+            return hit
+        res = self._mapear(chave[0], chave[1] or None)
+        self._memo[chave] = res
+        return res
+
+    def _mapear(self, nome: str, uf: Optional[str]) -> Correspondencia:
+        norm = normalizar_nome(nome)
+        if not norm:
+            return Correspondencia(None, None, 0.0, "sem_match")
+        cid = self._exato.get(norm)
+        if cid is not None:
+            return Correspondencia(cid, self.canonicos[cid]["nome"], 1.0, "exato")  # type: ignore[arg-type]
+        toks, tris = tokens_nome(nome), trigramas_nome(nome)
+        candidatos: Set[str] = set()
+        for t in toks:
+            candidatos |= self._tok_idx.get(t, set())
+        if not candidatos:
+            for t in tris:
+                candidatos |= self._tri_idx.get(t, set())
+        uf_nome = uf or infer_uf_from_sindicato(nome)[0]
+        melhor, melhor_score = None, 0.0
+        for c in candidatos:
+            score = 0.0
+            for at, ar in zip(self._tokens.get(c, []), self._trigramas.get(c, [])):
+                jac = len(toks & at) / len(toks | at) if (toks or at) else 0.0
+                dice = 2 * len(tris & ar) / (len(tris) + len(ar)) if (tris or ar) else 0.0
+                score = max(score, 0.5 * jac + 0.5 * dice)
+            uf_c = self.canonicos[c].get("uf")
+            if uf_nome and uf_c:
+                score = min(1.0, score + 0.15) if uf_c == uf_nome else score * 0.5
+            if score > melhor_score:
+                melhor, melhor_score = c, score
+        if melhor is None or melhor_score < LIMIAR_REVISAO:
+            return Correspondencia(None, None, round(melhor_score, 4), "sem_match")
+        return Correspondencia(melhor, self.canonicos[melhor]["nome"], round(melhor_score, 4), "similaridade")  # type: ignore[arg-type]
+
+    def mapear_ou_enfileirar(self, nome: Optional[str], uf: Optional[str] = None, contexto: str = "") -> Correspondencia:
+        """
+        Como `mapear`, registrando na fila de revisão as correspondências por similaridade
+        (há um candidato a aprovar; `sem_match` não entra), uma gravação por nome/UF por processo.
+        """
+        res = self.mapear(nome, uf)
+        if not res.confiavel and res.id and normalizar_nome(nome):
+            chave = (normalizar_nome(nome), (uf or "").upper())
+            with _lock:
+                novo = chave not in _enfileirados
+                _enfileirados.add(chave)
+            if novo:
+                enfileirar_revisao(str(nome), uf, res, contexto)
+        return res
+
+    # ----------------------------- persistência -----------------------------
+    def para_dict(self) -> Dict[str, object]:
+        return {"versao": 1, "canonicos": self.canonicos}
+
+    @classmethod
+    def de_dict(cls, data: Dict[str, object]) -> "RegistroSindicatos":
+        reg = cls()
+        for cid, item in (data.get("canonicos") or {}).items():  # type: ignore[union-attr]
+            reg.canonicos[cid] = {"nome": item.get("nome"), "uf": item.get("uf"), "aliases": []}
+            for a in item.get("aliases") or []:
+                reg.adicionar_alias(cid, a)
+        return reg
+
+    def salvar(self, path: Path = REGISTRO_PATH) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(self.para_dict(), ensure_ascii=False, indent=2), encoding="utf-8")
+        os.replace(tmp, path)
+
+
+# ----------------------------- fila de revisão -----------------------------
+def _conn_revisao() -> sqlite3.Connection:
+    DB_PATH.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(DB_PATH), timeout=30)
+    conn.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS {TABELA_REVISAO} (
+            nome_bruto TEXT NOT NULL,
+            uf TEXT NOT NULL,
+            candidato_id TEXT,
+            candidato_nome TEXT,
+            confianca REAL,
+            contexto TEXT,
+            criado_em REAL,
+            PRIMARY KEY (nome_bruto, uf)
+        )
+        """
+    )
+    return conn
+
+
+def enfileirar_revisao(nome: str, uf: Optional[str], corr: Correspondencia, contexto: str = "") -> None:
+    try:
+        with _conn_revisao() as conn:
+            conn.execute(
+                f"""
+                INSERT OR REPLACE INTO {TABELA_REVISAO}
+                    (nome_bruto, uf, candidato_id, candidato_nome, confianca, contexto, criado_em)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                """,
+                (nome, (uf or "").upper(), corr.id, corr.nome_canonico, corr.confianca, contexto, time.time()),
+            )
+    except Exception:
+        pass
+
+
+def listar_revisao() -> List[Dict[str, object]]:
+    try:
+        with _conn_revisao() as conn:
+            cur = conn.execute(f"SELECT * FROM {TABELA_REVISAO} ORDER BY confianca DESC")
+            cols = [d[0] for d in cur.description]
+            return [dict(zip(cols, r)) for r in cur.fetchall()]
+    except Exception:
+        return []
+
+
+def aprovar_revisao(nome_bruto: str, uf: Optional[str], cid: Optional[str] = None) -> Optional[str]:
+    """
+    Resolve um item da fila: vincula o nome ao ID informado (ou ao candidato sugerido);
+    sem ID/candidato, cria um novo canônico. Persiste o registro e remove o item da fila.
+    """
+    reg = obter_registro()
+    if cid is None:
+        for item in listar_revisao():
+            if item["nome_bruto"] == nome_bruto and item["uf"] == (uf or "").upper():
+                cid = item.get("candidato_id")  # type: ignore[assignment]
+                break
+    with _lock:
+        if cid and cid in reg.canonicos:
+            reg.vincular_alias(cid, nome_bruto)
+        else:
+            cid = reg.adicionar(nome_bruto, uf)
+        reg.salvar()
+    try:
+        with _conn_revisao() as conn:
+            conn.execute(f"DELETE FROM {TABELA_REVISAO} WHERE nome_bruto = ? AND uf = ?", (nome_bruto, (uf or "").upper()))
+    except Exception:
+        pass
+    try:
+        # o nome aprovado pode resolver pares que estavam no cache negativo do resolvedor
+        from utils.regras_resolver import limpar_cache_negativo
+        limpar_cache_negativo()
+    except Exception:
+        pass
+    return cid
+
+
+# ----------------------------- registro do processo -----------------------------
+def construir_registro(extras: Iterable[Tuple[Optional[str], str]] = ()) -> RegistroSindicatos:
+    """
+    Monta o registro a partir de `mapa_sindicatos.json` (canônico -> aliases) e dos nomes
+    conhecidos nas fontes de regras (overrides, rules_index, tabelas resolvidas).
+    Nomes sem alias exato viram novos canônicos; os parecidos com um canônico existente
+    também vão para a fila de revisão (a aprovação move o nome para o canônico sugerido).
+    """
+    reg = RegistroSindicatos()
+    try:
+        mapa = json.loads(MAPA_ALIASES.read_text(encoding="utf-8")) if MAPA_ALIASES.exists() else {}
+    except Exception:
+        mapa = {}
+    for canonico, aliases in (mapa or {}).items():
+        als = [a for a in (aliases or []) if isinstance(a, str)]
+        uf = next((u for u in (infer_uf_from_sindicato(a)[0] for a in [canonico, *als]) if u), None)
+        reg.adicionar(als[0] if als else canonico, uf, aliases=als, id_canonico=_id_canonico(canonico, uf))
+    nomes: List[Tuple[Optional[str], str]] = list(extras)
+    try:
+        from utils.regras_snapshot import obter_snapshot
+        nomes += [(uf, s) for (uf, s) in obter_snapshot().regras.keys()]
+    except Exception:
+        pass
+    for uf, nome in nomes:
+        if not normalizar_nome(nome):
+            continue
+        corr = reg.mapear_ou_enfileirar(nome, uf, contexto="registro")
+        if not corr.confiavel:
+            reg.adicionar(nome, uf)
+    return reg
+
+
+_lock = threading.RLock()
+_enfileirados: Set[Tuple[str, str]] = set()
+_registro: Optional[RegistroSindicatos] = None
+_registro_mtime: Optional[int] = None
+
+
+def obter_registro() -> RegistroSindicatos:
+    """Registro do processo: carregado do JSON persistido (ou construído e salvo na 1ª vez)."""
+    global _registro, _registro_mtime
+    try:
+        mtime = REGISTRO_PATH.stat().st_mtime_ns
+    except OSError:
+        mtime = None
+    reg = _registro
+    if reg is not None and mtime == _registro_mtime:
+        return reg
+    with _lock:
+        if _registro is not None and mtime == _registro_mtime:
+            return _registro
+        reg = None
+        if mtime is not None:
+            try:
+                reg = RegistroSindicatos.de_dict(json.loads(REGISTRO_PATH.read_text(encoding="utf-8")))
+            except Exception:
+                reg = None
+        if reg is None:
+            reg = construir_registro()
+            try:
+                reg.salvar()
+                mtime = REGISTRO_PATH.stat().st_mtime_ns
+            except Exception:
+                pass
+        _registro, _registro_mtime = reg, mtime
+        return reg
+
+
+def salvar_registro(reg: RegistroSindicatos) -> None:
+    global _registro, _registro_mtime
+    with _lock:
+        reg.salvar()
+        _registro = reg
+        try:
+            _registro_mtime = REGISTRO_PATH.stat().st_mtime_ns
+        except OSError:
+            _registro_mtime = None
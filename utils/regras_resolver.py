@@ -1,125 +1,174 @@
 from __future__ import annotations
 from pathlib import Path
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Iterable, Tuple
 import json
-import chromadb
-from chromadb.config import Settings
-import sqlite3
-import pandas as pd
-from ferramentas.persistencia_db import DB_PATH
-from ferramentas.extracao_cct_llm import extrair_regras_da_cct
+import os
+import threading
+import time
+from ferramentas.extracao_cct_llm import PROMPT_VERSAO, extrair_regras_da_cct
+from utils.cache_extracao import extrair_com_cache, geracao_extracao
+from utils.clausulas import texto_beneficio_sindicato
+from utils.config import get_llm_id
+from utils.regras_snapshot import obter_snapshot
+from utils.registro_sindicatos import REGISTRO_PATH, obter_registro
+from utils.vector_store import obter_colecao
+from utils.valores_lookup import buscar_valores_sindicato, versao_lookup
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 CHROMA_DIR = BASE_DIR / "base_conhecimento" / "chromadb"
 RULES_INDEX = BASE_DIR / "base_conhecimento" / "rules_index.json"
 RULES_OVERRIDES = CHROMA_DIR / "rules_overrides.json"
 
+# Cache de resultados negativos: pares (UF, sindicato) que percorreram toda a cadeia de
+# fallback sem encontrar regra. Vale por TTL e apenas para a versão do snapshot de regras
+# em que foi registrado (mudança em overrides/índice/tabela resolvida invalida).
+TTL_NEGATIVO_S = float(os.getenv("VRVA_RESOLVER_TTL_NEGATIVO_S", "600"))
+_negativos: Dict[Tuple[str, str], Tuple[str, float]] = {}
+_stats = {"negativo_hits": 0, "negativo_misses": 0}
+_neg_lock = threading.Lock()
 
-def _read_json(path: Path) -> Optional[object]:
+
+def estatisticas_resolver() -> Dict[str, int]:
+    """Contadores do cache negativo (hits = cadeias de fallback evitadas)."""
+    with _neg_lock:
+        return {**_stats, "negativo_entradas": len(_negativos)}
+
+
+def limpar_cache_negativo() -> None:
+    """Esquece os negativos (ex.: após importar tabelas ou reingerir CCTs)."""
+    with _neg_lock:
+        _negativos.clear()
+
+
+def versao_fontes_fallback() -> Dict[str, Any]:
+    """
+    Versões das fontes que o `resolve_cct_rules` consulta além da regra direta do snapshot:
+    snapshot (regras dos aliases), registro de sindicatos, geração do cache de extração LLM
+    (muda na reingestão de CCTs alteradas), modelo do LLM e tabela de lookup do SQLite.
+    """
     try:
-        if path.exists():
-            return json.loads(path.read_text(encoding="utf-8"))
+        snap_versao = obter_snapshot().versao
     except Exception:
-        pass
-    return None
+        snap_versao = None
+    try:
+        st = REGISTRO_PATH.stat()
+        registro = [st.st_mtime_ns, st.st_size]
+    except OSError:
+        registro = None
+    return {
+        "snapshot": snap_versao,
+        "registro": registro,
+        "extracao_llm": geracao_extracao(),
+        "prompt": PROMPT_VERSAO,
+        "modelo": get_llm_id(),
+        "lookup": versao_lookup(),
+    }
+
+
+def texto_cct_para_extracao(uf_key: str, sind_key: str) -> Optional[str]:
+    """
+    Entrada da extração LLM para o (UF, sindicato): as cláusulas de benefício das CCTs
+    ingeridas; sem índice de cláusulas, os trechos mais próximos no Chroma.
+    """
+    texto = texto_beneficio_sindicato(uf_key, sind_key)
+    if texto:
+        return texto
+    collection = obter_colecao("ccts")
+    where = {"uf": uf_key, "sindicato": sind_key}
+    res = collection.query(query_texts=["regras de VR VA dias"], n_results=6, where=where)
+    docs = res.get("documents", [[]])[0]
+    if not docs:
+        return None
+    # limita tamanho para evitar prompt muito grande
+    return "\n\n".join(docs)[:20000]
+
+
+def regra_de_extracao(payload: Any) -> Dict[str, Any]:
+    """Converte o JSON da ferramenta de extração ({valor_vr, valor_va, dias_uteis}) em regra."""
+    data = json.loads(payload) if isinstance(payload, str) else payload
+    out: Dict[str, Any] = {}
+    if isinstance(data, dict):
+        vr = data.get("valor_vr")
+        va = data.get("valor_va")
+        dias = data.get("dias_uteis")
+        if vr is not None:
+            out["vr_valor"] = vr
+        if va is not None:
+            out["va_valor"] = va
+        if dias is not None:
+            try:
+                out["dias"] = int(dias)
+            except Exception:
+                pass
+    return out
 
 
-def resolve_cct_rules(uf: str, sindicato: str) -> Dict[str, Any]:
+def resolve_cct_rules(uf: str, sindicato: str, competencia: Any = None) -> Dict[str, Any]:
     """
     Resolve valores de VR/VA para uma combinação (UF, Sindicato).
-    Prioridade: overrides -> rules_index (OCR) -> retrieval (Chroma, se houver metadados com valores).
+    Prioridade: tabela resolvida -> overrides -> rules_index (OCR) [snapshot compilado,
+    também pelos aliases do sindicato canônico]
+    -> extração LLM -> tabelas SQLite -> retrieval (Chroma, se houver metadados com valores).
 
     Retorna um dicionário possivelmente com chaves:
       - vr_valor, va_valor (string BRL, p.ex. "R$ 25,00")
       - dias (int), dias_tipo ("uteis")
       - periodicidade ("dia"|"mes")
       - origem: "override"|"ocr_index"|"retrieval"
+
+    `competencia` (date ou ISO): aplica a vigência das regras datadas das fontes determinísticas.
     """
     uf_key = (uf or "").upper()
     sind_key = (sindicato or "").strip()
 
-    # 0) Resultado consolidado pelo especialista (tabela resolvida)
+    # 0-2) Fontes determinísticas (tabela resolvida > overrides > rules_index) via snapshot
+    #      compilado: carregado uma vez por processo e trocado quando alguma fonte muda.
+    versao = None
     try:
-        with sqlite3.connect(str(DB_PATH)) as conn:
-            cur = conn.cursor()
-            cur.execute(
-                """
-                SELECT vr_valor, va_valor, dias, periodicidade, condicao, origem, confidence
-                FROM regras_cct_vrva_resolvidas
-                WHERE uf = ? AND sindicato = ?
-                """,
-                (uf_key, sind_key),
-            )
-            row = cur.fetchone()
-            if row:
-                out = {}
-                if row[0] is not None: out["vr_valor"] = row[0]
-                if row[1] is not None: out["va_valor"] = row[1]
-                if row[2] is not None:
-                    try:
-                        out["dias"] = int(row[2])
-                    except Exception:
-                        pass
-                if row[3] is not None: out["periodicidade"] = row[3]
-                if row[4] is not None: out["condicao"] = row[4]
-                out["origem"] = (row[5] or "") + ";resolver"
-                out["confidence"] = row[6]
-                return out
+        snap = obter_snapshot()
+        versao = snap.versao
+        hit = snap.consultar(uf_key, sind_key, competencia)
+        if hit is not None:
+            return hit
     except Exception:
-        pass
+        snap = None
+
+    # negativo recente para a mesma versão de regras: pula a cadeia de fallback
+    chave_neg = (uf_key, sind_key)
+    with _neg_lock:
+        neg = _negativos.get(chave_neg)
+        if neg and neg[0] == versao and neg[1] > time.monotonic():
+            _stats["negativo_hits"] += 1
+            return {"origem": "nao_encontrado"}
+        _stats["negativo_misses"] += 1
 
-    # 1) Overrides
-    overrides = _read_json(RULES_OVERRIDES) or {}
-    k = f"{uf_key}::{sind_key}"
-    if k in overrides:
-        out = dict(overrides[k])
-        out["origem"] = "override"
-        return out
-
-    # 2) OCR index
-    idx = _read_json(RULES_INDEX) or []
-    # Escolhe o primeiro matching por UF/Sindicato
-    for item in idx:
-        if (item.get("uf", "").upper() == uf_key) and (item.get("sindicato", "").strip() == sind_key):
-            out = {
-                key: item.get(key)
-                for key in ("vr_valor", "va_valor", "dias", "dias_tipo", "periodicidade")
-                if item.get(key) is not None
-            }
-            if out:
-                out["origem"] = "ocr_index"
-                return out
+    # 1.5) grafia diferente do mesmo sindicato: só alias exato/aprovado do ID canônico
+    #      (ATIVOS x nome extraído da CCT); similaridade vai para a fila de revisão
+    if snap is not None:
+        try:
+            reg = obter_registro()
+            corr = reg.mapear_ou_enfileirar(sind_key, uf_key, contexto="resolver")
+            if corr.confiavel:
+                for alias in reg.aliases(corr.id):
+                    hit = snap.consultar(uf_key, alias, competencia)
+                    if hit is not None:
+                        hit["sindicato_id"] = corr.id
+                        return hit
+        except Exception:
+            pass
 
     # 2.5) LLM extraction a partir do texto das CCTs (Chroma) quando não há match direto no índice
     #      Junta os documentos do UF/Sindicato e extrai {valor_vr, valor_va, dias_uteis}
     try:
-        client = chromadb.PersistentClient(path=str(CHROMA_DIR), settings=Settings(allow_reset=False))
-        collection = client.get_or_create_collection("ccts")
-        where = {"uf": uf_key, "sindicato": sind_key}
-        res = collection.query(query_texts=["regras de VR VA dias"], n_results=6, where=where)
-        docs = res.get("documents", [[]])[0]
-        if docs:
-            # limita tamanho para evitar prompt muito grande
-            joined = "\n\n".join(docs)
-            texto_cct = joined[:20000]
+        texto_cct = texto_cct_para_extracao(uf_key, sind_key)
+        if texto_cct:
             try:
-                payload = extrair_regras_da_cct(texto_cct)
-                # ferramenta retorna JSON string
-                data = json.loads(payload) if isinstance(payload, str) else payload
-                out = {}
-                if isinstance(data, dict):
-                    vr = data.get("valor_vr")
-                    va = data.get("valor_va")
-                    dias = data.get("dias_uteis")
-                    if vr is not None:
-                        out["vr_valor"] = vr
-                    if va is not None:
-                        out["va_valor"] = va
-                    if dias is not None:
-                        try:
-                            out["dias"] = int(dias)
-                        except Exception:
-                            pass
+                # cache persistente por (UF, sindicato, hash do texto, versão do prompt, modelo)
+                payload = extrair_com_cache(
+                    uf_key, sind_key, texto_cct, extrair_regras_da_cct.run,
+                    prompt_versao=PROMPT_VERSAO, modelo=get_llm_id(),
+                )
+                out = regra_de_extracao(payload)
                 if out:
                     out["origem"] = "llm_extract"
                     return out
@@ -128,61 +177,18 @@ def resolve_cct_rules(uf: str, sindicato: str) -> Dict[str, Any]:
     except Exception:
         pass
 
-    # 3) Lookup em SQLite (tabelas importadas via Streamlit)
-    #    Procuramos tabelas com nomes que contenham 'sindicato' e 'valor' (ex.: base_sindicato_x_valor[_sheet])
+    # 3) Lookup em SQLite (tabelas importadas via Streamlit), materializadas em
+    #    valores_sindicato_lookup: consulta indexada por (uf, sindicato)
     try:
-        with sqlite3.connect(str(DB_PATH)) as conn:
-            # lista tabelas
-            tbls = pd.read_sql_query("SELECT name FROM sqlite_master WHERE type='table' ORDER BY name", conn)
-            candidatos = [t for t in tbls['name'].tolist() if 'sindicato' in t and 'valor' in t]
-            for tname in candidatos:
-                try:
-                    # filtra por UF/sindicato (best-effort em nomes de colunas)
-                    df = pd.read_sql_query(f"SELECT * FROM {tname}", conn)
-                    cols_low = {c.lower(): c for c in df.columns}
-                    # identificar colunas chaves
-                    col_uf = cols_low.get('uf') or cols_low.get('estado')
-                    col_sind = cols_low.get('sindicato') or cols_low.get('sindicato_do_colaborador') or cols_low.get('sindicato_colab')
-                    if not (col_uf and col_sind):
-                        continue
-                    df['_uf_key'] = df[col_uf].astype(str).str.upper().str.strip()
-                    df['_sind_key'] = df[col_sind].astype(str).str.strip()
-                    hit = df[(df['_uf_key'] == uf_key) & (df['_sind_key'] == sind_key)]
-                    if hit.empty:
-                        continue
-                    row = hit.iloc[0]
-                    # mapear possíveis nomes de colunas de valores/dias/periodicidade
-                    def pick(colnames: list[str]):
-                        for name in colnames:
-                            c = cols_low.get(name)
-                            if c and pd.notna(row.get(c)):
-                                return row.get(c)
-                        return None
-                    vr = pick(['vr_valor','vr','valor_vr','valor_vr_dia','vr_dia'])
-                    va = pick(['va_valor','va','valor_va','valor_va_dia','va_dia'])
-                    dias = pick(['dias','dias_vr','dias_va'])
-                    per = pick(['periodicidade','periodicidade_vr','periodicidade_va'])
-                    out = {}
-                    if vr is not None: out['vr_valor'] = vr
-                    if va is not None: out['va_valor'] = va
-                    if dias is not None:
-                        try:
-                            out['dias'] = int(dias)
-                        except Exception:
-                            pass
-                    if per is not None: out['periodicidade'] = per
-                    if out:
-                        out['origem'] = f"sqlite::{tname}"
-                        return out
-                except Exception:
-                    continue
+        out = buscar_valores_sindicato(uf_key, sind_key)
+        if out:
+            return out
     except Exception:
         pass
 
     # 4) Retrieval no Chroma (busca documentos desse UF/sindicato e tenta ler metadados com valores)
     try:
-        client = chromadb.PersistentClient(path=str(CHROMA_DIR), settings=Settings(allow_reset=False))
-        collection = client.get_or_create_collection("ccts")
+        collection = obter_colecao("ccts")
         where = {"uf": uf_key, "sindicato": sind_key}
         res = collection.query(query_texts=["valores VR VA"], n_results=5, where=where)
         metas = res.get("metadatas", [[]])[0]
@@ -198,4 +204,29 @@ def resolve_cct_rules(uf: str, sindicato: str) -> Dict[str, Any]:
         pass
 
     # Sem dados
+    if versao is not None and TTL_NEGATIVO_S > 0:
+        with _neg_lock:
+            _negativos[chave_neg] = (versao, time.monotonic() + TTL_NEGATIVO_S)
     return {"origem": "nao_encontrado"}
+
+
+def resolver_regras_lote(
+    pares: Iterable[Tuple[Optional[str], Optional[str]]], competencia: Any = None
+) -> Dict[Tuple[str, str], Dict[str, Any]]:
+    """
+    Resolve de uma vez as regras de vários pares (UF, sindicato) para a competência.
+    O snapshot é obtido uma única vez (consultas as-of em memória); só os pares sem
+    regra determinística percorrem a cadeia de fallback do `resolve_cct_rules`.
+    """
+    out: Dict[Tuple[str, str], Dict[str, Any]] = {}
+    try:
+        snap = obter_snapshot()
+    except Exception:
+        snap = None
+    for uf, sind in pares:
+        chave = ((uf or "").upper(), (sind or "").strip() if isinstance(sind, str) else "")
+        if chave in out:
+            continue
+        hit = snap.consultar(chave[0], chave[1], competencia) if snap is not None else None
+        out[chave] = hit if hit is not None else resolve_cct_rules(chave[0], chave[1], competencia)
+    return out
@@ -0,0 +1,329 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from bisect import bisect_right
+from dataclasses import dataclass, field
+from datetime import date
+from pathlib import Path
+from types import MappingProxyType
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+from ferramentas.persistencia_db import DB_PATH
+from utils.cache_extracao import TABELA_PRE
+
+# Snapshot compilado das fontes determinísticas de regras de CCT:
+#   0) regras_cct_vrva_resolvidas (SQLite)  >  1) overrides (tabela regras_cct_overrides)  >  2) rules_index.json
+#   >  3) regras_cct_pre_resolvidas (pré-resolução LLM em lote; apagadas na reingestão das CCTs)
+# Linhas `llm_extract` antigas na tabela resolvida também ficam no nível 3 (nunca vencem as demais).
+# A precedência e a origem já vêm aplicadas; cada entrada é o dicionário que o
+# `resolve_cct_rules` devolveria para (UF, sindicato). O snapshot é imutável e carregado
+# uma vez por processo; quando o mtime de qualquer fonte muda, um novo snapshot é
+# compilado e trocado atomicamente (troca de referência).
+# Regras com vigência (vigencia_inicio/vigencia_fim) ganham, por chave, uma linha do tempo
+# ordenada; `consultar(..., competencia=...)` resolve a regra vigente por bisect.
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+CHROMA_DIR = BASE_DIR / "base_conhecimento" / "chromadb"
+RULES_INDEX = BASE_DIR / "base_conhecimento" / "rules_index.json"
+RULES_OVERRIDES = CHROMA_DIR / "rules_overrides.json"
+
+Chave = Tuple[str, str]
+Entrada = Tuple[Chave, Dict[str, Any]]
+# (inícios dos segmentos em ordinal de data, regra vencedora de cada segmento)
+LinhaDoTempo = Tuple[Tuple[int, ...], Tuple[Optional[Mapping[str, Any]], ...]]
+
+
+@dataclass(frozen=True)
+class SnapshotRegras:
+    versao: str
+    regras: Mapping[Chave, Mapping[str, Any]]
+    proveniencia: Mapping[Chave, str]
+    assinatura_fontes: Tuple
+    vigencias: Mapping[Chave, LinhaDoTempo] = field(default_factory=lambda: MappingProxyType({}))
+    compilado_em: float = field(default_factory=time.time)
+
+    def consultar(self, uf: str, sindicato: str, competencia: Any = None) -> Optional[Dict[str, Any]]:
+        """
+        Regra já resolvida para (UF, sindicato) ou None; devolve cópia mutável.
+        Com `competencia` (date ou ISO), aplica a vigência: bisect na linha do tempo da chave.
+        """
+        chave = ((uf or "").upper(), (sindicato or "").strip())
+        linha = self.vigencias.get(chave) if competencia is not None else None
+        if linha is not None:
+            inicios, vencedoras = linha
+            i = bisect_right(inicios, _ordinal(competencia, _SEM_INICIO)) - 1
+            r = vencedoras[i] if i >= 0 else None
+        else:
+            r = self.regras.get(chave)
+        return dict(r) if r is not None else None
+
+    def __len__(self) -> int:
+        return len(self.regras)
+
+
+def _stat(path: Path) -> Tuple[int, int]:
+    try:
+        st = path.stat()
+        return (st.st_mtime_ns, st.st_size)
+    except OSError:
+        return (0, -1)
+
+
+def assinatura_fontes() -> Tuple:
+    db = Path(DB_PATH)
+    return (
+        str(db), _stat(db), _stat(db.with_name(db.name + "-wal")),
+        _stat(RULES_OVERRIDES), _stat(RULES_INDEX),
+    )
+
+
+def _read_json(path: Path) -> Optional[object]:
+    try:
+        if path.exists():
+            return json.loads(path.read_text(encoding="utf-8"))
+    except Exception:
+        pass
+    return None
+
+
+def _regras_resolvidas() -> Tuple[List[Entrada], List[Entrada]]:
+    """(consolidadas, extraídas por LLM): as últimas ficam abaixo de overrides e do índice."""
+    out: List[Entrada] = []
+    llm: List[Entrada] = []
+    try:
+        if not Path(DB_PATH).exists():
+            return out, llm
+        with sqlite3.connect(str(DB_PATH)) as conn:
+            rows = conn.execute(
+                """
+                SELECT uf, sindicato, vr_valor, va_valor, dias, periodicidade, condicao, origem, confidence
+                FROM regras_cct_vrva_resolvidas
+                """
+            ).fetchall()
+    except Exception:
+        return out, llm
+    for uf, sind, vr, va, dias, per, cond, origem, conf in rows:
+        r: Dict[str, Any] = {}
+        if vr is not None: r["vr_valor"] = vr
+        if va is not None: r["va_valor"] = va
+        if dias is not None:
+            try:
+                r["dias"] = int(dias)
+            except Exception:
+                pass
+        if per is not None: r["periodicidade"] = per
+        if cond is not None: r["condicao"] = cond
+        r["origem"] = (origem or "") + ";resolver"
+        r["confidence"] = conf
+        # PK (uf, sindicato): a primeira linha equivale ao fetchone() do resolvedor
+        destino = llm if str(origem or "").startswith("llm_extract") else out
+        destino.append(((uf, sind), r))
+    return out, llm
+
+
+def _regras_pre_resolvidas() -> List[Entrada]:
+    out: List[Entrada] = []
+    try:
+        if not Path(DB_PATH).exists():
+            return out
+        with sqlite3.connect(str(DB_PATH)) as conn:
+            rows = conn.execute(
+                f"SELECT uf, sindicato, vr_valor, va_valor, dias, periodicidade, origem, confidence FROM {TABELA_PRE}"
+            ).fetchall()
+    except Exception:
+        return out
+    for uf, sind, vr, va, dias, per, origem, conf in rows:
+        r: Dict[str, Any] = {}
+        if vr is not None: r["vr_valor"] = vr
+        if va is not None: r["va_valor"] = va
+        if dias is not None:
+            try:
+                r["dias"] = int(dias)
+            except Exception:
+                pass
+        if per is not None: r["periodicidade"] = per
+        r["origem"] = (origem or "llm_extract") + ";pre_resolucao"
+        r["confidence"] = conf
+        out.append(((uf, sind), r))
+    return out
+
+
+def _regras_overrides() -> List[Entrada]:
+    out: List[Entrada] = []
+    try:
+        # fonte principal: tabela regras_cct_overrides (o JSON é só exportação)
+        from utils.overrides_store import overrides_como_regras
+        for item in overrides_como_regras():
+            r = dict(item["regra"])
+            r["origem"] = "override"
+            out.append(((item["uf"], item["sindicato"]), r))
+        return out
+    except Exception:
+        pass
+    data = _read_json(RULES_OVERRIDES) or {}
+    if not isinstance(data, dict):
+        return out
+    for k, v in data.items():
+        if "::" not in str(k) or not isinstance(v, dict):
+            continue
+        uf, sind = str(k).split("::", 1)
+        r = dict(v)
+        r["origem"] = "override"
+        out.append(((uf, sind), r))
+    return out
+
+
+def _regras_indice() -> List[Entrada]:
+    out: List[Entrada] = []
+    idx = _read_json(RULES_INDEX) or []
+    if not isinstance(idx, list):
+        return out
+    for item in idx:
+        if not isinstance(item, dict):
+            continue
+        chave = ((item.get("uf") or "").upper(), (item.get("sindicato") or "").strip())
+        r = {
+            key: item.get(key)
+            for key in ("vr_valor", "va_valor", "dias", "dias_tipo", "periodicidade")
+            if item.get(key) is not None
+        }
+        if r:
+            for key in ("vigencia_inicio", "vigencia_fim"):
+                if item.get(key):
+                    r[key] = item.get(key)
+            r["origem"] = "ocr_index"
+            out.append((chave, r))
+    return out
+
+
+def _ordinal(valor: Any, padrao: int) -> int:
+    if not valor:
+        return padrao
+    try:
+        if isinstance(valor, date):
+            return valor.toordinal()
+        return date.fromisoformat(str(valor)[:10]).toordinal()
+    except Exception:
+        return padrao
+
+
+_SEM_INICIO = 0
+_SEM_FIM = date.max.toordinal()
+
+
+def _linha_do_tempo(candidatos: List[Tuple[int, int, Mapping[str, Any]]]) -> LinhaDoTempo:
+    """
+    Segmentos elementares [início_i, início_i+1) com a regra vencedora de cada um:
+    maior prioridade da fonte, depois a vigência que começou mais tarde (CCT mais recente),
+    depois a ordem de leitura. Sem vigência = vale para qualquer data.
+    Segmento sem regra vigente depois de alguma vigência encerrada (CCT nova ainda não
+    ingerida) fica com a regra que expirou por último, com `;vigencia_expirada` na origem;
+    antes da primeira vigência, sem regra.
+    """
+    ivs = [
+        (prio, _ordinal(r.get("vigencia_inicio"), _SEM_INICIO), _ordinal(r.get("vigencia_fim"), _SEM_FIM), ordem, r)
+        for prio, ordem, r in candidatos
+    ]
+    limites = sorted({_SEM_INICIO} | {iv[1] for iv in ivs} | {iv[2] + 1 for iv in ivs if iv[2] < _SEM_FIM})
+    inicios: List[int] = []
+    vencedoras: List[Optional[Mapping[str, Any]]] = []
+    expiradas: Dict[int, Mapping[str, Any]] = {}
+    for b in limites:
+        cobrem = [iv for iv in ivs if iv[1] <= b <= iv[2]]
+        if cobrem:
+            venc = max(cobrem, key=lambda iv: (iv[0], iv[1], -iv[3]))[4]
+        else:
+            encerradas = [iv for iv in ivs if iv[2] < b]
+            venc = None
+            if encerradas:
+                r = max(encerradas, key=lambda iv: (iv[2], iv[0], iv[1], -iv[3]))[4]
+                if id(r) not in expiradas:
+                    origem = f"{r.get('origem') or ''};vigencia_expirada".lstrip(";")
+                    expiradas[id(r)] = MappingProxyType({**r, "origem": origem})
+                venc = expiradas[id(r)]
+        if vencedoras and vencedoras[-1] is venc:
+            continue
+        inicios.append(b)
+        vencedoras.append(venc)
+    return tuple(inicios), tuple(vencedoras)
+
+
+def compilar_snapshot() -> SnapshotRegras:
+    """Lê todas as fontes determinísticas e monta um snapshot novo (precedência aplicada)."""
+    try:
+        # a migração inicial do JSON de overrides escreve no banco: antes da assinatura
+        from utils.overrides_store import garantir_tabela
+        garantir_tabela()
+    except Exception:
+        pass
+    assinatura = assinatura_fontes()
+    regras: Dict[Chave, Mapping[str, Any]] = {}
+    prov: Dict[Chave, str] = {}
+    candidatos: Dict[Chave, List[Tuple[int, int, Mapping[str, Any]]]] = {}
+    resolvidas, extraidas_llm = _regras_resolvidas()
+    # da menor para a maior prioridade: fontes superiores sobrescrevem;
+    # dentro de uma fonte, a primeira entrada da chave vence (consulta sem competência)
+    for prio, (fonte, entradas) in enumerate((
+        (TABELA_PRE, extraidas_llm + _regras_pre_resolvidas()),
+        ("rules_index.json", _regras_indice()),
+        ("regras_cct_overrides", _regras_overrides()),
+        ("regras_cct_vrva_resolvidas", resolvidas),
+    )):
+        vistos = set()
+        for ordem, (chave, r) in enumerate(entradas):
+            mp = MappingProxyType(r)
+            candidatos.setdefault(chave, []).append((prio, ordem, mp))
+            if chave in vistos:
+                continue
+            vistos.add(chave)
+            regras[chave] = mp
+            prov[chave] = fonte
+    # linhas do tempo apenas para chaves com alguma regra datada
+    vigencias: Dict[Chave, LinhaDoTempo] = {
+        chave: _linha_do_tempo(cs)
+        for chave, cs in candidatos.items()
+        if any(r.get("vigencia_inicio") or r.get("vigencia_fim") for _, _, r in cs)
+    }
+    conteudo: Any = sorted([[k[0], k[1], dict(v)] for k, v in regras.items()], key=lambda e: (e[0], e[1]))
+    if vigencias:
+        conteudo = [conteudo, sorted(
+            [k[0], k[1], list(t[0]), [dict(r) if r else None for r in t[1]]] for k, t in vigencias.items()
+        )]
+    canon = json.dumps(conteudo, sort_keys=True, ensure_ascii=False, default=str)
+    versao = hashlib.sha1(canon.encode("utf-8")).hexdigest()[:16]
+    return SnapshotRegras(
+        versao=versao,
+        regras=MappingProxyType(regras),
+        proveniencia=MappingProxyType(prov),
+        assinatura_fontes=assinatura,
+        vigencias=MappingProxyType(vigencias),
+    )
+
+
+_snapshot: Optional[SnapshotRegras] = None
+_lock = threading.Lock()
+
+
+def obter_snapshot() -> SnapshotRegras:
+    """Snapshot vigente; recompila (uma única thread) quando alguma fonte mudou."""
+    global _snapshot
+    snap = _snapshot
+    if snap is not None and snap.assinatura_fontes == assinatura_fontes():
+        return snap
+    with _lock:
+        snap = _snapshot
+        if snap is None or snap.assinatura_fontes != assinatura_fontes():
+            snap = compilar_snapshot()
+            _snapshot = snap
+    return snap
+
+
+def invalidar_snapshot() -> None:
+    """Força recompilação na próxima consulta (ex.: após escrita fora das fontes monitoradas)."""
+    global _snapshot
+    with _lock:
+        _snapshot = None
@@ -0,0 +1,208 @@
+from __future__ import annotations
+
+import hashlib
+import sqlite3
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import pandas as pd
+
+from ferramentas.persistencia_db import DB_PATH
+
+# Tabela normalizada de valores por (UF, sindicato) materializada a partir das planilhas
+# importadas no SQLite (tabelas cujo nome contém 'sindicato' e 'valor'). Substitui o
+# SELECT * + filtro em pandas que o resolvedor fazia a cada chamada por uma consulta
+# indexada. `ordem` preserva a precedência antiga (ordem alfabética das tabelas de origem).
+
+TABELA_LOOKUP = "valores_sindicato_lookup"
+
+_COLS_UF = ("uf", "estado")
+_COLS_SIND = ("sindicato", "sindicato_do_colaborador", "sindicato_colab")
+_COLS_VR = ("vr_valor", "vr", "valor_vr", "valor_vr_dia", "vr_dia")
+_COLS_VA = ("va_valor", "va", "valor_va", "valor_va_dia", "va_dia")
+_COLS_DIAS = ("dias", "dias_vr", "dias_va")
+_COLS_PER = ("periodicidade", "periodicidade_vr", "periodicidade_va")
+
+_LOTE_SQL = 400  # sindicatos por consulta IN (limite de parâmetros do SQLite)
+
+
+def eh_tabela_origem(nome: str) -> bool:
+    """Tabela importada que alimenta o lookup (quem a grava deve rematerializar o lookup)."""
+    return "sindicato" in nome and "valor" in nome and nome != TABELA_LOOKUP
+
+
+def _tabelas_origem(conn: sqlite3.Connection) -> List[str]:
+    nomes = [r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type='table' ORDER BY name")]
+    return [t for t in nomes if eh_tabela_origem(t)]
+
+
+def _criar_tabela(conn: sqlite3.Connection) -> None:
+    # colunas de valor sem tipo declarado: preservam o valor original (texto BRL ou número)
+    conn.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS {TABELA_LOOKUP} (
+            uf TEXT NOT NULL,
+            sindicato TEXT NOT NULL,
+            vr,
+            va,
+            dias,
+            periodicidade,
+            source_table TEXT NOT NULL,
+            ordem INTEGER NOT NULL
+        )
+        """
+    )
+    conn.execute(
+        f"CREATE INDEX IF NOT EXISTS idx_{TABELA_LOOKUP}_uf_sind ON {TABELA_LOOKUP}(uf, sindicato, ordem)"
+    )
+
+
+def _pick(row: pd.Series, cols_low: Dict[str, str], nomes: Iterable[str]) -> Any:
+    for name in nomes:
+        c = cols_low.get(name)
+        if c and pd.notna(row.get(c)):
+            v = row.get(c)
+            return v.item() if hasattr(v, "item") else v
+    return None
+
+
+def materializar_valores_sindicato(conn: Optional[sqlite3.Connection] = None) -> int:
+    """
+    (Re)constrói `valores_sindicato_lookup` a partir das tabelas importadas.
+    Para cada tabela e (UF, sindicato), considera a primeira linha (mesma regra do resolvedor).
+    Retorna o número de linhas gravadas.
+    """
+    own = conn is None
+    if own:
+        DB_PATH.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(str(DB_PATH))
+    try:
+        registros: List[Tuple] = []
+        for ordem, tname in enumerate(_tabelas_origem(conn)):
+            try:
+                df = pd.read_sql_query(f'SELECT * FROM "{tname}"', conn)
+            except Exception:
+                continue
+            cols_low = {c.lower(): c for c in df.columns}
+            col_uf = next((cols_low[c] for c in _COLS_UF if c in cols_low), None)
+            col_sind = next((cols_low[c] for c in _COLS_SIND if c in cols_low), None)
+            if not (col_uf and col_sind) or df.empty:
+                continue
+            df["_uf_key"] = df[col_uf].astype(str).str.upper().str.strip()
+            df["_sind_key"] = df[col_sind].astype(str).str.strip()
+            for _, row in df.drop_duplicates(subset=["_uf_key", "_sind_key"], keep="first").iterrows():
+                vr = _pick(row, cols_low, _COLS_VR)
+                va = _pick(row, cols_low, _COLS_VA)
+                dias = _pick(row, cols_low, _COLS_DIAS)
+                per = _pick(row, cols_low, _COLS_PER)
+                if vr is None and va is None and dias is None and per is None:
+                    continue
+                registros.append((row["_uf_key"], row["_sind_key"], vr, va, dias, per, tname, ordem))
+        with conn:
+            conn.execute(f"DROP TABLE IF EXISTS {TABELA_LOOKUP}")
+            _criar_tabela(conn)
+            conn.executemany(
+                f"""
+                INSERT INTO {TABELA_LOOKUP} (uf, sindicato, vr, va, dias, periodicidade, source_table, ordem)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                registros,
+            )
+        return len(registros)
+    finally:
+        if own:
+            conn.close()
+
+
+def _para_regra(vr, va, dias, per, tname) -> Optional[Dict[str, Any]]:
+    out: Dict[str, Any] = {}
+    if vr is not None: out["vr_valor"] = vr
+    if va is not None: out["va_valor"] = va
+    if dias is not None:
+        try:
+            out["dias"] = int(dias)
+        except Exception:
+            pass
+    if per is not None: out["periodicidade"] = per
+    if not out:
+        return None
+    out["origem"] = f"sqlite::{tname}"
+    return out
+
+
+def _garantir_lookup(conn: sqlite3.Connection) -> None:
+    existe = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (TABELA_LOOKUP,)
+    ).fetchone()
+    if not existe:
+        materializar_valores_sindicato(conn)
+
+
+def buscar_valores_sindicato(uf: str, sindicato: str) -> Optional[Dict[str, Any]]:
+    """Consulta pontual indexada para (UF, sindicato); None quando não há valores."""
+    if not DB_PATH.exists():
+        return None
+    with sqlite3.connect(str(DB_PATH)) as conn:
+        _garantir_lookup(conn)
+        rows = conn.execute(
+            f"""
+            SELECT vr, va, dias, periodicidade, source_table
+            FROM {TABELA_LOOKUP}
+            WHERE uf = ? AND sindicato = ?
+            ORDER BY ordem
+            """,
+            ((uf or "").upper().strip(), (sindicato or "").strip()),
+        ).fetchall()
+    for row in rows:
+        regra = _para_regra(*row)
+        if regra:
+            return regra
+    return None
+
+
+def buscar_valores_sindicato_lote(pares: Iterable[Tuple[str, str]]) -> Dict[Tuple[str, str], Dict[str, Any]]:
+    """Resolve vários pares (UF, sindicato) com listas IN; só retorna pares encontrados."""
+    chaves = {((u or "").upper().strip(), (s or "").strip()) for u, s in pares}
+    out: Dict[Tuple[str, str], Dict[str, Any]] = {}
+    if not chaves or not DB_PATH.exists():
+        return out
+    ufs = sorted({k[0] for k in chaves})
+    sinds = sorted({k[1] for k in chaves})
+    with sqlite3.connect(str(DB_PATH)) as conn:
+        _garantir_lookup(conn)
+        for i in range(0, len(sinds), _LOTE_SQL):
+            lote = sinds[i:i + _LOTE_SQL]
+            rows = conn.execute(
+                f"""
+                SELECT uf, sindicato, vr, va, dias, periodicidade, source_table
+                FROM {TABELA_LOOKUP}
+                WHERE uf IN ({",".join("?" * len(ufs))}) AND sindicato IN ({",".join("?" * len(lote))})
+                ORDER BY ordem
+                """,
+                [*ufs, *lote],
+            ).fetchall()
+            for uf, sind, *resto in rows:
+                if (uf, sind) not in chaves or (uf, sind) in out:
+                    continue
+                regra = _para_regra(*resto)
+                if regra:
+                    out[(uf, sind)] = regra
+    return out
+
+
+def versao_lookup() -> str:
+    """Hash do conteúdo de `valores_sindicato_lookup` (muda quando a tabela é rematerializada com outros valores)."""
+    if not DB_PATH.exists():
+        return "sem_db"
+    sha = hashlib.sha1()
+    try:
+        with sqlite3.connect(str(DB_PATH)) as conn:
+            existe = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (TABELA_LOOKUP,)
+            ).fetchone()
+            if not existe:
+                return "sem_lookup"
+            for row in conn.execute(f"SELECT * FROM {TABELA_LOOKUP} ORDER BY uf, sindicato, ordem"):
+                sha.update(repr(row).encode("utf-8"))
+    except Exception as e:
+        sha.update(f"erro:{e}".encode("utf-8"))
+    return sha.hexdigest()
@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+import chromadb
+from chromadb.config import Settings
+
+# Handle único do ChromaDB por processo.
+# Abrir um PersistentClient carrega os segmentos HNSW do disco; aqui o cliente e as coleções
+# são criados sob demanda uma única vez (thread-safe) e reaproveitados por resolvedor,
+# agentes e ingestão. Após uma reingestão feita por outro processo, chame `recarregar()`.
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+CHROMA_DIR = BASE_DIR / "base_conhecimento" / "chromadb"
+COLECAO_CCTS = "ccts"
+TAMANHO_LOTE = int(os.getenv("VRVA_CHROMA_LOTE", "256"))
+
+_lock = threading.RLock()
+_client: Optional[Any] = None
+_colecoes: Dict[str, Any] = {}
+
+
+def obter_cliente():
+    """Cliente persistente compartilhado (criado na primeira chamada)."""
+    global _client
+    cli = _client
+    if cli is not None:
+        return cli
+    with _lock:
+        if _client is None:
+            CHROMA_DIR.mkdir(parents=True, exist_ok=True)
+            _client = chromadb.PersistentClient(path=str(CHROMA_DIR), settings=Settings(allow_reset=False))
+        return _client
+
+
+def obter_colecao(nome: str = COLECAO_CCTS):
+    """Coleção compartilhada (get_or_create uma vez por processo)."""
+    col = _colecoes.get(nome)
+    if col is not None:
+        return col
+    with _lock:
+        col = _colecoes.get(nome)
+        if col is None:
+            col = obter_cliente().get_or_create_collection(nome)
+            _colecoes[nome] = col
+        return col
+
+
+def recarregar() -> None:
+    """Descarta cliente e coleções; a próxima chamada reabre o índice do disco."""
+    global _client
+    with _lock:
+        _colecoes.clear()
+        _client = None
+        try:
+            # o chromadb mantém o System por caminho em cache de classe; limpa para reler os segmentos
+            from chromadb.api.client import SharedSystemClient
+            SharedSystemClient.clear_system_cache()
+        except Exception:
+            pass
+
+
+def saude(nome: str = COLECAO_CCTS) -> Dict[str, Any]:
+    """Verificação rápida: heartbeat do cliente e contagem de documentos da coleção."""
+    out: Dict[str, Any] = {"ok": False, "path": str(CHROMA_DIR), "colecao": nome}
+    try:
+        out["heartbeat"] = obter_cliente().heartbeat()
+        out["documentos"] = int(obter_colecao(nome).count())
+        out["ok"] = True
+    except Exception as e:
+        out["erro"] = str(e)
+    return out
+
+
+def upsert_em_lotes(
+    colecao,
+    ids: List[str],
+    documentos: List[str],
+    metadados: List[Dict[str, Any]],
+    tamanho: Optional[int] = None,
+) -> int:
+    """`colecao.upsert` em lotes de tamanho fixo (IDs repetidos substituem, sem conflito)."""
+    n = max(1, int(tamanho or TAMANHO_LOTE))
+    for ini in range(0, len(ids), n):
+        colecao.upsert(
+            ids=ids[ini: ini + n], documents=documentos[ini: ini + n], metadatas=metadados[ini: ini + n]
+        )
+    return len(ids)
+
+
+def remover_obsoletos(colecao, where: Dict[str, Any], manter: Iterable[str]) -> int:
+    """Apaga os IDs que casam com `where` e não estão em `manter` (trechos de versões antigas)."""
+    manter = set(manter)
+    atuais = colecao.get(where=where, include=[]).get("ids") or []
+    obsoletos = [i for i in atuais if i not in manter]
+    if obsoletos:
+        colecao.delete(ids=obsoletos)
+    return len(obsoletos)
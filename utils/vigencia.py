@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+import calendar
+import re
+import unicodedata
+from datetime import date
+from typing import Optional, Tuple
+
+# Vigência das CCTs (datas ISO "YYYY-MM-DD").
+# Ordem de inferência: cláusula de vigência do texto ("no período de 01º de maio de 2024 a
+# 30 de abril de 2025", padrão do Mediador/MTE) -> anos do nome do arquivo ("2024-2025")
+# combinados com a data-base do texto -> apenas os anos (01/01 do primeiro a 31/12 do último).
+
+_MESES = {
+    "JANEIRO": 1, "FEVEREIRO": 2, "MARCO": 3, "ABRIL": 4, "MAIO": 5, "JUNHO": 6,
+    "JULHO": 7, "AGOSTO": 8, "SETEMBRO": 9, "OUTUBRO": 10, "NOVEMBRO": 11, "DEZEMBRO": 12,
+}
+_MES = "(" + "|".join(_MESES) + ")"
+_DATA_EXTENSO = r"(\d{1,2})\s*[ºO°]?\s+DE\s+" + _MES + r"\s+DE\s+(\d{4})"
+_DATA_NUM = r"(\d{1,2})[/.-](\d{1,2})[/.-](\d{4})"
+
+_RE_PERIODO_EXTENSO = re.compile(_DATA_EXTENSO + r"\s+(?:A|ATE)\s+" + _DATA_EXTENSO)
+_RE_PERIODO_NUM = re.compile(_DATA_NUM + r"\s+(?:A|ATE)\s+" + _DATA_NUM)
+_RE_DATA_BASE = re.compile(r"DATA[\s-]*BASE[^.]{0,80}?(?:\d{1,2}\s*[ºO°]?\s+DE\s+)?" + _MES)
+_RE_ANOS_ARQUIVO = re.compile(r"(20\d{2})\D{1,3}(20\d{2})")
+_RE_VIGENCIA = re.compile(r"VIGENCIA")
+
+
+def _sem_acento(s: str) -> str:
+    return unicodedata.normalize("NFKD", s or "").encode("ascii", "ignore").decode("ascii").upper()
+
+
+def _iso(ano: int, mes: int, dia: int) -> Optional[str]:
+    try:
+        return date(int(ano), int(mes), int(dia)).isoformat()
+    except Exception:
+        return None
+
+
+def _ultimo_dia(ano: int, mes: int) -> str:
+    return date(ano, mes, calendar.monthrange(ano, mes)[1]).isoformat()
+
+
+def inferir_vigencia(texto: Optional[str], nome_arquivo: Optional[str] = None) -> Tuple[Optional[str], Optional[str]]:
+    """(vigencia_inicio, vigencia_fim) em ISO, ou (None, None) quando não há indício."""
+    txt = re.sub(r"\s+", " ", _sem_acento(texto or ""))
+    # 1) período explícito próximo à palavra "vigência"
+    for m_vig in _RE_VIGENCIA.finditer(txt):
+        trecho = txt[m_vig.start(): m_vig.start() + 400]
+        m = _RE_PERIODO_EXTENSO.search(trecho)
+        if m:
+            ini = _iso(int(m.group(3)), _MESES[m.group(2)], int(m.group(1)))
+            fim = _iso(int(m.group(6)), _MESES[m.group(5)], int(m.group(4)))
+            if ini and fim and ini <= fim:
+                return ini, fim
+        m = _RE_PERIODO_NUM.search(trecho)
+        if m:
+            ini = _iso(int(m.group(3)), int(m.group(2)), int(m.group(1)))
+            fim = _iso(int(m.group(6)), int(m.group(5)), int(m.group(4)))
+            if ini and fim and ini <= fim:
+                return ini, fim
+    # 2) anos do nome do arquivo (+ data-base do texto, quando houver)
+    m = _RE_ANOS_ARQUIVO.search(_sem_acento(nome_arquivo or ""))
+    if not m:
+        return None, None
+    a, b = int(m.group(1)), int(m.group(2))
+    if b < a:
+        return None, None
+    mdb = _RE_DATA_BASE.search(txt)
+    if mdb and b > a:
+        mes = _MESES[mdb.group(1)]
+        # vigência anual a partir da data-base: termina no mês anterior do último ano
+        fim_ano, fim_mes = (b, mes - 1) if mes > 1 else (b - 1, 12)
+        return date(a, mes, 1).isoformat(), _ultimo_dia(fim_ano, fim_mes)
+    return date(a, 1, 1).isoformat(), date(b, 12, 31).isoformat()
+
+
+def data_competencia(ano: int, mes: int) -> str:
+    """Data de referência de uma competência (1º dia do mês), usada nas consultas as-of."""
+    return date(int(ano), int(mes), 1).isoformat()